@@ -0,0 +1,86 @@
+"""
+End-to-end chat pipeline latency with a stubbed LLM provider.
+
+Every stubbed completion takes LATENCY seconds. The stubbed LLM intent
+call answers "yes" only for messages that mention thumbnails, so the local
+guess used for speculation is sometimes wrong. Messages the local intent
+classifier is confident about skip the LLM intent call entirely; the
+ambiguous ones at the end exercise the pipeline.
+
+Usage:
+    python -m benchmarks.bench_chat_pipeline
+"""
+import asyncio
+import json
+import statistics
+import time
+
+from src.core.config import settings
+from src.services import chat_service
+
+LATENCY = 0.2
+
+MESSAGES = [
+    "Can you make a gaming thumbnail with red colors?",
+    "Create a thumbnail for my tech review",
+    "What file formats do you support?",
+    "I need a bold thumbnail for a cooking video",
+    "How many credits do I have left?",
+    "Please design a minimalist thumbnail",
+    "Thanks, that looks great",
+    "I want a picture for my vlog",
+    "Can you make it look more professional?",
+    "New video is about crypto, give me something dramatic",
+    "ok",
+]
+
+
+class StubOpenAI:
+    """Async chat provider stub with a fixed latency per call."""
+
+    name = "openai"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def chat(self, messages, model="gpt-3.5-turbo", temperature=0.7, max_tokens=None):
+        self.calls += 1
+        await asyncio.sleep(LATENCY)
+        system, user = messages[0]["content"], messages[-1]["content"]
+        wants_thumbnail = "thumbnail" in user.lower()
+        if "intent classifier" in system:
+            return "yes" if wants_thumbnail else "no"
+        if "Respond with only JSON" in system:
+            return json.dumps({"requires_generation": wants_thumbnail, "reply": "Sure!"})
+        return "Sure!"
+
+
+class StubService:
+    def __init__(self):
+        self.openai = StubOpenAI()
+
+
+async def measure(mode: str):
+    settings.chat_pipeline_mode = mode
+    service = StubService()
+    latencies = []
+    for message in MESSAGES:
+        start = time.perf_counter()
+        await chat_service.run_chat_pipeline(message, service)
+        latencies.append(time.perf_counter() - start)
+    return latencies, service.openai.calls
+
+
+async def main():
+    print(f"single call latency: {LATENCY * 1000:.0f} ms")
+    print(f"{'mode':<12} {'mean ms':>8} {'max ms':>8} {'calls/msg':>10}")
+    for mode in ("sequential", "speculative", "structured"):
+        latencies, calls = await measure(mode)
+        print(
+            f"{mode:<12} {statistics.mean(latencies) * 1000:>8.0f} "
+            f"{max(latencies) * 1000:>8.0f} {calls / len(MESSAGES):>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
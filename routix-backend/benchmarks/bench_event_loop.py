@@ -0,0 +1,85 @@
+"""
+Event loop responsiveness while long AI generations are running.
+
+Simulates a worker serving cheap, unrelated requests (a coroutine that
+wakes every 10ms) while several slow provider calls are in flight, and
+reports the wake-up latency percentiles for:
+
+- blocking:  a synchronous SDK call made directly inside ``async def``
+             (what AIService used to do)
+- executor:  the same blocking call routed through ``run_blocking``
+- async:     an async-native provider call
+
+Usage:
+    python -m benchmarks.bench_event_loop
+"""
+import asyncio
+import statistics
+import time
+
+from src.services.ai_providers import run_blocking
+
+GENERATIONS = 4
+GENERATION_SECONDS = 0.5
+TICK_SECONDS = 0.01
+DURATION_SECONDS = 2.0
+
+
+async def blocking_generation():
+    time.sleep(GENERATION_SECONDS)
+
+
+async def executor_generation():
+    await run_blocking(time.sleep, GENERATION_SECONDS)
+
+
+async def async_generation():
+    await asyncio.sleep(GENERATION_SECONDS)
+
+
+async def measure(generation) -> list:
+    """Measure extra wake-up latency of a ticker while generations run."""
+    latencies = []
+
+    async def ticker():
+        deadline = time.perf_counter() + DURATION_SECONDS
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            latencies.append((time.perf_counter() - start - TICK_SECONDS) * 1000)
+
+    async def generations():
+        while True:
+            await asyncio.gather(*(generation() for _ in range(GENERATIONS)))
+
+    background = asyncio.create_task(generations())
+    await ticker()
+    background.cancel()
+    try:
+        await background
+    except asyncio.CancelledError:
+        pass
+    return latencies
+
+
+def percentile(values: list, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def main():
+    print(f"{'mode':<10} {'samples':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, generation in (
+        ("blocking", blocking_generation),
+        ("executor", executor_generation),
+        ("async", async_generation),
+    ):
+        latencies = await measure(generation)
+        print(
+            f"{name:<10} {len(latencies):>8} {statistics.median(latencies):>8.2f} "
+            f"{percentile(latencies, 0.99):>8.2f} {max(latencies):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
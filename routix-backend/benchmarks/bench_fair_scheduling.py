@@ -0,0 +1,126 @@
+"""
+Queue wait per subscription tier while a FREE user floods the queue.
+
+Discrete-event simulation of a worker pool (no database, no sleeping):
+``SLOTS`` generations run at once and each takes an exponentially
+distributed time. PRO and ENTERPRISE users and ordinary FREE users submit
+at a steady Poisson rate; at ``FLOOD_AT`` one FREE user submits
+``FLOOD_JOBS`` generations at once. Every time slots free up the next
+jobs are picked by:
+
+- fifo:  oldest job first (what claiming in arrival order does)
+- fair:  ``FairScheduler`` with the default tier weights and per-user caps
+
+and the queue wait (submission to start) percentiles per tier are
+reported.
+
+Usage:
+    python -m benchmarks.bench_fair_scheduling
+"""
+import heapq
+import random
+from datetime import datetime, timedelta
+
+from src.core.config import settings
+from src.services.generation_scheduler import Candidate, FairScheduler
+
+SLOTS = 16
+MEAN_SECONDS = 8.0
+DURATION = 1800.0
+FLOOD_AT = 300.0
+FLOOD_JOBS = 2000
+# tier -> (users, jobs per second across those users)
+STEADY_LOAD = {
+    "free": (50, 0.6),
+    "pro": (20, 0.8),
+    "enterprise": (5, 0.3)
+}
+EPOCH = datetime(2024, 1, 1)
+
+
+def make_arrivals(rng: random.Random):
+    arrivals = []
+    for tier, (users, rate) in STEADY_LOAD.items():
+        t = rng.expovariate(rate)
+        while t < DURATION:
+            arrivals.append((t, f"{tier}-{rng.randrange(users)}", tier))
+            t += rng.expovariate(rate)
+    arrivals.extend((FLOOD_AT, "free-flood", "free") for _ in range(FLOOD_JOBS))
+    arrivals.sort(key=lambda arrival: arrival[0])
+    return [
+        (t, Candidate(id=f"{i:06d}", user_id=user_id, tier=tier, created_at=EPOCH + timedelta(seconds=t)))
+        for i, (t, user_id, tier) in enumerate(arrivals)
+    ]
+
+
+def fifo(queued, inflight, slots):
+    return sorted(queued, key=lambda c: (c.created_at, c.id))[:slots]
+
+
+def fair(scheduler: FairScheduler):
+    def pick(queued, inflight, slots):
+        # Every pick starts at once in the simulation, so all of them are claimed
+        chosen = scheduler.select(queued, inflight, slots)
+        scheduler.commit(chosen)
+        return chosen
+    return pick
+
+
+def simulate(pick, arrivals, rng: random.Random):
+    """Run the pool and return {tier: [waits]} for jobs started before DURATION."""
+    queued = {}
+    inflight = {}
+    finishing = []  # (finish time, user id)
+    waits = {tier: [] for tier in STEADY_LOAD}
+    next_arrival = 0
+
+    now = 0.0
+    while now < DURATION:
+        while next_arrival < len(arrivals) and arrivals[next_arrival][0] <= now:
+            candidate = arrivals[next_arrival][1]
+            queued[candidate.id] = candidate
+            next_arrival += 1
+        while finishing and finishing[0][0] <= now:
+            _, user_id = heapq.heappop(finishing)
+            inflight[user_id] -= 1
+
+        free = SLOTS - len(finishing)
+        if free and queued:
+            for candidate in pick(queued.values(), inflight, free):
+                del queued[candidate.id]
+                inflight[candidate.user_id] = inflight.get(candidate.user_id, 0) + 1
+                heapq.heappush(finishing, (now + rng.expovariate(1 / MEAN_SECONDS), candidate.user_id))
+                waits[candidate.tier].append(now - (candidate.created_at - EPOCH).total_seconds())
+
+        events = [DURATION]
+        if next_arrival < len(arrivals):
+            events.append(arrivals[next_arrival][0])
+        if finishing:
+            events.append(finishing[0][0])
+        now = min(events)
+    return waits, len(queued)
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else float("nan")
+
+
+def main():
+    arrivals = make_arrivals(random.Random(7))
+    scheduler = FairScheduler(settings.generation_tier_weights, settings.generation_user_max_inflight)
+    print(f"{SLOTS} slots, {MEAN_SECONDS:.0f}s mean generation, {FLOOD_JOBS} FREE jobs at t={FLOOD_AT:.0f}s")
+    print(f"{'policy':>6} {'tier':>10} {'started':>8} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'max s':>8}")
+    for label, pick in (("fifo", fifo), ("fair", fair(scheduler))):
+        waits, left = simulate(pick, arrivals, random.Random(11))
+        for tier, tier_waits in waits.items():
+            ordered = sorted(tier_waits)
+            print(
+                f"{label:>6} {tier:>10} {len(ordered):>8} {percentile(ordered, 0.5):>8.1f} "
+                f"{percentile(ordered, 0.95):>8.1f} {percentile(ordered, 0.99):>8.1f} "
+                f"{ordered[-1] if ordered else float('nan'):>8.1f}"
+            )
+        print(f"{label:>6} {'queued':>10} {left:>8} (still waiting at the end)")
+
+
+if __name__ == "__main__":
+    main()
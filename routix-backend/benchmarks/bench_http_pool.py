@@ -0,0 +1,76 @@
+"""
+Per-request cost of outbound HTTP: new session per call vs the shared pool.
+
+Starts a local aiohttp stub server that returns a small image-sized body
+and downloads from it REQUESTS times with:
+
+- per-call:  a fresh aiohttp.ClientSession per request (old behaviour of
+             StorageService.download_from_url and the Stability provider)
+- pooled:    the application-scoped ``http_client`` session
+
+Usage:
+    python -m benchmarks.bench_http_pool
+"""
+import asyncio
+import time
+
+import aiohttp
+from aiohttp import web
+
+from src.core.http import http_client
+
+REQUESTS = 500
+CONCURRENCY = 10
+BODY = b"\xff" * 64 * 1024
+
+
+async def start_stub_server() -> web.AppRunner:
+    async def handler(request):
+        return web.Response(body=BODY, content_type="image/jpeg")
+
+    app = web.Application()
+    app.router.add_get("/image.jpg", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 8765).start()
+    return runner
+
+
+async def per_call(url: str):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            await response.read()
+
+
+async def pooled(url: str):
+    async with http_client.session.get(url) as response:
+        await response.read()
+
+
+async def run(fetch, url: str) -> float:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one():
+        async with semaphore:
+            await fetch(url)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(REQUESTS)))
+    return time.perf_counter() - start
+
+
+async def main():
+    runner = await start_stub_server()
+    url = "http://127.0.0.1:8765/image.jpg"
+    try:
+        print(f"{'mode':<10} {'total s':>8} {'per request ms':>15}")
+        for name, fetch in (("per-call", per_call), ("pooled", pooled)):
+            elapsed = await run(fetch, url)
+            print(f"{name:<10} {elapsed:>8.2f} {elapsed / REQUESTS * 1000:>15.3f}")
+    finally:
+        await http_client.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
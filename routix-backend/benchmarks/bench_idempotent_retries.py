@@ -0,0 +1,101 @@
+"""
+Generations, ledger entries and credits per submission under a retry storm.
+
+``CLIENTS`` simulated mobile clients each submit one generation through
+``GenerationService.submit_generation`` against a temporary SQLite
+database. A client fires ``CONCURRENT`` attempts at once (a flaky
+connection replaying the request) and then ``LATE_RETRIES`` more after
+a short wait, like a client that never saw a response. Every generation
+row is a paid provider call once a worker claims it.
+
+- no key:   each attempt is a new submission
+- with key: every attempt of a client sends the same Idempotency-Key
+
+Usage:
+    python -m benchmarks.bench_idempotent_retries
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.core.database import Base
+from src.models import Algorithm, CreditTransaction, Generation, User
+from src.schemas.generation import GenerationCreate
+from src.services import generation_service
+from src.services.generation_service import GenerationService
+
+CLIENTS = 50
+CONCURRENT = 3
+LATE_RETRIES = 2
+RETRY_DELAY = 0.05
+
+
+async def client(service: GenerationService, algorithm: Algorithm, index: int, keyed: bool):
+    user_id = f"bench-user-{index}"
+    request = GenerationCreate(prompt=f"thumbnail {index}", algorithm_id=algorithm.id)
+    key = f"bench-{index}" if keyed else None
+    await asyncio.gather(*(
+        service.submit_generation(user_id, algorithm, request, key) for _ in range(CONCURRENT)
+    ))
+    for _ in range(LATE_RETRIES):
+        await asyncio.sleep(RETRY_DELAY)
+        await service.submit_generation(user_id, algorithm, request, key)
+
+
+async def bench(sessions, keyed: bool):
+    async with sessions() as db:
+        await db.execute(Generation.__table__.delete())
+        await db.execute(CreditTransaction.__table__.delete())
+        await db.execute(User.__table__.delete())
+        db.add_all([
+            User(id=f"bench-user-{index}", email=f"bench{index}@example.com", username=f"bench{index}",
+                 password_hash="x", credits=100)
+            for index in range(CLIENTS)
+        ])
+        await db.commit()
+        algorithm = await db.get(Algorithm, "basic")
+    generation_service.idempotency_keys.local.clear()
+
+    service = GenerationService()
+    started = time.perf_counter()
+    await asyncio.gather(*(client(service, algorithm, index, keyed) for index in range(CLIENTS)))
+    elapsed = time.perf_counter() - started
+
+    async with sessions() as db:
+        generations = (await db.execute(select(func.count(Generation.id)))).scalar()
+        ledger = (await db.execute(select(func.count(CreditTransaction.id)))).scalar()
+        spent = CLIENTS * 100 - (await db.execute(select(func.sum(User.credits)))).scalar()
+    return generations / CLIENTS, ledger / CLIENTS, spent / CLIENTS, elapsed * 1000
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        # One connection: SQLite serializes writers anyway, and this avoids "database is locked"
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}",
+            poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0
+        )
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        generation_service.AsyncSessionLocal = sessions
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            db.add(Algorithm(id="basic", name="basic", display_name="Basic", description="bench", cost_credits=1))
+            await db.commit()
+
+        attempts = CONCURRENT + LATE_RETRIES
+        print(f"{CLIENTS} clients, {attempts} attempts each ({CONCURRENT} concurrent, {LATE_RETRIES} late)")
+        print(f"{'mode':>10} {'generations':>12} {'ledger rows':>12} {'credits':>8} {'total ms':>9}")
+        for label, keyed in (("no key", False), ("with key", True)):
+            generations, ledger, spent, elapsed = await bench(sessions, keyed)
+            print(f"{label:>10} {generations:>12.1f} {ledger:>12.1f} {spent:>8.1f} {elapsed:>9.0f}")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
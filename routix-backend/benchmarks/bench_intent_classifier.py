@@ -0,0 +1,57 @@
+"""
+Accuracy and throughput of the local chat intent classifier.
+
+Reports, on the labelled fixture in benchmarks/fixtures/intent_messages.json:
+
+- coverage: share of messages the classifier is confident about (these
+  never reach the LLM)
+- confident accuracy: accuracy on those messages
+- overall accuracy: accuracy if every message used the local label
+- throughput: messages classified per second
+
+Usage:
+    python -m benchmarks.bench_intent_classifier
+"""
+import json
+import time
+from pathlib import Path
+
+from src.services.intent_classifier import intent_classifier
+
+FIXTURE = Path(__file__).parent / "fixtures" / "intent_messages.json"
+ROUNDS = 2000
+
+
+def main():
+    samples = json.loads(FIXTURE.read_text())
+
+    confident = correct_confident = correct = 0
+    for sample in samples:
+        prediction = intent_classifier.classify(sample["message"])
+        is_correct = prediction.requires_generation == sample["requires_generation"]
+        correct += is_correct
+        if prediction.is_confident:
+            confident += 1
+            correct_confident += is_correct
+        else:
+            print(f"  uncertain ({prediction.probability:.2f}): {sample['message']}")
+        if prediction.is_confident and not is_correct:
+            print(f"  WRONG ({prediction.probability:.2f}): {sample['message']}")
+
+    messages = [sample["message"] for sample in samples]
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for message in messages:
+            intent_classifier.classify(message)
+    elapsed = time.perf_counter() - start
+    total = ROUNDS * len(messages)
+
+    print(f"samples:             {len(samples)}")
+    print(f"coverage:            {confident / len(samples):.1%}")
+    print(f"confident accuracy:  {correct_confident / max(confident, 1):.1%}")
+    print(f"overall accuracy:    {correct / len(samples):.1%}")
+    print(f"throughput:          {total / elapsed:,.0f} msg/s ({elapsed / total * 1e6:.2f} us/msg)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Status requests per generation: fixed-interval polling vs long-polling.
+
+Runs ``GENERATIONS`` simulated generations against a temporary SQLite
+database. Each one publishes progress events for four stages and then
+writes its final status, like GenerationService. One client per
+generation waits for the final status by:
+
+- poll:       ``get_statuses`` with no wait, every ``POLL_INTERVAL``
+- long-poll:  ``get_statuses`` with ``since`` and ``wait=LONG_POLL_WAIT``
+
+plus one ``bulk`` client that long-polls all generations in one request,
+and the benchmark reports status requests and database reads per
+generation, and how long after the final status the client saw it.
+Times are scaled down 4x (a 0.25s poll stands for the usual 1s, and
+generations take 20-60s).
+
+Usage:
+    python -m benchmarks.bench_status_polling
+"""
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import event, insert, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.models.generation import Generation, GenerationStatus
+from src.services import generation_status
+from src.services.generation_events import progress_bus, progress_event
+
+GENERATIONS = 50
+POLL_INTERVAL = 0.25
+LONG_POLL_WAIT = 7.5
+DURATION_RANGE = (5.0, 15.0)  # seconds per simulated generation
+STAGES = (10, 30, 60, 90)
+USER_ID = "bench-user"
+
+
+async def run_generation(sessions, generation_id: str, duration: float, finished: dict):
+    for progress in STAGES:
+        await asyncio.sleep(duration / (len(STAGES) + 1))
+        await progress_bus.publish(progress_event(generation_id, GenerationStatus.PROCESSING, progress))
+    await asyncio.sleep(duration / (len(STAGES) + 1))
+    async with sessions() as db:
+        await db.execute(
+            update(Generation).where(Generation.id == generation_id)
+            .values(status=GenerationStatus.COMPLETED, progress=100)
+        )
+        await db.commit()
+    finished[generation_id] = time.perf_counter()
+    await progress_bus.publish(progress_event(generation_id, GenerationStatus.COMPLETED, 100))
+
+
+async def poll_client(generation_id: str, seen: dict) -> int:
+    requests = 0
+    while True:
+        requests += 1
+        status, = await generation_status.get_statuses(USER_ID, [generation_id])
+        if status.version >= 2000:
+            seen[generation_id] = time.perf_counter()
+            return requests
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def long_poll_client(generation_id: str, seen: dict) -> int:
+    requests = 0
+    since = None
+    while True:
+        requests += 1
+        status, = await generation_status.get_statuses(
+            USER_ID, [generation_id], since={generation_id: since} if since is not None else None,
+            wait=LONG_POLL_WAIT
+        )
+        since = status.version
+        if status.version >= 2000:
+            seen[generation_id] = time.perf_counter()
+            return requests
+
+
+async def bulk_client(generation_ids: list, seen: dict) -> int:
+    requests = 0
+    since = {}
+    while len(seen) < len(generation_ids):
+        requests += 1
+        statuses = await generation_status.get_statuses(
+            USER_ID, [i for i in generation_ids if i not in seen], since=since, wait=LONG_POLL_WAIT
+        )
+        for status in statuses:
+            generation_id = str(status.generation_id)
+            since[generation_id] = status.version
+            if status.version >= 2000 and generation_id not in seen:
+                seen[generation_id] = time.perf_counter()
+    return requests
+
+
+async def bench(client, sessions, reads: list):
+    rng = random.Random(3)
+    ids = [str(uuid.uuid4()) for _ in range(GENERATIONS)]
+    async with sessions() as db:
+        await db.execute(insert(Generation), [
+            {
+                "id": generation_id, "user_id": USER_ID, "algorithm_id": "basic", "prompt": "bench",
+                "status": GenerationStatus.PROCESSING, "progress": 0, "credits_used": 1
+            }
+            for generation_id in ids
+        ])
+        await db.commit()
+
+    reads.clear()
+    finished, seen = {}, {}
+    pipelines = [run_generation(sessions, i, rng.uniform(*DURATION_RANGE), finished) for i in ids]
+    if client is bulk_client:
+        requests, *_ = await asyncio.gather(client(ids, seen), *pipelines)
+    else:
+        requests = sum((await asyncio.gather(*(client(i, seen) for i in ids), *pipelines))[:GENERATIONS])
+    delays = [(seen[i] - finished[i]) * 1000 for i in ids]
+    return requests / GENERATIONS, len(reads) / GENERATIONS, statistics.median(delays), max(delays)
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}")
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        generation_status.AsyncSessionLocal = sessions
+        reads = []
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def count_reads(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                reads.append(statement)
+
+        async with engine.begin() as connection:
+            await connection.run_sync(Generation.metadata.create_all, tables=[Generation.__table__])
+
+        print(f"{GENERATIONS} generations of {DURATION_RANGE[0]:.0f}-{DURATION_RANGE[1]:.0f}s")
+        print(f"{'client':>10} {'requests/gen':>13} {'db reads/gen':>13} {'p50 delay ms':>13} {'max delay ms':>13}")
+        for label, client in (("poll", poll_client), ("long-poll", long_poll_client), ("bulk", bulk_client)):
+            requests, db_reads, p50, worst = await bench(client, sessions, reads)
+            print(f"{label:>10} {requests:>13.1f} {db_reads:>13.1f} {p50:>13.1f} {worst:>13.1f}")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
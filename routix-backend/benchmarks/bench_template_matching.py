@@ -0,0 +1,125 @@
+"""
+Template matching latency: per-row Python loop vs the vectorized index.
+
+Builds catalogs of random Template rows and, for a fixed set of analyses,
+measures the time to return the top 5 matches with:
+
+- loop:    ``calculate_match_score`` and dict building for every row, then
+           a full sort (old body of ``AIService._find_templates_internal``,
+           minus the database query)
+- index:   ``TemplateIndex.top_k`` (one-hot / bitmap feature matrices and
+           argpartition top-k)
+
+Also checks that both return the same (score, rating, usage_count) rows
+and reports the one-off index build time.
+
+Usage:
+    python -m benchmarks.bench_template_matching
+"""
+import json
+import random
+import statistics
+import time
+
+from src.models.template import Template
+from src.services.template_index import TemplateIndex
+
+SIZES = (100, 10_000, 100_000)
+QUERIES = 20
+LIMIT = 5
+
+CATEGORIES = ["gaming", "tech", "lifestyle", "education", "entertainment", "business", "other"]
+STYLES = ["modern", "vintage", "minimalist", "bold", "colorful", "dark", "bright"]
+MOODS = ["exciting", "professional", "fun", "serious", "energetic", "calm"]
+ELEMENTS = ["text", "person", "product", "background", "effects"]
+
+
+def make_templates(count: int, rng: random.Random):
+    return [
+        Template(
+            id=str(i),
+            name=f"Template {i}",
+            description="Benchmark template",
+            category=rng.choice(CATEGORIES),
+            style=rng.choice(STYLES),
+            mood=rng.choice(MOODS),
+            elements=json.dumps(rng.sample(ELEMENTS, rng.randint(1, 4))),
+            tags=json.dumps([]),
+            usage_count=rng.randint(0, 1000),
+            rating=round(rng.uniform(0, 5), 1),
+            is_premium=False
+        )
+        for i in range(count)
+    ]
+
+
+def make_analyses(rng: random.Random):
+    return [
+        {
+            "category": rng.choice(CATEGORIES),
+            "style": rng.choice(STYLES),
+            "mood": rng.choice(MOODS),
+            "elements": rng.sample(ELEMENTS, rng.randint(1, 3))
+        }
+        for _ in range(QUERIES)
+    ]
+
+
+def loop_top_k(templates, analysis, limit, min_score=0.0):
+    scored = []
+    for template in templates:
+        score = template.calculate_match_score(analysis)
+        if score >= min_score:
+            scored.append({
+                "id": template.id,
+                "name": template.name,
+                "category": template.category,
+                "style": template.style,
+                "mood": template.mood,
+                "elements": template.elements_list,
+                "tags": template.tags_list,
+                "match_score": score,
+                "usage_count": template.usage_count,
+                "rating": template.rating
+            })
+    scored.sort(key=lambda t: (t["match_score"], t["rating"], t["usage_count"]), reverse=True)
+    return scored[:limit]
+
+
+def timed(func, analyses):
+    latencies, results = [], []
+    for analysis in analyses:
+        start = time.perf_counter()
+        results.append(func(analysis))
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000, results
+
+
+def ranking(results):
+    return [[(t["match_score"], t["rating"], t["usage_count"]) for t in top] for top in results]
+
+
+def main():
+    rng = random.Random(42)
+    analyses = make_analyses(rng)
+
+    print(f"{'templates':>10} {'build ms':>10} {'loop ms':>10} {'index ms':>10} {'speedup':>8} {'same':>5}")
+    for size in SIZES:
+        templates = make_templates(size, rng)
+
+        start = time.perf_counter()
+        index = TemplateIndex(templates)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        loop_ms, loop_results = timed(lambda a: loop_top_k(templates, a, LIMIT), analyses)
+        index_ms, index_results = timed(lambda a: index.top_k(a, LIMIT), analyses)
+        same = ranking(loop_results) == ranking(index_results)
+
+        print(
+            f"{size:>10,} {build_ms:>10.1f} {loop_ms:>10.2f} {index_ms:>10.3f} "
+            f"{loop_ms / index_ms:>7.0f}x {str(same):>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Template search latency as the catalog grows (SQLite / FTS5).
+
+Builds catalogs of random templates in a temporary SQLite database and
+measures the median latency of:
+
+- scan:     LIKE over name, description and tags with OFFSET pagination,
+            plus a count (what a search without an index has to do)
+- search:   ``search_templates`` first page (FTS5 match, facet counts)
+- deep:     ``search_templates`` 20 pages in, following ``next_cursor``
+
+for a text query and for a category filter with no query. The facet cache
+is cleared before every call, so every call counts facets.
+
+Usage:
+    python -m benchmarks.bench_template_search
+"""
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.models.template import Template
+from src.schemas.template import TemplateSearchRequest
+from src.services.template_index import template_catalog
+from src.services.template_search import ensure_search_index, facet_cache, search_templates
+
+SIZES = (1_000, 10_000, 100_000)
+REPEATS = 10
+LIMIT = 20
+DEEP_PAGE = 20
+
+CATEGORIES = ["gaming", "tech", "lifestyle", "education", "entertainment", "business", "other"]
+STYLES = ["modern", "vintage", "minimalist", "bold", "colorful", "dark", "bright"]
+MOODS = ["exciting", "professional", "fun", "serious", "energetic", "calm"]
+# Zipf-like vocabulary: a few common words and a long tail
+WORDS = [f"word{i}" for i in range(5000)]
+WORD_WEIGHTS = [1 / (rank + 1) for rank in range(len(WORDS))]
+QUERY_WORD = "word40"  # with prefix matches (word400.., word4000..) about 1 in 8 templates
+
+
+def make_rows(count: int, rng: random.Random):
+    return [
+        {
+            "id": f"{i:08d}",
+            "name": " ".join(rng.choices(WORDS, WORD_WEIGHTS, k=2)).title(),
+            "description": " ".join(rng.choices(WORDS, WORD_WEIGHTS, k=12)),
+            "category": rng.choice(CATEGORIES),
+            "style": rng.choice(STYLES),
+            "mood": rng.choice(MOODS),
+            "tags": json.dumps(rng.choices(WORDS, WORD_WEIGHTS, k=3)),
+            "usage_count": rng.randint(0, 1000),
+            "rating": round(rng.uniform(0, 5), 1),
+            "is_active": True,
+            "is_premium": False
+        }
+        for i in range(count)
+    ]
+
+
+async def timed(func):
+    latencies = []
+    for _ in range(REPEATS):
+        facet_cache.local.clear()
+        start = time.perf_counter()
+        await func()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+async def scan(db, term, category, page):
+    conditions = [Template.is_active == True]
+    if term:
+        pattern = f"%{term}%"
+        conditions.append(or_(
+            Template.name.ilike(pattern),
+            Template.description.ilike(pattern),
+            Template.tags.ilike(pattern)
+        ))
+    if category:
+        conditions.append(Template.category == category)
+    await db.execute(select(func.count()).select_from(Template).where(*conditions))
+    result = await db.execute(
+        select(Template).where(*conditions)
+        .order_by(Template.rating.desc(), Template.id.desc())
+        .offset((page - 1) * LIMIT).limit(LIMIT)
+    )
+    return result.scalars().all()
+
+
+async def deep_cursor(db, request):
+    cursor = None
+    for _ in range(DEEP_PAGE - 1):
+        page = await search_templates(db, request.model_copy(update={"cursor": cursor}))
+        cursor = page.next_cursor
+    return cursor
+
+
+async def bench_size(size: int, rng: random.Random):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}")
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as connection:
+            await connection.run_sync(Template.metadata.create_all, tables=[Template.__table__])
+        async with sessions() as db:
+            await ensure_search_index(db)
+            await db.execute(insert(Template), make_rows(size, rng))
+            await db.commit()
+            await template_catalog.rebuild(db)
+
+            results = []
+            for label, term, category in (("query", QUERY_WORD, None), ("filter", None, "tech")):
+                request = TemplateSearchRequest(query=term, category=category, limit=LIMIT)
+                deep_request = request.model_copy(update={"cursor": await deep_cursor(db, request)})
+
+                scan_ms = await timed(lambda: scan(db, term, category, 1))
+                deep_scan_ms = await timed(lambda: scan(db, term, category, DEEP_PAGE))
+                search_ms = await timed(lambda: search_templates(db, request))
+                deep_ms = await timed(lambda: search_templates(db, deep_request))
+                results.append((label, scan_ms, deep_scan_ms, search_ms, deep_ms))
+        await engine.dispose()
+    return results
+
+
+async def main():
+    rng = random.Random(42)
+    print(
+        f"{'templates':>10} {'search':>7} {'scan ms':>9} {'scan p20':>9} "
+        f"{'fts ms':>9} {'fts p20':>9}"
+    )
+    for size in SIZES:
+        for label, scan_ms, deep_scan_ms, search_ms, deep_ms in await bench_size(size, rng):
+            print(
+                f"{size:>10,} {label:>7} {scan_ms:>9.2f} {deep_scan_ms:>9.2f} "
+                f"{search_ms:>9.2f} {deep_ms:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,6 +8,7 @@ from src.core.database import get_db
 from src.core.security import verify_token
 from src.models.user import User
 from src.models.algorithm import Algorithm
+from src.services.ai_service import AIService, get_ai_service
 
 # Security scheme
 security = HTTPBearer()
@@ -80,6 +81,11 @@ async def get_optional_user(
         return None
 
 
+def get_ai() -> AIService:
+    """Dependency to get the shared AIService (override in tests via dependency_overrides)."""
+    return get_ai_service()
+
+
 async def verify_algorithm_exists(
     algorithm_id: str,
     db: AsyncSession = Depends(get_db)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from src.api.v1.endpoints import auth, chat, generations, users, files, websocket
+from src.api.v1.endpoints import auth, chat, generations, users, files, websocket, metrics, templates
 
 api_router = APIRouter()
 
@@ -10,4 +10,6 @@ api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(files.router, prefix="/files", tags=["files"])
 api_router.include_router(generations.router, tags=["generations"])
+api_router.include_router(templates.router, prefix="/templates", tags=["templates"])
 api_router.include_router(websocket.router, tags=["websocket"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, desc
 from sqlalchemy.orm import selectinload
@@ -18,7 +19,9 @@ from src.schemas.conversation import (
     ChatRequest,
     ChatResponse
 )
-from src.api.dependencies import get_current_active_user, get_pagination, Pagination
+from src.api.dependencies import get_current_active_user, get_pagination, Pagination, get_ai
+from src.services.ai_service import AIService
+from src.services.chat_service import run_chat_pipeline, stream_chat_pipeline
 
 router = APIRouter()
 
@@ -209,7 +212,7 @@ async def add_message(
         role=message_data.role,
         content=message_data.content,
         attachments=message_data.attachments,
-        metadata=message_data.metadata
+        metadata_=message_data.metadata
     )
     
     db.add(message)
@@ -229,7 +232,8 @@ async def chat(
     conversation_id: str,
     chat_data: ChatRequest,
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    ai_service: AIService = Depends(get_ai)
 ):
     """Send a chat message and get AI response."""
     
@@ -254,7 +258,7 @@ async def chat(
         role="user",
         content=chat_data.message,
         attachments=json.dumps(chat_data.attachments) if chat_data.attachments else None,
-        metadata=json.dumps(chat_data.metadata) if chat_data.metadata else None
+        metadata_=json.dumps(chat_data.metadata) if chat_data.metadata else None
     )
     
     db.add(user_message)
@@ -262,19 +266,9 @@ async def chat(
     await db.refresh(user_message)
     
     # Process message with AI service
-    from src.services.ai_service import AIService
-    ai_service = AIService()
-    
-    # Analyze the message to determine intent
-    requires_generation = await _analyze_chat_intent(
-        chat_data.message,
-        ai_service
-    )
-    
-    # Generate AI response
-    assistant_response = await _generate_assistant_response(
+    # Determine intent and generate AI response
+    requires_generation, assistant_response = await run_chat_pipeline(
         chat_data.message,
-        requires_generation,
         ai_service
     )
     
@@ -283,7 +277,7 @@ async def chat(
         conversation_id=conversation_id,
         role="assistant",
         content=assistant_response,
-        metadata=json.dumps({"requires_generation": requires_generation})
+        metadata_=json.dumps({"requires_generation": requires_generation})
     )
     
     db.add(assistant_message)
@@ -297,125 +291,90 @@ async def chat(
     )
 
 
-async def _analyze_chat_intent(message: str, ai_service: AIService) -> bool:
-    """Analyze chat message to determine if thumbnail generation is needed."""
+def _sse_event(event: str, data: dict) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/conversations/{conversation_id}/chat/stream")
+async def chat_stream(
+    conversation_id: str,
+    chat_data: ChatRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    ai_service: AIService = Depends(get_ai)
+):
+    """Send a chat message and stream the AI response over Server-Sent Events.
     
-    message_lower = message.lower()
+    Events:
+    - ``token``: ``{"content": "..."}`` for each chunk of the reply
+    - ``done``: the persisted assistant message and ``requires_generation``
+    - ``error``: ``{"detail": "..."}`` if the reply could not be completed
+    """
     
-    # Keywords that indicate generation intent
-    generation_keywords = [
-        "create", "generate", "make", "design", "build",
-        "thumbnail", "image", "picture", "visual",
-        "need", "want", "can you", "please", "help me with"
-    ]
+    # Verify conversation exists and belongs to user
+    result = await db.execute(
+        select(Conversation).where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == current_user.id
+        )
+    )
+    conversation = result.scalar_one_or_none()
     
-    # Check for generation keywords
-    has_generation_keyword = any(
-        keyword in message_lower for keyword in generation_keywords
+    if not conversation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    
+    # Add user message
+    user_message = Message(
+        conversation_id=conversation_id,
+        role="user",
+        content=chat_data.message,
+        attachments=json.dumps(chat_data.attachments) if chat_data.attachments else None,
+        metadata_=json.dumps(chat_data.metadata) if chat_data.metadata else None
     )
     
-    # More sophisticated intent detection with AI (if available)
-    if ai_service.openai_client:
+    db.add(user_message)
+    await db.commit()
+    
+    async def event_stream():
         try:
-            response = ai_service.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an intent classifier. Determine if the user wants to generate a thumbnail. Respond with only 'yes' or 'no'."
-                    },
-                    {
-                        "role": "user",
-                        "content": message
-                    }
-                ],
-                temperature=0.1,
-                max_tokens=10
+            intent = {}
+            chunks = []
+            async for delta in stream_chat_pipeline(chat_data.message, ai_service, intent):
+                chunks.append(delta)
+                yield _sse_event("token", {"content": delta})
+            requires_generation = intent["requires_generation"]
+            
+            # Persist the assistant message once the stream is complete
+            assistant_message = Message(
+                conversation_id=conversation_id,
+                role="assistant",
+                content="".join(chunks).strip(),
+                metadata_=json.dumps({"requires_generation": requires_generation})
             )
             
-            intent = response.choices[0].message.content.strip().lower()
-            return "yes" in intent
+            db.add(assistant_message)
+            await db.commit()
+            await db.refresh(assistant_message)
+            
+            yield _sse_event("done", {
+                "message": MessageResponse.model_validate(assistant_message).model_dump(),
+                "conversation_id": conversation_id,
+                "requires_generation": requires_generation
+            })
             
         except Exception as e:
-            print(f"Error in AI intent detection: {e}")
-            # Fall back to keyword-based detection
-            return has_generation_keyword
+            print(f"Error in chat stream: {e}")
+            yield _sse_event("error", {"detail": "Failed to generate response"})
     
-    return has_generation_keyword
-
-
-async def _generate_assistant_response(
-    user_message: str,
-    requires_generation: bool,
-    ai_service: AIService
-) -> str:
-    """Generate appropriate assistant response."""
-    
-    if requires_generation:
-        # Response for generation requests
-        responses = [
-            "I'd be happy to help you create a thumbnail! Could you provide more details about what you have in mind?",
-            "Great! I can help you generate a thumbnail. What style and theme would you like?",
-            "Let me help you create an amazing thumbnail! Tell me more about your vision.",
-            "I'll assist you with thumbnail generation. What's the main message or theme you want to convey?"
-        ]
-        
-        # Use AI to generate personalized response if available
-        if ai_service.openai_client:
-            try:
-                response = ai_service.openai_client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a helpful assistant for a thumbnail generation platform. Respond warmly and help users clarify their thumbnail creation needs. Keep responses concise (2-3 sentences)."
-                        },
-                        {
-                            "role": "user",
-                            "content": user_message
-                        }
-                    ],
-                    temperature=0.7,
-                    max_tokens=150
-                )
-                
-                return response.choices[0].message.content.strip()
-                
-            except Exception as e:
-                print(f"Error generating AI response: {e}")
-                # Fall back to template response
-                import random
-                return random.choice(responses)
-        else:
-            import random
-            return random.choice(responses)
-    else:
-        # Response for general conversation
-        if ai_service.openai_client:
-            try:
-                response = ai_service.openai_client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a helpful assistant for a thumbnail generation platform. Provide helpful information and guide users. Keep responses concise (2-3 sentences)."
-                        },
-                        {
-                            "role": "user",
-                            "content": user_message
-                        }
-                    ],
-                    temperature=0.7,
-                    max_tokens=150
-                )
-                
-                return response.choices[0].message.content.strip()
-                
-            except Exception as e:
-                print(f"Error generating AI response: {e}")
-                return "I'm here to help you create amazing thumbnails! How can I assist you today?"
-        else:
-            return "I'm here to help you create amazing thumbnails! How can I assist you today?"
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/conversations/{conversation_id}/messages", response_model=List[MessageResponse])
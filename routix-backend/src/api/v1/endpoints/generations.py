@@ -1,19 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
-from typing import List
+from sqlalchemy import select, func, desc, insert, update
+from datetime import datetime
+from typing import List, Optional
 import json
+import uuid
 
+from src.core.config import settings
 from src.core.database import get_db
 from src.models.user import User
-from src.models.generation import Generation, GenerationStatus, CreditTransaction
+from src.models.generation import Generation, GenerationStatus, GenerationBatch, CreditTransaction
 from src.models.algorithm import Algorithm
 from src.schemas.generation import (
     GenerationCreate,
     GenerationResponse,
+    GenerationBatchCreate,
+    GenerationBatchResponse,
     GenerationList,
     AlgorithmResponse,
     GenerationProgress,
+    GenerationStatusRequest,
+    GenerationStatusList,
     GenerationStats,
     CreditTransactionResponse,
     CreditTransactionList
@@ -22,10 +30,12 @@ from src.api.dependencies import (
     get_current_active_user,
     get_pagination,
     Pagination,
-    verify_algorithm_exists,
-    verify_user_credits
+    verify_algorithm_exists
 )
-from src.services.generation_service import GenerationService
+from src.services.generation_service import GenerationService, IdempotencyKeyReused, InsufficientCredits
+from src.services.generation_events import progress_bus
+from src.services.generation_eta import estimate_completions, generation_durations
+from src.services.generation_status import get_statuses
 
 router = APIRouter()
 
@@ -47,57 +57,175 @@ async def get_algorithms(
 @router.post("/generations", response_model=GenerationResponse)
 async def create_generation(
     generation_data: GenerationCreate,
-    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Create a new thumbnail generation."""
+    """Create a new thumbnail generation.
+    
+    Clients that retry should send an ``Idempotency-Key`` header: every
+    request with the same key gets the generation the first one created,
+    and credits are only deducted once.
+    """
     
     # Verify algorithm exists and is active
     algorithm = await verify_algorithm_exists(generation_data.algorithm_id, db)
     
-    # Verify user has enough credits
-    await verify_user_credits(current_user, algorithm.cost_credits)
+    try:
+        generation_id = await GenerationService().submit_generation(
+            current_user.id,
+            algorithm,
+            generation_data,
+            idempotency_key
+        )
+    except InsufficientCredits as e:
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail=str(e)
+        )
+    except IdempotencyKeyReused as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
     
-    # Create generation record
-    generation = Generation(
-        user_id=current_user.id,
-        conversation_id=generation_data.conversation_id,
-        algorithm_id=generation_data.algorithm_id,
-        prompt=generation_data.prompt,
-        reference_images=json.dumps(generation_data.reference_images) if generation_data.reference_images else None,
-        parameters=json.dumps(generation_data.parameters) if generation_data.parameters else None,
-        credits_used=algorithm.cost_credits,
-        status=GenerationStatus.QUEUED
+    result = await db.execute(select(Generation).where(Generation.id == generation_id))
+    return GenerationResponse.model_validate(result.scalar_one())
+
+
+@router.post("/generations/batches", response_model=GenerationBatchResponse)
+async def create_generation_batch(
+    batch_data: GenerationBatchCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Create several variants of one thumbnail idea in one request.
+    
+    Credits for the whole batch are reserved in one transaction; if the
+    user can't pay for all variants nothing is created. Workers analyze the
+    shared base prompt once for the batch and spread the variants over the
+    best matching templates; how many run at once is bounded by the user's
+    in-flight cap in the scheduler.
+    """
+    
+    prompts = batch_data.variant_prompts()
+    algorithm = await verify_algorithm_exists(batch_data.algorithm_id, db)
+    total_credits = algorithm.cost_credits * len(prompts)
+    
+    # Reserve credits atomically, so concurrent requests can't spend the same balance
+    reserved = await db.execute(
+        update(User)
+        .where(User.id == current_user.id, User.credits >= total_credits)
+        .values(credits=User.credits - total_credits)
+        .execution_options(synchronize_session=False)
     )
+    if reserved.rowcount == 0:
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail=f"Insufficient credits. Required: {total_credits}, Available: {current_user.credits}"
+        )
     
-    db.add(generation)
-    
-    # Deduct credits from user
-    current_user.deduct_credits(algorithm.cost_credits)
-    
-    # Create credit transaction
-    transaction = CreditTransaction(
+    batch = GenerationBatch(
+        id=str(uuid.uuid4()),
+        user_id=current_user.id,
+        algorithm_id=algorithm.id,
+        prompt=batch_data.prompt,
+        size=len(prompts),
+        credits_used=total_credits
+    )
+    db.add(batch)
+    await db.flush()
+    
+    # One multi-row INSERT for all variants; committing them enqueues them
+    now = datetime.utcnow()
+    await db.execute(insert(Generation), [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": current_user.id,
+            "conversation_id": str(batch_data.conversation_id) if batch_data.conversation_id else None,
+            "algorithm_id": algorithm.id,
+            "batch_id": batch.id,
+            "batch_index": index,
+            "prompt": prompt,
+            "reference_images": json.dumps(batch_data.reference_images) if batch_data.reference_images else None,
+            "parameters": json.dumps(batch_data.parameters) if batch_data.parameters else None,
+            "credits_used": algorithm.cost_credits,
+            "status": GenerationStatus.QUEUED,
+            "progress": 0,
+            "created_at": now
+        }
+        for index, prompt in enumerate(prompts)
+    ])
+    
+    db.add(CreditTransaction(
         user_id=current_user.id,
         type="usage",
-        amount=-algorithm.cost_credits,
-        description=f"Thumbnail generation using {algorithm.display_name}",
-        reference_id=generation.id
+        amount=-total_credits,
+        description=f"Batch of {len(prompts)} thumbnail generations using {algorithm.display_name}",
+        reference_id=batch.id
+    ))
+    await db.commit()
+    
+    return await _batch_response(batch, db)
+
+
+@router.get("/generations/batches/{batch_id}", response_model=GenerationBatchResponse)
+async def get_generation_batch(
+    batch_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a batch with its aggregate progress and its generations."""
+    
+    result = await db.execute(
+        select(GenerationBatch).where(
+            GenerationBatch.id == batch_id,
+            GenerationBatch.user_id == current_user.id
+        )
     )
+    batch = result.scalar_one_or_none()
     
-    db.add(transaction)
-    await db.commit()
-    await db.refresh(generation)
-    
-    # Start generation in background
-    generation_service = GenerationService()
-    background_tasks.add_task(
-        generation_service.process_generation,
-        generation.id,
-        db
+    if not batch:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch not found"
+        )
+    
+    return await _batch_response(batch, db)
+
+
+async def _batch_response(batch: GenerationBatch, db: AsyncSession) -> GenerationBatchResponse:
+    result = await db.execute(
+        select(Generation)
+        .where(Generation.batch_id == batch.id)
+        .order_by(Generation.batch_index)
     )
+    generations = result.scalars().all()
+    estimates = await estimate_completions(db, generations)
     
-    return GenerationResponse.model_validate(generation)
+    status_counts = {}
+    progress_total = 0
+    generation_responses = []
+    for generation in generations:
+        gen_data = GenerationResponse.model_validate(generation)
+        gen_data.estimated_completion = estimates[generation.id]
+        generation_responses.append(gen_data)
+
+        status_counts[generation.status] = status_counts.get(generation.status, 0) + 1
+        finished = generation.status in (GenerationStatus.COMPLETED, GenerationStatus.FAILED, GenerationStatus.CANCELLED)
+        progress_total += 100 if finished else (generation.progress or 0)
+    
+    return GenerationBatchResponse(
+        id=batch.id,
+        algorithm_id=batch.algorithm_id,
+        prompt=batch.prompt,
+        size=batch.size,
+        credits_used=batch.credits_used,
+        created_at=batch.created_at,
+        progress=progress_total // len(generations) if generations else 0,
+        status_counts=status_counts,
+        generations=generation_responses
+    )
 
 
 @router.get("/generations", response_model=GenerationList)
@@ -123,12 +251,14 @@ async def get_generations(
         .limit(pagination.limit)
     )
     generations = result.scalars().all()
+    estimates = await estimate_completions(db, generations)
     
     # Convert to response format
     generation_responses = []
     for gen in generations:
         gen_data = GenerationResponse.model_validate(gen)
         gen_data.duration_seconds = gen.duration_seconds
+        gen_data.estimated_completion = estimates[gen.id]
         generation_responses.append(gen_data)
     
     pagination_info = pagination.get_pagination_info(total)
@@ -163,37 +293,111 @@ async def get_generation(
     
     gen_data = GenerationResponse.model_validate(generation)
     gen_data.duration_seconds = generation.duration_seconds
+    gen_data.estimated_completion = (await estimate_completions(db, [generation]))[generation.id]
     
     return gen_data
 
 
+@router.post("/generations/status", response_model=GenerationStatusList)
+async def get_generation_statuses(
+    status_request: GenerationStatusRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the status of several generations in one request.
+    
+    With ``wait``, long-polls: returns as soon as any generation moved past
+    its version in ``since`` (see ``GET /generations/{id}/status``).
+    """
+    
+    # Waiting requests must not hold a pooled connection
+    await db.close()
+    
+    statuses = await get_statuses(
+        current_user.id,
+        status_request.ids,
+        since=status_request.since,
+        wait=status_request.wait
+    )
+    return GenerationStatusList(statuses=statuses)
+
+
 @router.get("/generations/{generation_id}/status", response_model=GenerationProgress)
 async def get_generation_status(
     generation_id: str,
+    wait: float = Query(0.0, ge=0.0, le=settings.generation_status_max_wait),
+    since: Optional[int] = None,
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get generation status and progress."""
+    """Get generation status and progress.
+    
+    Long-polling: pass the ``version`` of the last response as ``since``
+    and up to ``wait`` seconds; the request returns as soon as the status
+    changes, or after ``wait`` seconds with the unchanged status.
+    """
+    
+    # Waiting requests must not hold a pooled connection
+    await db.close()
+    
+    statuses = await get_statuses(
+        current_user.id,
+        [generation_id],
+        since={generation_id: since} if since is not None else None,
+        wait=wait
+    )
+    
+    if not statuses:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Generation not found"
+        )
+    
+    return statuses[0]
+
+
+@router.get("/generations/{generation_id}/events")
+async def stream_generation_events(
+    generation_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream generation progress over Server-Sent Events.
+    
+    Events:
+    - ``progress``: ``{"generation_id", "status", "progress", "stage", "at"}``,
+      first the current state, then every change; final events also carry
+      ``result_url`` or ``message``. The stream ends after a final status.
+    
+    A comment line is sent when nothing happened for a while, to keep
+    proxies from closing the connection.
+    """
     
     result = await db.execute(
-        select(Generation).where(
+        select(Generation.id).where(
             Generation.id == generation_id,
             Generation.user_id == current_user.id
         )
     )
-    generation = result.scalar_one_or_none()
-    
-    if not generation:
+    if result.scalar_one_or_none() is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Generation not found"
         )
-    
-    return GenerationProgress(
-        generation_id=generation.id,
-        status=generation.status,
-        progress=generation.progress,
-        message=generation.error_message if generation.is_failed else None
+    # The stream can stay open for minutes; don't keep a pooled connection
+    await db.close()
+    
+    async def event_stream():
+        async for event in progress_bus.watch(generation_id):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
@@ -225,9 +429,12 @@ async def cancel_generation(
             detail="Cannot cancel completed, failed, or already cancelled generation"
         )
     
-    # Cancel generation
-    generation.status = GenerationStatus.CANCELLED
-    await db.commit()
+    # Cancel generation and stop its pipeline if one is running
+    if not await GenerationService().cancel_generation(generation.id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Generation finished before it could be cancelled"
+        )
     
     return {"message": "Generation cancelled successfully"}
 
@@ -285,6 +492,8 @@ async def get_generation_stats(
         successful_generations=successful_generations,
         failed_generations=failed_generations,
         total_credits_used=total_credits_used,
+        # Rolling mean of recent runs, from the duration sketches rather than the user's rows
+        average_completion_time=generation_durations.average_run_time(most_used_algorithm),
         most_used_algorithm=most_used_algorithm
     )
 
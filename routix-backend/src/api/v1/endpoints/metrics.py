@@ -0,0 +1,74 @@
+from fastapi import APIRouter
+
+from src.core.circuit_breaker import all_breakers
+from src.core.rate_limit import all_limiters
+from src.services.ai_service import analysis_cache, inflight
+from src.services.template_index import template_catalog
+from src.services.template_counters import template_counters
+from src.services.template_search import facet_cache
+from src.services.generation_queue import generation_queue
+from src.services.generation_worker import worker_reports
+from src.services.generation_cancellation import generation_cancellation
+from src.services.generation_events import progress_bus
+from src.services.generation_eta import generation_durations
+from src.services.generation_service import idempotency_keys, submissions
+
+router = APIRouter()
+
+
+@router.get("/cache")
+async def get_cache_metrics():
+    """Get hit/miss counters for the application caches."""
+    return {
+        "analysis": analysis_cache.stats(),
+        "template_facets": facet_cache.stats()
+    }
+
+
+@router.get("/inflight")
+async def get_inflight_metrics():
+    """Get single-flight coalescing counters for AI calls."""
+    return inflight.stats()
+
+
+@router.get("/providers")
+async def get_provider_metrics():
+    """Get circuit breaker state for each AI provider."""
+    return {
+        name: breaker.snapshot()
+        for name, breaker in all_breakers().items()
+    }
+
+
+@router.get("/limiters")
+async def get_limiter_metrics():
+    """Get rate and concurrency limiter state for each provider model."""
+    return {
+        name: limiter.snapshot()
+        for name, limiter in all_limiters().items()
+    }
+
+
+@router.get("/templates")
+async def get_template_index_metrics():
+    """Get template catalog snapshot state and write-behind counter totals."""
+    return {
+        "catalog": template_catalog.stats(),
+        "counters": template_counters.stats()
+    }
+
+
+@router.get("/generations")
+async def get_generation_queue_metrics():
+    """Get generation queue depth, throughput, the live worker processes and stage durations."""
+    return {
+        "queue": await generation_queue.snapshot(),
+        "workers": await worker_reports(),
+        "cancellation": generation_cancellation.stats(),
+        "events": progress_bus.stats(),
+        "durations": generation_durations.stats(),
+        "idempotency": {
+            "keys": idempotency_keys.stats(),
+            "submissions": submissions.stats()
+        }
+    }
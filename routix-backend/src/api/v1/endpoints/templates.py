@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.database import get_db
+from src.models.template import Template
+from src.models.user import User
+from src.schemas.template import TemplateRatingRequest, TemplateSearchRequest, TemplateSearchResponse
+from src.api.dependencies import get_current_active_user
+from src.services.template_counters import template_counters
+from src.services.template_search import InvalidCursor, search_templates
+
+router = APIRouter()
+
+
+@router.post("/search", response_model=TemplateSearchResponse)
+async def search_template_catalog(
+    search: TemplateSearchRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Full-text search over active templates with facet counts.
+    
+    Pass ``next_cursor`` from a response as ``cursor`` to get the next page.
+    """
+    
+    try:
+        return await search_templates(db, search)
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/{template_id}/rating", status_code=status.HTTP_202_ACCEPTED)
+async def rate_template(
+    template_id: str,
+    rating_data: TemplateRatingRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Rate a template from 1 to 5.
+    
+    The rating is folded into the template's average on the next counter
+    flush, so it can take a few seconds to show up.
+    """
+    
+    result = await db.execute(
+        select(Template.id).where(Template.id == template_id, Template.is_active == True)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Template not found"
+        )
+    
+    template_counters.record_rating(template_id, rating_data.rating)
+    return {"message": "Rating recorded"}
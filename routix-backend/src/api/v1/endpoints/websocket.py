@@ -5,10 +5,12 @@ import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from src.core.database import get_db
-from src.core.security import decode_access_token
+from src.core.database import get_db, AsyncSessionLocal
+from src.core.security import verify_token
 from src.models.conversation import Conversation, Message
+from src.models.generation import Generation
 from src.models.user import User
+from src.services.generation_events import progress_bus
 
 router = APIRouter()
 
@@ -104,7 +106,7 @@ async def websocket_chat_endpoint(
         return
     
     try:
-        payload = decode_access_token(token)
+        payload = verify_token(token)
         user_id = payload.get("sub")
         
         if not user_id:
@@ -151,7 +153,7 @@ async def websocket_chat_endpoint(
                     conversation_id=conversation_id,
                     role="user",
                     content=message_data.get("content"),
-                    metadata=json.dumps(message_data.get("metadata", {}))
+                    metadata_=json.dumps(message_data.get("metadata", {}))
                 )
                 db.add(new_message)
                 await db.commit()
@@ -218,7 +220,7 @@ async def process_ai_response(
     db: AsyncSession
 ):
     """پردازش پاسخ AI به صورت async"""
-    from src.services.ai_service import AIService
+    from src.services.ai_service import get_ai_service
     
     try:
         # گرفتن پیام کاربر
@@ -241,7 +243,7 @@ async def process_ai_response(
         )
         
         # تحلیل و تولید پاسخ
-        ai_service = AIService()
+        ai_service = get_ai_service()
         analysis = await ai_service.analyze_prompt(user_message.content)
         
         # ایجاد پیام AI
@@ -249,7 +251,7 @@ async def process_ai_response(
             conversation_id=conversation_id,
             role="assistant",
             content=json.dumps(analysis, ensure_ascii=False),
-            metadata=json.dumps({"analysis": True, "type": "prompt_analysis"})
+            metadata_=json.dumps({"analysis": True, "type": "prompt_analysis"})
         )
         db.add(ai_message)
         await db.commit()
@@ -294,6 +296,49 @@ async def process_ai_response(
         )
 
 
+@router.websocket("/ws/generations/{generation_id}")
+async def websocket_generation_endpoint(
+    websocket: WebSocket,
+    generation_id: str,
+    token: str = Query(...)
+):
+    """WebSocket endpoint for the progress of one generation.
+    
+    Sends the events of ``GET /generations/{id}/events`` as
+    ``{"type": "progress", ...}`` messages and ``{"type": "ping"}`` while
+    idle, and closes after the final status.
+    """
+    
+    try:
+        user_id = verify_token(token).get("sub")
+    except Exception:
+        user_id = None
+    if not user_id:
+        await websocket.close(code=1008, reason="Invalid token")
+        return
+    
+    # Short-lived session: the socket can stay open for minutes
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Generation.id).where(
+                Generation.id == generation_id,
+                Generation.user_id == user_id
+            )
+        )
+        owned = result.scalar_one_or_none() is not None
+    if not owned:
+        await websocket.close(code=1003, reason="Generation not found")
+        return
+    
+    await websocket.accept()
+    try:
+        async for event in progress_bus.watch(generation_id):
+            await websocket.send_json({"type": "ping"} if event is None else {"type": "progress", **event})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
 @router.get("/ws/stats")
 async def get_websocket_stats():
     """دریافت آمار WebSocket connections"""
@@ -0,0 +1,125 @@
+"""
+Two-tier cache: an in-process LRU in front of a shared Redis tier.
+
+Values must be JSON-serializable. The in-process tier holds the value
+itself, so callers must not mutate what ``get`` returns.
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from redis.exceptions import RedisError
+
+from src.core.redis import get_redis, mark_redis_unavailable
+
+
+class LRUCache:
+    """Size-bounded in-process cache with per-entry TTL."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TwoTierCache:
+    """In-process LRU backed by Redis, with hit/miss counters."""
+
+    def __init__(self, namespace: str, max_size: int, ttl: int, use_redis: bool = True):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self.local = LRUCache(max_size, ttl)
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _redis_key(self, key: str) -> str:
+        return f"routix:{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+
+        redis = get_redis() if self.use_redis else None
+        if redis is not None:
+            try:
+                raw = await redis.get(self._redis_key(key))
+            except (RedisError, OSError) as e:
+                mark_redis_unavailable(e)
+                raw = None
+
+            if raw is not None:
+                value = json.loads(raw)
+                self.local.set(key, value)
+                self.redis_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any):
+        self.local.set(key, value)
+
+        redis = get_redis() if self.use_redis else None
+        if redis is not None:
+            try:
+                await redis.set(self._redis_key(key), json.dumps(value), ex=self.ttl)
+            except (RedisError, OSError) as e:
+                mark_redis_unavailable(e)
+
+    async def delete(self, key: str):
+        self.local.delete(key)
+
+        redis = get_redis() if self.use_redis else None
+        if redis is not None:
+            try:
+                await redis.delete(self._redis_key(key))
+            except (RedisError, OSError) as e:
+                mark_redis_unavailable(e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters for this cache."""
+        lookups = self.local_hits + self.redis_hits + self.misses
+        hits = self.local_hits + self.redis_hits
+        return {
+            "namespace": self.namespace,
+            "size": len(self.local),
+            "max_size": self.local.max_size,
+            "ttl": self.ttl,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
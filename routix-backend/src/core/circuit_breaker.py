@@ -0,0 +1,170 @@
+"""
+Circuit breakers for outbound providers.
+
+Each breaker keeps a rolling window of recent calls (outcome and latency).
+When the error rate or slow-call rate in the window crosses its threshold,
+the breaker opens and calls are rejected immediately. After a cooldown it
+goes half-open and lets a few probe calls through: if they succeed the
+breaker closes, otherwise it opens again.
+"""
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+from src.core.config import settings
+
+
+class CircuitState:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker with half-open probing."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_rate_threshold: float = 0.8,
+        min_calls: int = 5,
+        window_seconds: float = 60.0,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CircuitState.CLOSED
+        self.opened_at = 0.0
+        self.half_open_in_flight = 0
+        self.rejected = 0
+        # (timestamp, success, slow, latency)
+        self._calls: Deque[Tuple[float, bool, bool, float]] = deque()
+
+    def allow_request(self) -> bool:
+        """Check whether a call may go through, reserving a probe slot when half-open."""
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = CircuitState.HALF_OPEN
+            self.half_open_in_flight = 0
+
+        if self.state == CircuitState.HALF_OPEN:
+            if self.half_open_in_flight >= self.half_open_max_calls:
+                self.rejected += 1
+                return False
+            self.half_open_in_flight += 1
+
+        return True
+
+    @property
+    def is_available(self) -> bool:
+        """Check whether a call would be allowed, without reserving a slot."""
+        if self.state == CircuitState.OPEN:
+            return time.monotonic() - self.opened_at >= self.open_seconds
+        if self.state == CircuitState.HALF_OPEN:
+            return self.half_open_in_flight < self.half_open_max_calls
+        return True
+
+    def record_success(self, latency: float, slow: bool = False):
+        self._record(True, slow, latency)
+        if self.state == CircuitState.HALF_OPEN:
+            self._close()
+        else:
+            self._evaluate()
+
+    def record_failure(self, latency: float):
+        self._record(False, False, latency)
+        if self.state == CircuitState.HALF_OPEN:
+            self._open()
+        else:
+            self._evaluate()
+
+    def release(self):
+        """Release a reserved probe slot without recording an outcome (e.g. on cancellation)."""
+        if self.state == CircuitState.HALF_OPEN and self.half_open_in_flight > 0:
+            self.half_open_in_flight -= 1
+
+    def _record(self, success: bool, slow: bool, latency: float):
+        now = time.monotonic()
+        self._calls.append((now, success, slow, latency))
+        self._trim(now)
+
+    def _trim(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def _evaluate(self):
+        total = len(self._calls)
+        if self.state != CircuitState.CLOSED or total < self.min_calls:
+            return
+
+        failures = sum(1 for _, success, _, _ in self._calls if not success)
+        slow = sum(1 for _, _, is_slow, _ in self._calls if is_slow)
+        if failures / total >= self.failure_rate_threshold or slow / total >= self.slow_call_rate_threshold:
+            self._open()
+
+    def _open(self):
+        if self.state != CircuitState.OPEN:
+            print(f"⚡ Circuit breaker '{self.name}' opened")
+        self.state = CircuitState.OPEN
+        self.opened_at = time.monotonic()
+        self.half_open_in_flight = 0
+
+    def _close(self):
+        print(f"✅ Circuit breaker '{self.name}' closed")
+        self.state = CircuitState.CLOSED
+        self.half_open_in_flight = 0
+        self._calls.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the breaker state and rolling window statistics."""
+        self._trim(time.monotonic())
+        total = len(self._calls)
+        latencies = sorted(latency for _, _, _, latency in self._calls)
+        failures = sum(1 for _, success, _, _ in self._calls if not success)
+        slow = sum(1 for _, _, is_slow, _ in self._calls if is_slow)
+
+        return {
+            "name": self.name,
+            "state": self.state,
+            "calls": total,
+            "failure_rate": round(failures / total, 4) if total else 0.0,
+            "slow_call_rate": round(slow / total, 4) if total else 0.0,
+            "latency_p50": round(latencies[total // 2], 3) if total else None,
+            "latency_p99": round(latencies[min(total - 1, int(total * 0.99))], 3) if total else None,
+            "rejected": self.rejected,
+            "retry_in": max(0.0, round(self.open_seconds - (time.monotonic() - self.opened_at), 1))
+            if self.state == CircuitState.OPEN else None
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get the process-wide breaker for a provider, creating it on first use."""
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(
+            name,
+            failure_rate_threshold=settings.breaker_failure_rate,
+            slow_call_rate_threshold=settings.breaker_slow_call_rate,
+            min_calls=settings.breaker_min_calls,
+            window_seconds=settings.breaker_window_seconds,
+            open_seconds=settings.breaker_open_seconds,
+            half_open_max_calls=settings.breaker_half_open_calls
+        )
+    return _breakers[name]
+
+
+def all_breakers() -> Dict[str, CircuitBreaker]:
+    return dict(_breakers)
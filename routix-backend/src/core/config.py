@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field, validator
-from typing import Optional, List
+from typing import Optional, List, Dict
 import os
 import secrets
 
@@ -48,9 +48,65 @@ class Settings(BaseSettings):
     openai_api_key: Optional[str] = None
     gemini_api_key: Optional[str] = None
     midjourney_api_key: Optional[str] = None
+    stability_api_key: Optional[str] = None
+    
+    # AI provider timeouts (seconds)
+    openai_timeout: float = 30.0
+    openai_image_timeout: float = 90.0
+    gemini_timeout: float = 30.0
+    stability_timeout: float = 60.0
+    
+    # Provider circuit breakers
+    breaker_failure_rate: float = 0.5
+    breaker_slow_call_rate: float = 0.8
+    breaker_slow_call_ratio: float = 0.8  # fraction of the provider timeout that counts as slow
+    breaker_min_calls: int = 5
+    breaker_window_seconds: float = 60.0
+    breaker_open_seconds: float = 30.0
+    breaker_half_open_calls: int = 1
+    
+    # Provider rate shaping (requests/second, burst size, max concurrency)
+    provider_rate_limits: Dict[str, float] = {"openai": 5.0, "gemini": 5.0, "stability": 2.0}
+    provider_burst: Dict[str, float] = {"openai": 10.0, "gemini": 10.0, "stability": 4.0}
+    provider_max_concurrency: Dict[str, int] = {"openai": 16, "gemini": 16, "stability": 8}
+    limiter_min_concurrency: int = 1
+    
+    # Outbound HTTP connection pool
+    http_pool_size: int = 100
+    http_pool_size_per_host: int = 20
+    http_dns_cache_ttl: int = 300  # seconds
+    http_keepalive_timeout: float = 30.0
+    http_timeout: float = 120.0
+    
+    # Reference images for vision analysis
+    vision_max_dimension: int = 768
+    vision_jpeg_quality: int = 85
+    vision_image_cache_size: int = 256
+    vision_image_cache_ttl: int = 3600  # seconds
+    
+    # Template catalog snapshot
+    template_catalog_check_interval: float = 5.0  # seconds between cluster version checks
+    template_index_refresh_interval: int = 300  # max snapshot age, seconds
+    counter_flush_interval: float = 5.0  # template usage/rating write-behind, seconds
+    template_facet_cache_ttl: int = 60  # search facet counts, seconds
+    
+    # Thread pool for blocking work (image decoding, file reads)
+    ai_executor_workers: int = 8
     
     # Redis
     redis_url: str = "redis://localhost:6379"
+    redis_enabled: bool = True
+    
+    # Chat pipeline: "sequential", "speculative" or "structured"
+    chat_pipeline_mode: str = "speculative"
+    
+    # Local intent classifier: messages scored between these bounds go to the LLM
+    intent_confidence_high: float = 0.85
+    intent_confidence_low: float = 0.15
+    
+    # Prompt analysis cache
+    analysis_cache_size: int = 1024
+    analysis_cache_ttl: int = 3600  # seconds
     
     # File Upload
     max_file_size: int = 10 * 1024 * 1024  # 10MB
@@ -63,6 +119,32 @@ class Settings(BaseSettings):
     # Generation
     max_generations_per_hour: int = 20
     
+    # Generation job queue and workers
+    generation_lease_seconds: float = 60.0  # visibility timeout of a claimed job
+    generation_heartbeat_interval: float = 15.0
+    generation_max_attempts: int = 3
+    generation_poll_interval: float = 1.0  # seconds between claims while the queue is empty
+    generation_worker_concurrency: int = 4
+    generation_shutdown_grace: float = 30.0  # seconds running jobs get to finish on shutdown
+    generation_worker_embedded: bool = True  # also run a worker inside the API process (off when using src.worker)
+    generation_progress_write_interval: float = 5.0  # min seconds between intermediate progress writes
+    generation_events_keepalive: float = 15.0  # SSE/WebSocket ping (and status re-check) interval
+    generation_status_max_wait: float = 30.0  # longest status long-poll, seconds
+    generation_status_batch_limit: int = 100  # ids per bulk status request
+    generation_batch_max_size: int = 20  # variants per POST /generations/batches
+    generation_idempotency_ttl: int = 86400  # seconds a submitted Idempotency-Key stays cached
+    generation_idempotency_cache_size: int = 10000
+    
+    # Fair scheduling across subscription tiers (see generation_scheduler)
+    generation_tier_weights: Dict[str, float] = {"free": 1.0, "pro": 4.0, "enterprise": 8.0}
+    generation_user_max_inflight: Dict[str, int] = {"free": 1, "pro": 3, "enterprise": 5}
+    generation_claim_window: int = 100  # claimable jobs per tier the scheduler chooses from
+    
+    # Completion estimates (see generation_eta)
+    generation_eta_half_life: float = 3600.0  # seconds until a stage duration counts half
+    generation_eta_rate_half_life: float = 300.0  # same for the completion rate behind queue estimates
+    generation_eta_sync_interval: float = 30.0  # seconds between merging duration sketches across processes
+    
     # CORS
     allowed_origins: List[str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
     
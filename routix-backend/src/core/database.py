@@ -1,6 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, inspect
+from sqlalchemy.schema import CreateColumn, CreateIndex
 from src.core.config import settings
 import asyncio
 
@@ -40,11 +41,29 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+def _add_missing_columns_and_indexes(connection):
+    """Add model columns and indexes that create_all skips on existing tables.
+
+    Columns added this way must be nullable or have a server default.
+    """
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                print(f"🛠️  Added column {table.name}.{column.name}")
+        for index in table.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+
+
 # Create tables
 async def create_tables():
-    from src.models import user, conversation, generation, algorithm
+    from src.models import user, conversation, generation, algorithm, template
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns_and_indexes)
 
 
 # Initialize database
@@ -0,0 +1,50 @@
+"""
+Application-scoped outbound HTTP client.
+
+All outbound HTTP (AI providers, image downloads) shares one aiohttp
+session so connections are kept alive and reused, per-host connections are
+bounded, and DNS lookups are cached. The session is opened in the FastAPI
+lifespan and closed on shutdown; code running outside the app (scripts,
+workers) gets a session lazily on first use.
+"""
+from typing import Optional
+
+import aiohttp
+
+from src.core.config import settings
+
+
+class HTTPClient:
+    """Holder for the shared aiohttp session."""
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        """Open the shared session."""
+        self.session
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Get the shared session, opening it if needed."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.http_pool_size,
+                limit_per_host=settings.http_pool_size_per_host,
+                ttl_dns_cache=settings.http_dns_cache_ttl,
+                keepalive_timeout=settings.http_keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=settings.http_timeout)
+            )
+        return self._session
+
+    async def close(self):
+        """Close the shared session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+http_client = HTTPClient()
@@ -0,0 +1,89 @@
+"""
+Redis pub/sub for signals between API and worker processes.
+
+Like the rest of the Redis usage this is best effort: ``publish`` returns
+False when Redis is disabled or down, and a ``ChannelListener`` keeps
+retrying in the background until Redis is back. Callers must have a
+fallback (usually the database) for messages that never arrive.
+"""
+import asyncio
+from typing import Callable, Optional
+
+from redis.exceptions import RedisError
+
+from src.core.redis import RETRY_AFTER_SECONDS, get_redis, mark_redis_unavailable
+
+
+async def publish(channel: str, data: str) -> bool:
+    """Publish a message; returns False if Redis is unavailable."""
+    redis = get_redis()
+    if redis is None:
+        return False
+    try:
+        await redis.publish(channel, data)
+        return True
+    except (RedisError, OSError) as e:
+        mark_redis_unavailable(e)
+        return False
+
+
+class ChannelListener:
+    """Calls ``handler`` with the data of every message published on a channel.
+
+    ``start()`` and ``stop()`` are reference counted so several components
+    of one process can share a listener.
+    """
+
+    def __init__(self, channel: str, handler: Callable[[bytes], None]):
+        self.channel = channel
+        self.handler = handler
+        self._task: Optional[asyncio.Task] = None
+        self._users = 0
+        self.received = 0
+
+    @property
+    def listening(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        self._users += 1
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def stop(self):
+        self._users = max(0, self._users - 1)
+        if self._users or self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _listen(self):
+        while True:
+            redis = get_redis()
+            if redis is None:
+                await asyncio.sleep(RETRY_AFTER_SECONDS)
+                continue
+
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    self.received += 1
+                    try:
+                        self.handler(message["data"])
+                    except Exception as e:
+                        print(f"⚠️  Bad message on {self.channel}: {e}")
+            except (RedisError, OSError) as e:
+                mark_redis_unavailable(e)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except (RedisError, OSError):
+                    pass
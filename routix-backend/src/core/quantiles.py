@@ -0,0 +1,86 @@
+"""
+Streaming quantile sketch for durations.
+
+Values go into logarithmic buckets (a DDSketch): bucket ``i`` holds the
+values in ``(gamma^(i-1), gamma^i]``, so any quantile is answered within
+``relative_accuracy`` of the true value from a few hundred counters,
+however many values were added. Sketches merge by adding their buckets,
+which is how the sketches of several processes are combined.
+
+Counts are floats so a sketch can be decayed: ``decay(0.5)`` halves the
+weight of everything seen so far, which turns it into a rolling window
+that favours recent values.
+"""
+import math
+from typing import Any, Dict, Optional
+
+MIN_VALUE = 1e-3  # smaller values share the lowest bucket
+MIN_WEIGHT = 1e-3  # decayed buckets below this are dropped
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with relative accuracy."""
+
+    def __init__(self, relative_accuracy: float = 0.02):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, float] = {}
+        self.count = 0.0
+        self.sum = 0.0
+
+    def add(self, value: float, weight: float = 1.0):
+        index = math.ceil(math.log(max(value, MIN_VALUE)) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0.0) + weight
+        self.count += weight
+        self.sum += value * weight
+
+    def merge(self, other: "QuantileSketch"):
+        for index, weight in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0.0) + weight
+        self.count += other.count
+        self.sum += other.sum
+
+    def decay(self, factor: float):
+        """Scale every count by ``factor`` (0..1)."""
+        if factor >= 1.0:
+            return
+        self.buckets = {
+            index: weight * factor
+            for index, weight in self.buckets.items()
+            if weight * factor >= MIN_WEIGHT
+        }
+        self.count = sum(self.buckets.values())
+        self.sum *= factor
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile ``q`` (0..1), or None while empty."""
+        if not self.buckets:
+            return None
+        rank = q * self.count
+        seen = 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                break
+        # Midpoint of the bucket, within relative_accuracy of every value in it
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count > 0 else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "buckets": {str(index): weight for index, weight in self.buckets.items()},
+            "sum": self.sum
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(data.get("relative_accuracy", 0.02))
+        sketch.buckets = {int(index): weight for index, weight in data.get("buckets", {}).items()}
+        sketch.count = sum(sketch.buckets.values())
+        sketch.sum = data.get("sum", 0.0)
+        return sketch
@@ -0,0 +1,177 @@
+"""
+Per-provider, per-model rate shaping.
+
+Every provider call first takes a token from a token bucket (steady
+request rate with a bounded burst) and then a slot from an adaptive
+concurrency limiter. The limiter follows AIMD: each successful fast call
+raises the limit a little, a throttled (429) call halves it and a slow call
+shrinks it. Callers that cannot get a token or slot wait in FIFO order
+instead of failing.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+from src.core.config import settings
+
+
+class TokenBucket:
+    """Token bucket with FIFO waiters."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Take one token, waiting for the bucket to refill if needed."""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit with FIFO waiters."""
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        backoff_ratio: float = 0.5,
+        slow_ratio: float = 0.9
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+        self.slow_ratio = slow_ratio
+        self.in_flight = 0
+        self.throttled = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    async def acquire(self):
+        """Take a concurrency slot, waiting in line if the limit is reached."""
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as we were cancelled; pass it on
+                self.in_flight -= 1
+                self._wake()
+            raise
+
+    def release(self, latency: Optional[float] = None, throttled: bool = False):
+        """Return a slot and adjust the limit from the call outcome.
+
+        ``latency`` is None when the call was abandoned (cancelled), in which
+        case the limit is left alone.
+        """
+        self.in_flight -= 1
+
+        if throttled:
+            self.throttled += 1
+            self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        elif latency is not None:
+            if latency > self.latency_target:
+                self.limit = max(self.min_limit, self.limit * self.slow_ratio)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+
+class ProviderLimiter:
+    """Token bucket plus adaptive concurrency limit for one provider model."""
+
+    def __init__(self, name: str, rate: float, burst: float, max_concurrency: int, latency_target: float):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial_limit=max(settings.limiter_min_concurrency, max_concurrency // 2),
+            min_limit=settings.limiter_min_concurrency,
+            max_limit=max_concurrency,
+            latency_target=latency_target
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a rate-limited concurrency slot for the duration of one call.
+
+        The yielded dict lets the caller report the outcome: set
+        ``throttled`` to True on a 429, and ``latency`` once the call ends.
+        """
+        await self.bucket.acquire()
+        await self.concurrency.acquire()
+        outcome: Dict[str, Any] = {"latency": None, "throttled": False}
+        try:
+            yield outcome
+        finally:
+            self.concurrency.release(outcome["latency"], outcome["throttled"])
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "rate": self.bucket.rate,
+            "tokens": round(self.bucket.tokens, 2),
+            "limit": round(self.concurrency.limit, 2),
+            "max_limit": self.concurrency.max_limit,
+            "in_flight": self.concurrency.in_flight,
+            "queued": self.concurrency.queued,
+            "throttled": self.concurrency.throttled
+        }
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+
+
+def get_limiter(provider: str, model: str, latency_target: float) -> ProviderLimiter:
+    """Get the process-wide limiter for a provider model, creating it on first use."""
+    key = f"{provider}:{model}"
+    if key not in _limiters:
+        rate = settings.provider_rate_limits.get(provider, 5.0)
+        _limiters[key] = ProviderLimiter(
+            key,
+            rate=rate,
+            burst=settings.provider_burst.get(provider, rate * 2),
+            max_concurrency=settings.provider_max_concurrency.get(provider, 8),
+            latency_target=latency_target
+        )
+    return _limiters[key]
+
+
+def all_limiters() -> Dict[str, ProviderLimiter]:
+    return dict(_limiters)
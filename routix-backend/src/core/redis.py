@@ -0,0 +1,48 @@
+"""
+Shared Redis client.
+
+Redis is optional: every caller must handle ``get_redis()`` returning None
+and treat Redis errors as a cache miss rather than a request failure.
+"""
+import time
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from src.core.config import settings
+
+_client: Optional[aioredis.Redis] = None
+_disabled_until: float = 0.0
+
+# How long to stop trying Redis after a connection error
+RETRY_AFTER_SECONDS = 30.0
+
+
+def get_redis() -> Optional[aioredis.Redis]:
+    """Get the shared Redis client, or None if Redis is disabled or down."""
+    global _client
+    if not settings.redis_enabled or time.monotonic() < _disabled_until:
+        return None
+    if _client is None:
+        _client = aioredis.from_url(
+            settings.redis_url,
+            socket_connect_timeout=1.0,
+            socket_timeout=1.0
+        )
+    return _client
+
+
+def mark_redis_unavailable(error: Exception):
+    """Back off from Redis for a while after a connection error."""
+    global _disabled_until
+    if time.monotonic() >= _disabled_until:
+        print(f"⚠️  Redis unavailable ({error}), retrying in {RETRY_AFTER_SECONDS:.0f}s")
+    _disabled_until = time.monotonic() + RETRY_AFTER_SECONDS
+
+
+async def close_redis():
+    """Close the shared Redis client (called on application shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -2,12 +2,22 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
 import os
 
 from src.core.database import create_tables, AsyncSessionLocal
 from src.api.v1.api import api_router
 from src.core.config import settings
 from src.core.seed_data import seed_database
+from src.core.redis import close_redis
+from src.core.http import http_client
+from src.services.ai_providers import shutdown_executor
+from src.services.template_index import template_catalog
+from src.services.template_counters import template_counters
+from src.services.template_search import ensure_search_index
+from src.services.generation_worker import GenerationWorker
+from src.services.generation_events import progress_bus
+from src.services.generation_eta import generation_durations
 
 
 @asynccontextmanager
@@ -15,15 +25,38 @@ async def lifespan(app: FastAPI):
     # Startup
     print("Starting Routix API...")
     await create_tables()
+    await http_client.start()
     
     # Seed database with initial data
     async with AsyncSessionLocal() as db:
+        await ensure_search_index(db)
         await seed_database(db)
     
     print("Database initialized and seeded")
+    
+    # Load the template catalog so the first generation doesn't wait for it
+    await template_catalog.rebuild()
+    template_counters.start()
+    progress_bus.start()
+    generation_durations.start()
+    
+    # Development: run generations in this process too
+    worker = None
+    if settings.generation_worker_embedded:
+        worker = GenerationWorker(settings.generation_worker_concurrency)
+        worker_task = asyncio.get_running_loop().create_task(worker.run())
     yield
     # Shutdown
     print("Shutting down Routix API...")
+    if worker is not None:
+        await worker.stop()
+        await worker_task
+    await generation_durations.stop()
+    await progress_bus.stop()
+    await template_counters.stop()
+    await http_client.close()
+    shutdown_executor()
+    await close_redis()
 
 
 app = FastAPI(
@@ -1,6 +1,6 @@
 from .user import User, SubscriptionTier
 from .conversation import Conversation, Message
-from .generation import Generation, GenerationStatus, CreditTransaction
+from .generation import Generation, GenerationStatus, GenerationBatch, GenerationDurationStats, CreditTransaction
 from .algorithm import Algorithm
 from .template import Template
 
@@ -11,6 +11,8 @@ __all__ = [
     "Message",
     "Generation",
     "GenerationStatus",
+    "GenerationBatch",
+    "GenerationDurationStats",
     "CreditTransaction",
     "Algorithm",
     "Template"
@@ -54,7 +54,8 @@ class Message(Base):
     role = Column(String(20), nullable=False)  # "user" or "assistant"
     content = Column(Text, nullable=False)
     attachments = Column(Text, nullable=True)  # JSON string for file attachments
-    metadata = Column(Text, nullable=True)  # JSON string for additional data
+    # JSON string for additional data; "metadata" is reserved on declarative models
+    metadata_ = Column("metadata", Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
+from typing import Any, Dict
 import uuid
 import enum
 
@@ -17,11 +18,20 @@ class GenerationStatus(str, enum.Enum):
 
 class Generation(Base):
     __tablename__ = "generations"
+    __table_args__ = (
+        # Job queue claims scan queued and expired rows oldest first
+        Index("ix_generations_status_created", "status", "created_at"),
+        # A retried submission can't create a second generation (see GenerationService.submit_generation)
+        Index("ux_generations_user_idempotency_key", "user_id", "idempotency_key", unique=True),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     conversation_id = Column(String, ForeignKey("conversations.id"), nullable=True)
     algorithm_id = Column(String, ForeignKey("algorithms.id"), nullable=False)
+    batch_id = Column(String, ForeignKey("generation_batches.id"), nullable=True, index=True)
+    batch_index = Column(Integer, nullable=True)  # variant number within the batch
+    idempotency_key = Column(String(255), nullable=True)  # client's Idempotency-Key header, if sent
     
     # Generation details
     prompt = Column(Text, nullable=False)
@@ -40,6 +50,11 @@ class Generation(Base):
     # Credits and billing
     credits_used = Column(Integer, nullable=False)
     
+    # Job queue lease (see services/generation_queue.py)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    lease_owner = Column(String(100), nullable=True)  # worker id holding the job
+    lease_expires_at = Column(DateTime, nullable=True)  # reclaimable by another worker after this
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     started_at = Column(DateTime, nullable=True)
@@ -49,6 +64,7 @@ class Generation(Base):
     user = relationship("User", back_populates="generations")
     conversation = relationship("Conversation", back_populates="generations")
     algorithm = relationship("Algorithm", back_populates="generations")
+    batch = relationship("GenerationBatch", back_populates="generations")
 
     def __repr__(self):
         return f"<Generation(id={self.id}, status={self.status}, user_id={self.user_id})>"
@@ -82,22 +98,97 @@ class Generation(Base):
 
     def mark_as_completed(self, result_url: str, metadata: str = None):
         """Mark generation as completed."""
-        self.status = GenerationStatus.COMPLETED
-        self.progress = 100
-        self.result_url = result_url
-        self.result_metadata = metadata
-        self.completed_at = datetime.utcnow()
+        self._apply(self.completed_values(result_url, metadata))
 
     def mark_as_failed(self, error_message: str):
         """Mark generation as failed."""
-        self.status = GenerationStatus.FAILED
-        self.error_message = error_message
-        self.completed_at = datetime.utcnow()
+        self._apply(self.failed_values(error_message))
+
+    def mark_as_cancelled(self):
+        """Mark generation as cancelled."""
+        self._apply(self.cancelled_values())
+
+    def release_lease(self):
+        """Drop the worker lease once the job has a final status."""
+        self.lease_owner = None
+        self.lease_expires_at = None
 
     def update_progress(self, progress: int):
         """Update generation progress."""
         self.progress = max(0, min(100, progress))
 
+    def _apply(self, values: Dict[str, Any]):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    # Column values of the final states, for conditional UPDATE statements
+    # that must not overwrite a status changed by someone else meanwhile
+
+    @staticmethod
+    def completed_values(result_url: str, metadata: str = None) -> Dict[str, Any]:
+        return {
+            "status": GenerationStatus.COMPLETED,
+            "progress": 100,
+            "result_url": result_url,
+            "result_metadata": metadata,
+            "completed_at": datetime.utcnow(),
+            "lease_owner": None,
+            "lease_expires_at": None
+        }
+
+    @staticmethod
+    def failed_values(error_message: str) -> Dict[str, Any]:
+        return {
+            "status": GenerationStatus.FAILED,
+            "error_message": error_message,
+            "completed_at": datetime.utcnow(),
+            "lease_owner": None,
+            "lease_expires_at": None
+        }
+
+    @staticmethod
+    def cancelled_values() -> Dict[str, Any]:
+        return {
+            "status": GenerationStatus.CANCELLED,
+            "completed_at": datetime.utcnow(),
+            "lease_owner": None,
+            "lease_expires_at": None
+        }
+
+
+class GenerationBatch(Base):
+    """Variants of one prompt submitted together (see POST /generations/batches)."""
+    __tablename__ = "generation_batches"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    algorithm_id = Column(String, ForeignKey("algorithms.id"), nullable=False)
+    prompt = Column(Text, nullable=False)  # shared base prompt, analyzed once for the batch
+    size = Column(Integer, nullable=False)
+    credits_used = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    generations = relationship("Generation", back_populates="batch")
+
+    def __repr__(self):
+        return f"<GenerationBatch(id={self.id}, size={self.size}, user_id={self.user_id})>"
+
+
+class GenerationDurationStats(Base):
+    """Rolling duration sketch of one pipeline stage of an algorithm (see generation_eta)."""
+    __tablename__ = "generation_duration_stats"
+
+    algorithm_id = Column(String, primary_key=True)
+    stage = Column(String(20), primary_key=True)
+    sketch = Column(Text, nullable=False)  # JSON of a QuantileSketch, decayed as of updated_at
+    recent = Column(Float, default=0.0)  # completions, decayed with the shorter rate half-life
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<GenerationDurationStats(algorithm_id={self.algorithm_id}, stage={self.stage})>"
+
 
 class CreditTransaction(Base):
     __tablename__ = "credit_transactions"
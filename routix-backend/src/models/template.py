@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Boolean, Integer, Float, DateTime
+from sqlalchemy import Column, String, Text, Boolean, Integer, Float, DateTime, Index, func, literal_column
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -10,6 +10,12 @@ from src.core.database import Base
 class Template(Base):
     """Model for thumbnail templates."""
     __tablename__ = "templates"
+    __table_args__ = (
+        # Search filters; see services/template_search.py
+        Index("ix_templates_active_category", "is_active", "category"),
+        Index("ix_templates_active_style", "is_active", "style"),
+        Index("ix_templates_active_mood", "is_active", "mood"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String(200), nullable=False)
@@ -37,6 +43,7 @@ class Template(Base):
     # Usage and popularity
     usage_count = Column(Integer, default=0)
     rating = Column(Float, default=0.0)  # Average rating
+    rating_count = Column(Integer, default=0)  # Ratings in the average
     
     # Status
     is_active = Column(Boolean, default=True)
@@ -127,10 +134,11 @@ class Template(Base):
         """Increment usage counter."""
         self.usage_count += 1
 
-    def update_rating(self, new_rating: float, total_ratings: int):
+    def update_rating(self, new_rating: float):
         """Update average rating."""
-        if total_ratings > 0:
-            self.rating = ((self.rating * (total_ratings - 1)) + new_rating) / total_ratings
+        count = self.rating_count or 0
+        self.rating = ((self.rating or 0.0) * count + new_rating) / (count + 1)
+        self.rating_count = count + 1
 
     @classmethod
     def get_seed_templates(cls):
@@ -298,3 +306,13 @@ class Template(Base):
                 "is_premium": True
             }
         ]
+
+
+# Default search ordering when there is no text query. The 0.0 is inlined
+# rather than bound so queries can match the index expression.
+Index(
+    "ix_templates_active_rating",
+    Template.is_active,
+    func.coalesce(Template.rating, literal_column("0.0")),
+    Template.id
+)
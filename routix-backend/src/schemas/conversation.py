@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -16,6 +16,8 @@ class MessageCreate(MessageBase):
 
 class MessageResponse(MessageBase):
     id: str
+    # Read from Message.metadata_ (the column is named "metadata")
+    metadata: Optional[str] = Field(None, validation_alias=AliasChoices("metadata_", "metadata"))
     conversation_id: str
     created_at: datetime
 
@@ -3,6 +3,7 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime
 from uuid import UUID
 
+from src.core.config import settings
 from src.models.generation import GenerationStatus
 
 
@@ -39,6 +40,7 @@ class GenerationResponse(GenerationBase):
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     duration_seconds: Optional[int] = None
+    estimated_completion: Optional[datetime] = None  # while queued or processing, once durations are known
 
     class Config:
         from_attributes = True
@@ -53,6 +55,34 @@ class GenerationList(BaseModel):
     has_prev: bool
 
 
+class GenerationBatchCreate(BaseModel):
+    prompt: str = Field(..., min_length=1)  # shared base prompt
+    algorithm_id: str
+    variations: List[str] = Field(default_factory=list, max_length=settings.generation_batch_max_size)
+    count: int = Field(1, ge=1, le=settings.generation_batch_max_size)  # variants when no variations are given
+    reference_images: Optional[List[str]] = None
+    parameters: Optional[Dict[str, Any]] = None
+    conversation_id: Optional[UUID] = None
+
+    def variant_prompts(self) -> List[str]:
+        """Full prompt of each variant: the base plus its variation, if any."""
+        if not self.variations:
+            return [self.prompt] * self.count
+        return [f"{self.prompt}\n{variation}" if variation.strip() else self.prompt for variation in self.variations]
+
+
+class GenerationBatchResponse(BaseModel):
+    id: UUID
+    algorithm_id: str
+    prompt: str
+    size: int
+    credits_used: int
+    created_at: datetime
+    progress: int  # across the batch; finished generations count as 100
+    status_counts: Dict[GenerationStatus, int]
+    generations: List[GenerationResponse]
+
+
 class AlgorithmResponse(BaseModel):
     id: str
     name: str
@@ -72,6 +102,17 @@ class GenerationProgress(BaseModel):
     progress: int
     message: Optional[str] = None
     estimated_completion: Optional[datetime] = None
+    version: int = 0  # pass back as ``since`` to wait for the next change
+
+
+class GenerationStatusRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=settings.generation_status_batch_limit)
+    since: Dict[str, int] = {}  # generation id -> version the client already has
+    wait: float = Field(0.0, ge=0.0, le=settings.generation_status_max_wait)
+
+
+class GenerationStatusList(BaseModel):
+    statuses: List[GenerationProgress]  # generations that don't exist or aren't yours are left out
 
 
 class GenerationStats(BaseModel):
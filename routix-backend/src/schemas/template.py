@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 
@@ -67,12 +67,26 @@ class TemplateList(BaseModel):
 
 class TemplateSearchRequest(BaseModel):
     """Schema for searching templates."""
+    query: Optional[str] = Field(None, max_length=200)  # Full-text over name, description and tags
     category: Optional[str] = None
     style: Optional[str] = None
     mood: Optional[str] = None
     tags: Optional[List[str]] = None
     is_premium: Optional[bool] = None
     min_rating: Optional[float] = Field(None, ge=0.0, le=5.0)
+    limit: int = Field(20, ge=1, le=100)
+    cursor: Optional[str] = None  # next_cursor from the previous page
+
+
+class TemplateSearchResponse(TemplateList):
+    """Template search results with facet counts and a keyset cursor."""
+    facets: Dict[str, Dict[str, int]]  # category/style/mood -> value -> count
+    next_cursor: Optional[str] = None
+
+
+class TemplateRatingRequest(BaseModel):
+    """Schema for rating a template."""
+    rating: float = Field(..., ge=1.0, le=5.0)
 
 
 class TemplateMatchRequest(BaseModel):
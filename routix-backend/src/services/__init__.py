@@ -1,9 +1,10 @@
-from .ai_service import AIService
+from .ai_service import AIService, get_ai_service
 from .generation_service import GenerationService
 from .auth_service import AuthService
 
 __all__ = [
     "AIService",
+    "get_ai_service",
     "GenerationService", 
     "AuthService"
 ]
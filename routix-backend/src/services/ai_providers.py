@@ -0,0 +1,366 @@
+"""
+Async provider layer for AI integrations.
+
+Every outbound AI call goes through one of the providers below. Providers
+either use the vendor's async client (OpenAI, Gemini) or the shared aiohttp
+session (Stability), so no request ever blocks the event loop. Work that
+has no async API (image decoding, file reads) goes through
+``run_blocking``, which uses a bounded thread pool shared by the whole
+process.
+"""
+import asyncio
+import base64
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import google.generativeai as genai
+from openai import AsyncOpenAI
+
+from src.core.circuit_breaker import get_breaker
+from src.core.config import settings
+from src.core.http import http_client
+from src.core.rate_limit import get_limiter
+
+
+class ProviderError(Exception):
+    """Raised when an AI provider call fails."""
+
+    def __init__(self, provider: str, message: str, status_code: Optional[int] = None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.status_code = status_code
+
+
+class ProviderTimeoutError(ProviderError):
+    """Raised when an AI provider call exceeds its timeout."""
+
+
+class ProviderUnavailableError(ProviderError):
+    """Raised without calling the provider when its circuit breaker is open."""
+
+
+def _is_provider_fault(error: Exception) -> bool:
+    """Check whether an error says something about provider health.
+
+    Client errors (bad request, content policy) are the caller's fault and
+    must not trip the breaker; rate limits, server errors, timeouts and
+    connection errors do.
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        return True
+    return status_code == 429 or status_code >= 500
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the bounded executor used for blocking work."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ai_executor_workers,
+            thread_name_prefix="ai-blocking"
+        )
+    return _executor
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking callable in the bounded executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
+
+
+def shutdown_executor():
+    """Shut down the blocking executor (called on application shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+class AIProvider:
+    """Base class for AI providers."""
+
+    name = "provider"
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.breaker = get_breaker(self.name)
+
+    @property
+    def is_configured(self) -> bool:
+        """Check if the provider has the credentials it needs."""
+        return False
+
+    @property
+    def is_available(self) -> bool:
+        """Check if the provider is configured and its breaker lets calls through."""
+        return self.is_configured and self.breaker.is_available
+
+    @asynccontextmanager
+    async def _guard(self, model: str, timeout: float) -> AsyncIterator[Dict[str, Any]]:
+        """Hold a breaker pass and a rate-limited concurrency slot for one call.
+
+        The outcome is recorded when the block ends: an error raised in it
+        counts as a breaker failure if it is the provider's fault. The block
+        may set ``latency`` in the yielded dict (a stream sets its time to
+        first chunk); otherwise it is how long the block took.
+        """
+        if not self.breaker.allow_request():
+            raise ProviderUnavailableError(self.name, "circuit breaker is open")
+
+        limiter = get_limiter(self.name, model, latency_target=timeout * settings.breaker_slow_call_ratio)
+        try:
+            async with limiter.slot() as outcome:
+                start = time.monotonic()
+                try:
+                    yield outcome
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    outcome["latency"] = time.monotonic() - start
+                    outcome["throttled"] = getattr(e, "status_code", None) == 429
+                    if _is_provider_fault(e):
+                        self.breaker.record_failure(outcome["latency"])
+                    else:
+                        self.breaker.record_success(outcome["latency"])
+                    raise
+
+                if outcome["latency"] is None:
+                    outcome["latency"] = time.monotonic() - start
+                self.breaker.record_success(
+                    outcome["latency"],
+                    slow=outcome["latency"] >= timeout * settings.breaker_slow_call_ratio
+                )
+        except (asyncio.CancelledError, GeneratorExit):
+            # Cancelled while queued or in flight, or a stream abandoned by its
+            # reader: give back the breaker probe slot without an outcome
+            self.breaker.release()
+            raise
+
+    async def _call(self, coro, model: str, timeout: Optional[float] = None):
+        """Await a provider coroutine under the circuit breaker, rate limiter and timeout."""
+        timeout = timeout or self.timeout
+        try:
+            async with self._guard(model, timeout):
+                try:
+                    return await asyncio.wait_for(coro, timeout=timeout)
+                except asyncio.TimeoutError:
+                    raise ProviderTimeoutError(self.name, f"timed out after {timeout}s")
+        except (ProviderUnavailableError, asyncio.CancelledError):
+            # Make sure a never-started call is not left dangling
+            coro.close()
+            raise
+
+
+class OpenAIProvider(AIProvider):
+    """OpenAI chat and image generation through the async client."""
+
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str], timeout: float):
+        super().__init__(timeout)
+        self.api_key = api_key
+        self._client: Optional[AsyncOpenAI] = None
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Get the async client, creating it (and its connection pool) on first use."""
+        if self._client is None:
+            self._client = AsyncOpenAI(api_key=self.api_key)
+        return self._client
+
+    @client.setter
+    def client(self, client: AsyncOpenAI):
+        self._client = client
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-3.5-turbo",
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """Run a chat completion and return the message content."""
+        kwargs = {"model": model, "messages": messages, "temperature": temperature}
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+
+        response = await self._call(self.client.chat.completions.create(**kwargs), model)
+        return response.choices[0].message.content
+
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-3.5-turbo",
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Run a streaming chat completion, yielding content deltas as they arrive.
+
+        The stream holds its limiter slot until it ends, and its outcome goes
+        to the breaker then, so a provider that fails or stalls mid-stream
+        trips it. Opening the stream and each chunk must each take less than
+        the provider timeout.
+        """
+        kwargs = {"model": model, "messages": messages, "temperature": temperature, "stream": True}
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+
+        async with self._guard(model, self.timeout) as outcome:
+            start = time.monotonic()
+            try:
+                stream = await asyncio.wait_for(self.client.chat.completions.create(**kwargs), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                raise ProviderTimeoutError(self.name, f"timed out after {self.timeout}s")
+
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise ProviderTimeoutError(self.name, f"stream stalled for {self.timeout}s")
+
+                if outcome["latency"] is None:
+                    # Latency of a stream is its time to first chunk; the rest depends on the reply length
+                    outcome["latency"] = time.monotonic() - start
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def generate_image(
+        self,
+        prompt: str,
+        model: str = "dall-e-3",
+        size: str = "1792x1024",
+        quality: str = "hd",
+        style: Optional[str] = None
+    ) -> str:
+        """Generate an image and return its URL."""
+        kwargs = {"model": model, "prompt": prompt, "size": size, "quality": quality, "n": 1}
+        if style:
+            kwargs["style"] = style
+
+        response = await self._call(
+            self.client.images.generate(**kwargs),
+            model,
+            timeout=settings.openai_image_timeout
+        )
+        return response.data[0].url
+
+
+class GeminiProvider(AIProvider):
+    """Google Gemini text and vision analysis through the async API."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str], timeout: float):
+        super().__init__(timeout)
+        self.api_key = api_key
+        self._configured = False
+        self._models: Dict[str, genai.GenerativeModel] = {}
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    def model(self, model_name: str) -> genai.GenerativeModel:
+        """Get a model handle, configuring the SDK and creating the handle on first use."""
+        if not self._configured:
+            genai.configure(api_key=self.api_key)
+            self._configured = True
+        if model_name not in self._models:
+            self._models[model_name] = genai.GenerativeModel(model_name)
+        return self._models[model_name]
+
+    async def generate(self, content: List[Any], vision: bool = False) -> str:
+        """Generate content and return the response text."""
+        model_name = 'gemini-pro-vision' if vision else 'gemini-pro'
+        model = self.model(model_name)
+        response = await self._call(model.generate_content_async(content), model_name)
+        return response.text
+
+
+class StabilityProvider(AIProvider):
+    """Stability AI text-to-image through the shared aiohttp session."""
+
+    name = "stability"
+    model = "stable-diffusion-xl-1024-v1-0"
+    endpoint = f"https://api.stability.ai/v1/generation/{model}/text-to-image"
+
+    def __init__(self, api_key: Optional[str], timeout: float):
+        super().__init__(timeout)
+        self.api_key = api_key
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    async def text_to_image(self, payload: Dict[str, Any]) -> bytes:
+        """Generate an image and return the decoded image bytes."""
+        return await self._call(self._post(payload), self.model)
+
+    async def _post(self, payload: Dict[str, Any]) -> bytes:
+        async with http_client.session.post(
+            self.endpoint,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+                "Accept": "application/json"
+            },
+            json=payload
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise ProviderError(self.name, error_text, status_code=response.status)
+
+            data = await response.json()
+
+        return base64.b64decode(data["artifacts"][0]["base64"])
+
+
+class ProviderRegistry:
+    """Process-wide registry of AI providers.
+
+    Providers are built on first lookup and reused for the life of the
+    worker, so clients, connection pools and model handles are created once.
+    """
+
+    def __init__(self):
+        self._providers: Dict[str, AIProvider] = {}
+        self._factories: Dict[str, Callable[[], AIProvider]] = {
+            "openai": lambda: OpenAIProvider(settings.openai_api_key, settings.openai_timeout),
+            "gemini": lambda: GeminiProvider(
+                settings.gemini_api_key or os.getenv("GEMINI_API_KEY"),
+                settings.gemini_timeout
+            ),
+            "stability": lambda: StabilityProvider(
+                settings.stability_api_key or os.getenv("STABILITY_API_KEY"),
+                settings.stability_timeout
+            ),
+        }
+
+    def get(self, name: str) -> AIProvider:
+        """Get a provider by name, building it on first use."""
+        if name not in self._providers:
+            self._providers[name] = self._factories[name]()
+        return self._providers[name]
+
+    def configured(self, name: str) -> Optional[AIProvider]:
+        """Get a provider by name if it has credentials, otherwise None."""
+        provider = self.get(name)
+        return provider if provider.is_configured else None
+
+
+provider_registry = ProviderRegistry()
@@ -1,33 +1,42 @@
-import openai
-import google.generativeai as genai
 from typing import List, Dict, Any, Optional
 import json
 import asyncio
-import aiohttp
-from PIL import Image
-import io
-import base64
+import copy
+import hashlib
+import re
 import os
-from openai import OpenAI
 
+from src.core.cache import TwoTierCache
 from src.core.config import settings
+from src.core.singleflight import SingleFlight
+from src.services.ai_providers import provider_registry, ProviderRegistry, run_blocking, ProviderError
+from src.services.image_prep import prepare_reference_images
+from src.services.template_index import template_catalog
+
+
+# Shared cache of prompt analysis results, keyed by prompt and reference image content
+analysis_cache = TwoTierCache(
+    "analysis",
+    max_size=settings.analysis_cache_size,
+    ttl=settings.analysis_cache_ttl
+)
+
+# Coalesces concurrent identical analysis and generation calls across all AIService instances
+inflight = SingleFlight()
 
 
 class AIService:
-    """Service for handling AI integrations."""
+    """Service for handling AI integrations.
     
-    def __init__(self):
-        # Initialize OpenAI client
-        if settings.openai_api_key:
-            self.openai_client = OpenAI(api_key=settings.openai_api_key)
-        else:
-            self.openai_client = None
-        
-        # Initialize Gemini
-        if settings.gemini_api_key:
-            genai.configure(api_key=settings.gemini_api_key)
-        else:
-            genai.configure(api_key=os.getenv("GEMINI_API_KEY", ""))
+    Use ``get_ai_service()`` rather than constructing this directly, so the
+    whole worker shares one instance and one set of provider clients.
+    """
+    
+    def __init__(self, registry: Optional[ProviderRegistry] = None):
+        self.registry = registry or provider_registry
+        self.openai = self.registry.configured("openai")
+        self.gemini = self.registry.configured("gemini")
+        self.stability = self.registry.configured("stability")
     
     async def analyze_prompt(self, prompt: str, reference_images: Optional[List[str]] = None) -> Dict[str, Any]:
         """Analyze user prompt to understand thumbnail requirements."""
@@ -49,47 +58,90 @@ class AIService:
         }}
         """
         
-        try:
-            if settings.gemini_api_key or os.getenv("GEMINI_API_KEY"):
-                return await self._analyze_with_gemini(analysis_prompt, reference_images)
-            elif self.openai_client:
-                return await self._analyze_with_openai(analysis_prompt)
-            else:
-                # Fallback analysis
-                return self._fallback_analysis(prompt)
-        except Exception as e:
-            print(f"Error in prompt analysis: {e}")
-            return self._fallback_analysis(prompt)
+        cache_key = await self._analysis_cache_key(prompt, reference_images)
+        cached = await analysis_cache.get(cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+        
+        analysis = await inflight.do(
+            f"analysis:{cache_key}",
+            lambda: self._analyze_uncached(prompt, analysis_prompt, reference_images, cache_key)
+        )
+        return copy.deepcopy(analysis)
+    
+    async def _analyze_uncached(
+        self,
+        prompt: str,
+        analysis_prompt: str,
+        reference_images: Optional[List[str]],
+        cache_key: str
+    ) -> Dict[str, Any]:
+        """Run prompt analysis against the providers and cache the result."""
+        
+        # Try providers in order, skipping any whose circuit breaker is open
+        attempts = [
+            (self.gemini, lambda: self._analyze_with_gemini(analysis_prompt, reference_images)),
+            (self.openai, lambda: self._analyze_with_openai(analysis_prompt)),
+        ]
+        
+        for provider, analyze in attempts:
+            if not provider or not provider.is_available:
+                continue
+            try:
+                analysis = await analyze()
+            except Exception as e:
+                print(f"Error in prompt analysis ({provider.name}): {e}")
+                continue
+            
+            # Only provider results are cached; fallback results are cheap and
+            # should not mask a provider that comes back.
+            await analysis_cache.set(cache_key, analysis)
+            return analysis
+        
+        # Fallback analysis
+        return self._fallback_analysis(prompt)
+    
+    async def _analysis_cache_key(self, prompt: str, reference_images: Optional[List[str]] = None) -> str:
+        """Build a content-addressed cache key for a prompt analysis."""
+        normalized = re.sub(r"\s+", " ", prompt).strip().lower()
+        digest = hashlib.sha256(normalized.encode("utf-8"))
+        
+        for image_path in (reference_images or [])[:3]:
+            digest.update(b"\0")
+            digest.update((await run_blocking(self._hash_file, image_path)).encode("ascii"))
+        
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        """Hash a file's content (blocking, run in the executor)."""
+        if not os.path.exists(path):
+            return f"missing:{path}"
+        
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
     
     async def _analyze_with_gemini(self, prompt: str, reference_images: Optional[List[str]] = None) -> Dict[str, Any]:
         """Analyze prompt using Gemini."""
         
         try:
-            model = genai.GenerativeModel('gemini-pro-vision' if reference_images else 'gemini-pro')
-            
             content = [prompt]
             
-            # Add reference images if provided
+            # Add reference images if provided (decoded and downscaled off the loop)
             if reference_images:
-                for image_path in reference_images[:3]:  # Limit to 3 images
-                    try:
-                        if os.path.exists(image_path):
-                            with open(image_path, 'rb') as f:
-                                image_data = f.read()
-                            
-                            image = Image.open(io.BytesIO(image_data))
-                            content.append(image)
-                    except Exception as e:
-                        print(f"Error loading image {image_path}: {e}")
+                content.extend(await prepare_reference_images(reference_images[:3]))  # Limit to 3 images
             
-            response = model.generate_content(content)
+            text = await self.gemini.generate(content, vision=bool(reference_images))
             
             # Try to parse JSON response
             try:
-                return json.loads(response.text)
+                return json.loads(text)
             except json.JSONDecodeError:
                 # If not JSON, create structured response
-                return self._parse_text_response(response.text)
+                return self._parse_text_response(text)
                 
         except Exception as e:
             print(f"Gemini analysis error: {e}")
@@ -99,7 +151,7 @@ class AIService:
         """Analyze prompt using OpenAI."""
         
         try:
-            response = self.openai_client.chat.completions.create(
+            content = await self.openai.chat(
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": "You are an expert thumbnail designer. Analyze requests and provide structured JSON responses."},
@@ -108,8 +160,6 @@ class AIService:
                 temperature=0.3
             )
             
-            content = response.choices[0].message.content
-            
             try:
                 return json.loads(content)
             except json.JSONDecodeError:
@@ -174,71 +224,19 @@ class AIService:
         limit: int = 5,
         min_score: float = 0.0
     ) -> List[Dict[str, Any]]:
-        """Find matching templates from the template database."""
-        from src.models.template import Template
-        from src.core.database import AsyncSessionLocal
-        from sqlalchemy import select
-        
-        # Use provided session or create new one
-        if db_session is None:
-            async with AsyncSessionLocal() as session:
-                return await self._find_templates_internal(analysis, session, limit, min_score)
-        else:
-            return await self._find_templates_internal(analysis, db_session, limit, min_score)
-    
-    async def _find_templates_internal(
-        self,
-        analysis: Dict[str, Any],
-        db_session,
-        limit: int,
-        min_score: float
-    ) -> List[Dict[str, Any]]:
-        """Internal method to find templates."""
-        from src.models.template import Template
-        from sqlalchemy import select
+        """Find matching templates in the in-process template catalog.
         
-        # Get all active templates
-        result = await db_session.execute(
-            select(Template).where(Template.is_active == True)
-        )
-        templates = result.scalars().all()
+        No database work happens here once the catalog is loaded;
+        ``db_session`` is only used for the very first load.
+        """
+        index = await template_catalog.get_index(db_session)
         
-        if not templates:
+        if not len(index):
             # Return fallback templates if database is empty
             return self._get_fallback_templates(analysis)
         
-        # Calculate match score for each template
-        scored_templates = []
-        for template in templates:
-            score = template.calculate_match_score(analysis)
-            
-            if score >= min_score:
-                scored_templates.append({
-                    "id": template.id,
-                    "name": template.name,
-                    "description": template.description,
-                    "category": template.category,
-                    "style": template.style,
-                    "mood": template.mood,
-                    "primary_color": template.primary_color,
-                    "secondary_color": template.secondary_color,
-                    "elements": template.elements_list,
-                    "tags": template.tags_list,
-                    "preview_image": template.preview_image,
-                    "is_premium": template.is_premium,
-                    "match_score": score,
-                    "usage_count": template.usage_count,
-                    "rating": template.rating
-                })
-        
-        # Sort by match score (descending) and rating
-        scored_templates.sort(
-            key=lambda t: (t["match_score"], t["rating"], t["usage_count"]),
-            reverse=True
-        )
-        
-        # Return top matches
-        return scored_templates[:limit]
+        # Top matches by match score, then rating and usage count
+        return index.top_k(analysis, limit, min_score)
     
     def _get_fallback_templates(self, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Get fallback templates when database is empty."""
@@ -270,9 +268,36 @@ class AIService:
         prompt: str,
         template: Dict[str, Any],
         algorithm: str = "basic",
-        reference_images: Optional[List[str]] = None
+        reference_images: Optional[List[str]] = None,
+        generation_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Generate thumbnail using specified algorithm.
+        
+        Concurrent calls are only coalesced for the same generation (e.g. a
+        job re-claimed while its first attempt still runs); different
+        generations with identical inputs, like the variants of a batch,
+        each get their own image.
+        """
+        
+        key = hashlib.sha256(json.dumps(
+            [generation_id, algorithm, prompt, template.get("id"), reference_images or []],
+            sort_keys=True
+        ).encode("utf-8")).hexdigest()
+        
+        result = await inflight.do(
+            f"generation:{key}",
+            lambda: self._generate(prompt, template, algorithm, reference_images)
+        )
+        return copy.deepcopy(result)
+    
+    async def _generate(
+        self,
+        prompt: str,
+        template: Dict[str, Any],
+        algorithm: str,
+        reference_images: Optional[List[str]]
     ) -> Dict[str, Any]:
-        """Generate thumbnail using specified algorithm."""
+        """Dispatch a generation to the algorithm's provider."""
         
         if algorithm == "basic":
             return await self._generate_with_stable_diffusion(prompt, template, reference_images)
@@ -291,9 +316,7 @@ class AIService:
     ) -> Dict[str, Any]:
         """Generate thumbnail using Stable Diffusion API (Stability AI)."""
         
-        api_key = os.getenv("STABILITY_API_KEY")
-        
-        if not api_key:
+        if not self.stability:
             print("⚠️  STABILITY_API_KEY not found, using mock generation")
             return await self._mock_stable_diffusion(prompt)
         
@@ -314,61 +337,44 @@ clickable thumbnail, trending, engaging, dramatic lighting
             negative_prompt = "blurry, low quality, pixelated, distorted, ugly, bad anatomy, amateur, low resolution, text too small, unclear"
             
             # Call Stability AI API
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image",
-                    headers={
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json",
-                        "Accept": "application/json"
-                    },
-                    json={
-                        "text_prompts": [
-                            {"text": enhanced_prompt, "weight": 1},
-                            {"text": negative_prompt, "weight": -1}
-                        ],
-                        "cfg_scale": 7,
-                        "height": 720,
-                        "width": 1280,  # 16:9 ratio perfect for thumbnails
-                        "samples": 1,
-                        "steps": 30,
-                    },
-                    timeout=aiohttp.ClientTimeout(total=60)
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        print(f"❌ Stability API error: {response.status} - {error_text}")
-                        return await self._mock_stable_diffusion(prompt)
-                    
-                    data = await response.json()
-                    
-                    # دانلود و ذخیره تصویر
-                    image_base64 = data["artifacts"][0]["base64"]
-                    image_data = base64.b64decode(image_base64)
-                    
-                    # استفاده از storage service برای ذخیره
-                    from src.services.storage_service import storage_service
-                    image_url = await storage_service.upload_image(
-                        image_data,
-                        f"sd_{hash(prompt) % 100000}.jpg",
-                        folder="generated/stable-diffusion"
-                    )
-                    
-                    print(f"✅ Stable Diffusion generation complete: {image_url}")
-                    
-                    return {
-                        "success": True,
-                        "image_url": image_url,
-                        "algorithm": "stable-diffusion-xl",
-                        "processing_time": 5.0,
-                        "metadata": {
-                            "model": "stable-diffusion-xl-1024-v1-0",
-                            "steps": 30,
-                            "cfg_scale": 7,
-                            "resolution": "1280x720"
-                        }
-                    }
-                    
+            image_data = await self.stability.text_to_image({
+                "text_prompts": [
+                    {"text": enhanced_prompt, "weight": 1},
+                    {"text": negative_prompt, "weight": -1}
+                ],
+                "cfg_scale": 7,
+                "height": 720,
+                "width": 1280,  # 16:9 ratio perfect for thumbnails
+                "samples": 1,
+                "steps": 30,
+            })
+            
+            # استفاده از storage service برای ذخیره
+            from src.services.storage_service import storage_service
+            image_url = await storage_service.upload_image(
+                image_data,
+                f"sd_{hash(prompt) % 100000}.jpg",
+                folder="generated/stable-diffusion"
+            )
+            
+            print(f"✅ Stable Diffusion generation complete: {image_url}")
+            
+            return {
+                "success": True,
+                "image_url": image_url,
+                "algorithm": "stable-diffusion-xl",
+                "processing_time": 5.0,
+                "metadata": {
+                    "model": "stable-diffusion-xl-1024-v1-0",
+                    "steps": 30,
+                    "cfg_scale": 7,
+                    "resolution": "1280x720"
+                }
+            }
+            
+        except ProviderError as e:
+            print(f"❌ Stability API error: {e.status_code} - {e}")
+            return await self._mock_stable_diffusion(prompt)
         except Exception as e:
             print(f"❌ Stable Diffusion error: {e}")
             return await self._mock_stable_diffusion(prompt)
@@ -414,18 +420,17 @@ clickable thumbnail, trending, engaging, dramatic lighting
             - 1280x720 resolution
             """
             
-            if self.openai_client:
-                response = self.openai_client.images.generate(
+            if self.openai:
+                image_url = await self.openai.generate_image(
                     model="dall-e-3",
                     prompt=enhanced_prompt,
                     size="1792x1024",  # Closest to 16:9 ratio
-                    quality="hd",
-                    n=1
+                    quality="hd"
                 )
                 
                 return {
                     "success": True,
-                    "image_url": response.data[0].url,
+                    "image_url": image_url,
                     "algorithm": "dall-e-3",
                     "processing_time": 15.0,
                     "metadata": {
@@ -462,7 +467,7 @@ clickable thumbnail, trending, engaging, dramatic lighting
         with optimized prompts to achieve similar high-quality results.
         """
         
-        if not self.openai_client:
+        if not self.openai:
             print("⚠️  OpenAI API key not found, using mock generation")
             return await self._mock_midjourney(prompt)
         
@@ -495,18 +500,15 @@ NEGATIVE PROMPTS TO AVOID:
 - bad anatomy, unclear text, poor composition
 """
             
-            response = self.openai_client.images.generate(
+            # دانلود تصویر از URL
+            image_url = await self.openai.generate_image(
                 model="dall-e-3",
                 prompt=enhanced_prompt[:4000],  # DALL-E has 4000 char limit
                 size="1792x1024",  # Closest to 16:9, highest quality
                 quality="hd",
-                style="vivid",  # More dramatic and vibrant
-                n=1
+                style="vivid"  # More dramatic and vibrant
             )
             
-            # دانلود تصویر از URL
-            image_url = response.data[0].url
-            
             # دانلود و بهینه‌سازی برای تامبنیل
             from src.services.storage_service import storage_service
             image_data = await storage_service.download_from_url(image_url)
@@ -555,3 +557,14 @@ NEGATIVE PROMPTS TO AVOID:
                 "aspect_ratio": "16:9"
             }
         }
+
+
+_ai_service: Optional[AIService] = None
+
+
+def get_ai_service() -> AIService:
+    """Get the process-wide AIService instance."""
+    global _ai_service
+    if _ai_service is None:
+        _ai_service = AIService()
+    return _ai_service
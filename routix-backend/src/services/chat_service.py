@@ -0,0 +1,293 @@
+import asyncio
+import json
+import random
+from typing import AsyncIterator, List, Optional, Tuple
+
+from src.core.config import settings
+from src.services.ai_service import AIService
+from src.services.intent_classifier import intent_classifier
+
+
+GENERATION_FALLBACK_RESPONSES = [
+    "I'd be happy to help you create a thumbnail! Could you provide more details about what you have in mind?",
+    "Great! I can help you generate a thumbnail. What style and theme would you like?",
+    "Let me help you create an amazing thumbnail! Tell me more about your vision.",
+    "I'll assist you with thumbnail generation. What's the main message or theme you want to convey?"
+]
+
+GENERAL_FALLBACK_RESPONSE = "I'm here to help you create amazing thumbnails! How can I assist you today?"
+
+
+def keyword_intent(message: str) -> bool:
+    """Guess generation intent with the local classifier."""
+    return intent_classifier.classify(message).requires_generation
+
+
+async def analyze_chat_intent(message: str, ai_service: AIService) -> bool:
+    """Analyze chat message to determine if thumbnail generation is needed."""
+
+    # Local classifier first; only low-confidence messages go to the LLM
+    prediction = intent_classifier.classify(message)
+    if prediction.is_confident:
+        return prediction.requires_generation
+
+    # More sophisticated intent detection with AI (if available)
+    if ai_service.openai:
+        try:
+            intent = await ai_service.openai.chat(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are an intent classifier. Determine if the user wants to generate a thumbnail. Respond with only 'yes' or 'no'."
+                    },
+                    {
+                        "role": "user",
+                        "content": message
+                    }
+                ],
+                temperature=0.1,
+                max_tokens=10
+            )
+
+            return "yes" in intent.strip().lower()
+
+        except Exception as e:
+            print(f"Error in AI intent detection: {e}")
+            # Fall back to the local classifier's best guess
+            return prediction.requires_generation
+
+    return prediction.requires_generation
+
+
+def assistant_messages(user_message: str, requires_generation: bool) -> List[dict]:
+    """Build the chat completion messages for an assistant reply."""
+
+    if requires_generation:
+        system_prompt = "You are a helpful assistant for a thumbnail generation platform. Respond warmly and help users clarify their thumbnail creation needs. Keep responses concise (2-3 sentences)."
+    else:
+        system_prompt = "You are a helpful assistant for a thumbnail generation platform. Provide helpful information and guide users. Keep responses concise (2-3 sentences)."
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_message}
+    ]
+
+
+def fallback_assistant_response(requires_generation: bool) -> str:
+    """Get a canned assistant reply for when the AI is unavailable."""
+
+    if requires_generation:
+        return random.choice(GENERATION_FALLBACK_RESPONSES)
+    return GENERAL_FALLBACK_RESPONSE
+
+
+async def generate_assistant_response(
+    user_message: str,
+    requires_generation: bool,
+    ai_service: AIService
+) -> str:
+    """Generate appropriate assistant response."""
+
+    if ai_service.openai:
+        try:
+            response = await ai_service.openai.chat(
+                model="gpt-3.5-turbo",
+                messages=assistant_messages(user_message, requires_generation),
+                temperature=0.7,
+                max_tokens=150
+            )
+
+            return response.strip()
+
+        except Exception as e:
+            print(f"Error generating AI response: {e}")
+
+    return fallback_assistant_response(requires_generation)
+
+
+async def stream_assistant_response(
+    user_message: str,
+    requires_generation: bool,
+    ai_service: AIService
+) -> AsyncIterator[str]:
+    """Stream the assistant response as it is generated."""
+
+    if ai_service.openai:
+        streamed_any = False
+        try:
+            async for delta in ai_service.openai.chat_stream(
+                model="gpt-3.5-turbo",
+                messages=assistant_messages(user_message, requires_generation),
+                temperature=0.7,
+                max_tokens=150
+            ):
+                streamed_any = True
+                yield delta
+            return
+
+        except Exception as e:
+            print(f"Error streaming AI response: {e}")
+            if streamed_any:
+                return
+
+    yield fallback_assistant_response(requires_generation)
+
+
+async def _structured_reply(message: str, ai_service: AIService) -> Optional[Tuple[bool, str]]:
+    """Get intent and reply from a single structured completion, or None if it fails."""
+
+    try:
+        content = await ai_service.openai.chat(
+            model="gpt-3.5-turbo",
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "You are a helpful assistant for a thumbnail generation platform. "
+                        "Decide whether the user wants to generate a thumbnail, then reply to them. "
+                        "If they do, help them clarify their thumbnail needs; otherwise provide helpful information and guide them. "
+                        "Keep the reply concise (2-3 sentences). "
+                        'Respond with only JSON: {"requires_generation": true or false, "reply": "..."}'
+                    )
+                },
+                {"role": "user", "content": message}
+            ],
+            temperature=0.7,
+            max_tokens=200
+        )
+        data = json.loads(content)
+        return bool(data["requires_generation"]), str(data["reply"]).strip()
+    except Exception as e:
+        print(f"Error in structured chat reply: {e}")
+        return None
+
+
+async def run_chat_pipeline(message: str, ai_service: AIService) -> Tuple[bool, str]:
+    """Determine intent and generate the assistant reply for a chat message.
+
+    Modes (``settings.chat_pipeline_mode``):
+    - ``sequential``: intent call, then reply call
+    - ``speculative``: intent call and the reply for the keyword-predicted
+      intent run in parallel; the reply is regenerated only if the
+      prediction was wrong
+    - ``structured``: one call returns both intent and reply
+
+    Returns:
+        Tuple of (requires_generation, reply)
+    """
+
+    mode = settings.chat_pipeline_mode
+
+    if not ai_service.openai or mode == "sequential":
+        requires_generation = await analyze_chat_intent(message, ai_service)
+        return requires_generation, await generate_assistant_response(message, requires_generation, ai_service)
+
+    if mode == "structured":
+        result = await _structured_reply(message, ai_service)
+        if result is not None:
+            return result
+        requires_generation = await analyze_chat_intent(message, ai_service)
+        return requires_generation, await generate_assistant_response(message, requires_generation, ai_service)
+
+    # Speculative: reply for the predicted intent while the intent call runs
+    predicted = keyword_intent(message)
+    intent_task = asyncio.ensure_future(analyze_chat_intent(message, ai_service))
+    reply_task = asyncio.ensure_future(generate_assistant_response(message, predicted, ai_service))
+
+    try:
+        requires_generation = await intent_task
+        if requires_generation == predicted:
+            return requires_generation, await reply_task
+
+        reply_task.cancel()
+        return requires_generation, await generate_assistant_response(message, requires_generation, ai_service)
+    finally:
+        for task in (intent_task, reply_task):
+            if not task.done():
+                task.cancel()
+
+
+async def stream_chat_pipeline(
+    message: str,
+    ai_service: AIService,
+    intent_result: dict
+) -> AsyncIterator[str]:
+    """Stream the assistant reply for a chat message.
+
+    Outside ``sequential`` mode the intent call runs in parallel with a
+    reply stream for the keyword-predicted intent. Deltas are held back
+    until the intent is known: if the prediction was right they are
+    flushed and streaming continues, otherwise the speculative stream is
+    dropped and the right reply is streamed instead.
+
+    The resolved intent is stored in ``intent_result["requires_generation"]``.
+    """
+
+    if not ai_service.openai or settings.chat_pipeline_mode == "sequential":
+        requires_generation = await analyze_chat_intent(message, ai_service)
+        intent_result["requires_generation"] = requires_generation
+        async for delta in stream_assistant_response(message, requires_generation, ai_service):
+            yield delta
+        return
+
+    predicted = keyword_intent(message)
+    intent_task = asyncio.ensure_future(analyze_chat_intent(message, ai_service))
+    speculative = stream_assistant_response(message, predicted, ai_service)
+    held: List[str] = []
+    pending: Optional[asyncio.Future] = None
+
+    try:
+        # Buffer the speculative stream until the intent is known
+        while not intent_task.done():
+            pending = asyncio.ensure_future(speculative.__anext__())
+            await asyncio.wait({intent_task, pending}, return_when=asyncio.FIRST_COMPLETED)
+            if not pending.done():
+                break
+            try:
+                held.append(pending.result())
+            except StopAsyncIteration:
+                break
+            finally:
+                if pending.done():
+                    pending = None
+
+        requires_generation = await intent_task
+        intent_result["requires_generation"] = requires_generation
+
+        if requires_generation != predicted:
+            # Wrong guess: drop the speculative stream before starting the right one
+            if pending is not None:
+                pending.cancel()
+                try:
+                    await pending
+                except (asyncio.CancelledError, StopAsyncIteration):
+                    pass
+                pending = None
+            await speculative.aclose()
+            async for delta in stream_assistant_response(message, requires_generation, ai_service):
+                yield delta
+            return
+
+        for delta in held:
+            yield delta
+        if pending is not None:
+            try:
+                delta = await pending
+            except StopAsyncIteration:
+                return
+            finally:
+                pending = None
+            yield delta
+        async for delta in speculative:
+            yield delta
+    finally:
+        if not intent_task.done():
+            intent_task.cancel()
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, StopAsyncIteration):
+                pass
+        await speculative.aclose()
@@ -0,0 +1,88 @@
+"""
+Cooperative cancellation of running generations.
+
+Cancelling a generation sets its row to CANCELLED and then stops the
+pipeline wherever it runs:
+
+- every worker registers the task running each generation here, keyed by
+  generation id, and ``cancel()`` cancels a local task directly
+- for generations running in other processes, ``cancel()`` publishes the id
+  on the ``generation_cancel`` Redis channel; every worker process listens
+  and cancels its own task
+
+Cancelling the task aborts whatever it awaits, including an in-flight
+provider call, and the provider rate limiter slot is given back as the
+call unwinds. Without Redis, a remote pipeline still stops at its next
+database write (every pipeline write only applies to PROCESSING rows) or
+at the worker's next heartbeat, which drops jobs that are no longer
+PROCESSING.
+"""
+import asyncio
+from typing import Any, Dict
+
+from src.core.pubsub import ChannelListener, publish
+
+CHANNEL = "generation_cancel"
+
+
+class GenerationCancelled(Exception):
+    """Raised inside a pipeline whose generation is no longer PROCESSING."""
+
+
+class CancellationRegistry:
+    """Running generation tasks of this process, and the cancel channel."""
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.listener = ChannelListener(CHANNEL, self._on_message)
+        self.requested = 0
+        self.cancelled_local = 0
+        self.cancelled_remote = 0
+
+    def register(self, generation_id: str, task: asyncio.Task):
+        self._tasks[generation_id] = task
+
+    def unregister(self, generation_id: str, task: asyncio.Task):
+        if self._tasks.get(generation_id) is task:
+            del self._tasks[generation_id]
+
+    def _cancel_local(self, generation_id: str) -> bool:
+        task = self._tasks.get(generation_id)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    def _on_message(self, data: bytes):
+        if self._cancel_local(data.decode()):
+            self.cancelled_remote += 1
+
+    async def cancel(self, generation_id: str):
+        """Stop a generation's pipeline in whichever process runs it.
+
+        Call this after the row has been set to CANCELLED.
+        """
+        self.requested += 1
+        if self._cancel_local(generation_id):
+            self.cancelled_local += 1
+            return
+        await publish(CHANNEL, generation_id)
+
+    def start(self):
+        """Start listening for cancellations from other processes."""
+        self.listener.start()
+
+    async def stop(self):
+        await self.listener.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._tasks),
+            "listening": self.listener.listening,
+            "requested": self.requested,
+            "cancelled_local": self.cancelled_local,
+            "cancelled_remote": self.cancelled_remote
+        }
+
+
+generation_cancellation = CancellationRegistry()
@@ -0,0 +1,281 @@
+"""
+Completion time estimates for generations.
+
+Workers record how long each pipeline stage took, per algorithm, in
+streaming quantile sketches (see core.quantiles) kept in memory. Every
+``generation_eta_sync_interval`` seconds each process folds what it
+recorded into the ``generation_duration_stats`` table and takes back the
+combined sketches of all processes, so API processes that run no
+generations estimate from what the workers saw. Sketches decay with a
+half-life of ``generation_eta_half_life``, so estimates follow changes in
+provider latency.
+
+Estimates never scan the generations table:
+
+- PROCESSING: the median of the stages still to come, plus what is left
+  of the median of the current stage
+- QUEUED: the time the jobs queued ahead of it need to start at the
+  current throughput, plus the median run time. Throughput is a count of
+  recent completions decaying with ``generation_eta_rate_half_life``; the
+  position is counted on the (status, created_at) index.
+
+The position assumes first-in first-out, so with fair scheduling it is an
+upper bound for users with few jobs in flight.
+"""
+import asyncio
+import json
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.core.quantiles import QuantileSketch
+from src.models.generation import Generation, GenerationDurationStats, GenerationStatus
+
+# Pipeline stages and the progress each one starts at (see GenerationService)
+STAGES: Tuple[Tuple[str, int], ...] = (("analyze", 10), ("match", 30), ("generate", 60), ("save", 90))
+RUN = "run"  # claim to completion
+
+Key = Tuple[str, str]  # (algorithm id, stage)
+
+
+def stage_at(progress: int) -> Optional[str]:
+    """Stage a generation at ``progress`` is in, or None before the first."""
+    current = None
+    for stage, start in STAGES:
+        if progress >= start:
+            current = stage
+    return current
+
+
+class DurationStats:
+    """Rolling per-algorithm, per-stage duration sketches shared through the database."""
+
+    def __init__(self, half_life: float, rate_half_life: float, sync_interval: float):
+        self.half_life = half_life
+        self.rate_half_life = rate_half_life
+        self.sync_interval = sync_interval
+        # Combined view: last synced state plus what this process recorded since
+        self._sketches: Dict[Key, QuantileSketch] = {}
+        self._recent: Dict[Key, Tuple[float, datetime]] = {}  # decayed completions as of a time
+        self._created: Dict[Key, datetime] = {}
+        # Recorded here and not yet folded into the table
+        self._pending: Dict[Key, QuantileSketch] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._sync_lock = asyncio.Lock()
+        self.syncs = 0
+        self.failures = 0
+
+    def record(self, algorithm_id: str, stage: str, seconds: float):
+        """Record how long a stage (or RUN) of a generation took."""
+        key = (algorithm_id, stage)
+        now = datetime.utcnow()
+        self._pending.setdefault(key, QuantileSketch()).add(seconds)
+        self._sketches.setdefault(key, QuantileSketch()).add(seconds)
+        self._recent[key] = (self._recent_at(key, now) + 1.0, now)
+        self._created.setdefault(key, now)
+
+    def _recent_at(self, key: Key, now: datetime) -> float:
+        recent, at = self._recent.get(key, (0.0, now))
+        return recent * 0.5 ** (max(0.0, (now - at).total_seconds()) / self.rate_half_life)
+
+    def median(self, algorithm_id: str, stage: str) -> Optional[float]:
+        sketch = self._sketches.get((algorithm_id, stage))
+        return sketch.quantile(0.5) if sketch is not None else None
+
+    def throughput(self, now: Optional[datetime] = None) -> float:
+        """Completions per second across all workers, over the recent past."""
+        now = now or datetime.utcnow()
+        decay = math.log(2) / self.rate_half_life
+        rate = 0.0
+        for key, created in self._created.items():
+            if key[1] != RUN:
+                continue
+            # A constant rate r leaves r * (1 - e^(-decay * age)) / decay behind;
+            # a floor on the age keeps the first few completions from looking like a burst
+            age = max((now - created).total_seconds(), self.rate_half_life / 4)
+            rate += self._recent_at(key, now) * decay / (1 - math.exp(-decay * age))
+        return rate
+
+    def average_run_time(self, algorithm_id: Optional[str] = None) -> Optional[float]:
+        """Mean seconds from claim to completion, for one algorithm or all of them."""
+        combined = QuantileSketch()
+        for (algorithm, stage), sketch in self._sketches.items():
+            if stage == RUN and algorithm_id in (None, algorithm):
+                combined.merge(sketch)
+        return combined.mean
+
+    def estimate(
+        self,
+        algorithm_id: str,
+        status: GenerationStatus,
+        progress: int,
+        started_at: Optional[datetime] = None,
+        stage_started_at: Optional[datetime] = None,
+        ahead: int = 0
+    ) -> Optional[datetime]:
+        """Estimated completion time of a QUEUED or PROCESSING generation.
+
+        None when it has finished or there is no data for its algorithm yet.
+        """
+        now = datetime.utcnow()
+        if status == GenerationStatus.QUEUED:
+            run = self.median(algorithm_id, RUN)
+            rate = self.throughput(now)
+            if run is None or rate <= 0:
+                return None
+            return now + timedelta(seconds=ahead / rate + run)
+
+        if status != GenerationStatus.PROCESSING:
+            return None
+        medians = [self.median(algorithm_id, stage) for stage, _ in STAGES]
+        if None in medians:
+            return None
+
+        current = stage_at(progress)
+        if current is None:
+            return now + timedelta(seconds=sum(medians))
+        index = [stage for stage, _ in STAGES].index(current)
+        if stage_started_at is not None:
+            elapsed = (now - stage_started_at).total_seconds()
+        elif started_at is not None:
+            # The row only knows when the run started; assume earlier stages took their median
+            elapsed = (now - started_at).total_seconds() - sum(medians[:index])
+        else:
+            elapsed = 0.0
+        remaining = sum(medians[index + 1:]) + max(0.0, medians[index] - max(0.0, elapsed))
+        return now + timedelta(seconds=remaining)
+
+    def _decayed(self, row: GenerationDurationStats, now: datetime) -> Tuple[QuantileSketch, float]:
+        elapsed = max(0.0, (now - row.updated_at).total_seconds())
+        sketch = QuantileSketch.from_dict(json.loads(row.sketch))
+        sketch.decay(0.5 ** (elapsed / self.half_life))
+        return sketch, (row.recent or 0.0) * 0.5 ** (elapsed / self.rate_half_life)
+
+    async def sync(self):
+        """Fold pending durations into the table and load everyone's combined sketches."""
+        async with self._sync_lock:
+            pending, self._pending = self._pending, {}
+            now = datetime.utcnow()
+            try:
+                async with AsyncSessionLocal() as session:
+                    # Locks the rows on PostgreSQL so concurrent syncs don't lose each other's durations
+                    rows = (await session.execute(
+                        select(GenerationDurationStats).with_for_update()
+                    )).scalars().all()
+                    stored = {(row.algorithm_id, row.stage): row for row in rows}
+                    for key, delta in sorted(pending.items()):
+                        row = stored.get(key)
+                        if row is None:
+                            row = GenerationDurationStats(
+                                algorithm_id=key[0], stage=key[1], sketch="{}", recent=0.0,
+                                created_at=now, updated_at=now
+                            )
+                            session.add(row)
+                            stored[key] = row
+                        sketch, recent = self._decayed(row, now)
+                        sketch.merge(delta)
+                        row.sketch = json.dumps(sketch.to_dict())
+                        row.recent = recent + delta.count
+                        row.updated_at = now
+
+                    sketches, recents, created = {}, {}, {}
+                    for key, row in stored.items():
+                        sketches[key], recents[key] = self._decayed(row, now)
+                        created[key] = row.created_at
+                    await session.commit()
+            except Exception as e:
+                self.failures += 1
+                print(f"⚠️  Generation duration sync failed, will retry: {e}")
+                for key, delta in pending.items():
+                    self._pending.setdefault(key, QuantileSketch()).merge(delta)
+                return
+
+            # Durations recorded while the sync ran are not in the table yet
+            for key, delta in self._pending.items():
+                sketches.setdefault(key, QuantileSketch()).merge(delta)
+                recents[key] = recents.get(key, 0.0) + delta.count
+                created.setdefault(key, now)
+            self._sketches = sketches
+            self._recent = {key: (recent, now) for key, recent in recents.items()}
+            self._created = created
+            self.syncs += 1
+
+    async def _run(self):
+        while True:
+            await self.sync()
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self):
+        """Start the periodic sync task (called on startup)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the sync task and write out what is left (called on shutdown)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.sync()
+
+    def stats(self) -> Dict[str, Any]:
+        stages: Dict[str, Dict[str, Any]] = {}
+        for (algorithm_id, stage), sketch in sorted(self._sketches.items()):
+            stages.setdefault(algorithm_id, {})[stage] = {
+                "samples": round(sketch.count, 1),
+                "p50": sketch.quantile(0.50),
+                "p90": sketch.quantile(0.90)
+            }
+        return {
+            "stages": stages,
+            "throughput_per_minute": self.throughput() * 60,
+            "pending": sum(int(sketch.count) for sketch in self._pending.values()),
+            "syncs": self.syncs,
+            "failures": self.failures
+        }
+
+
+async def queue_positions(db: AsyncSession, created_ats: Iterable[datetime]) -> Dict[datetime, int]:
+    """Number of QUEUED generations created before each time, in one query."""
+    times = sorted(set(created_ats))
+    if not times:
+        return {}
+    counts = (await db.execute(select(*[
+        select(func.count(Generation.id))
+        .where(Generation.status == GenerationStatus.QUEUED, Generation.created_at < created_at)
+        .scalar_subquery()
+        for created_at in times
+    ]))).one()
+    return dict(zip(times, counts))
+
+
+async def estimate_completions(db: AsyncSession, generations: List[Generation]) -> Dict[str, Optional[datetime]]:
+    """Estimated completion time of each generation, by id."""
+    positions = await queue_positions(
+        db, [generation.created_at for generation in generations if generation.status == GenerationStatus.QUEUED]
+    )
+    return {
+        generation.id: generation_durations.estimate(
+            generation.algorithm_id,
+            generation.status,
+            generation.progress or 0,
+            started_at=generation.started_at,
+            ahead=positions.get(generation.created_at, 0)
+        )
+        for generation in generations
+    }
+
+
+generation_durations = DurationStats(
+    settings.generation_eta_half_life,
+    settings.generation_eta_rate_half_life,
+    settings.generation_eta_sync_interval
+)
@@ -0,0 +1,175 @@
+"""
+Generation progress events.
+
+Pipelines publish a small event for every stage ("analyzing", 10%) and
+for the final status. Clients watch a generation over SSE or WebSocket
+instead of polling its status:
+
+- in-process: subscribers get events straight from ``publish()``
+- across processes: events are also published on the
+  ``generation_progress`` Redis channel, and every API process forwards
+  the ones from other processes to its local subscribers
+
+Events are not persisted. Only final statuses are written to the database
+right away; intermediate progress is written at most every
+``generation_progress_write_interval`` seconds. ``watch()`` therefore
+starts from the database row and re-reads it whenever no event arrived
+for a keepalive interval, so a missed event (Redis down, a job failed by
+the queue reaper) only delays the final status.
+
+A slow subscriber never blocks a pipeline: each one has a small buffer
+and the oldest event is dropped when it is full, since a later progress
+event supersedes an earlier one.
+"""
+import asyncio
+import json
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from sqlalchemy import select
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.core.pubsub import ChannelListener, publish
+from src.models.generation import Generation, GenerationStatus
+
+CHANNEL = "generation_progress"
+SUBSCRIBER_BUFFER = 16
+
+FINAL_STATUSES = {GenerationStatus.COMPLETED, GenerationStatus.FAILED, GenerationStatus.CANCELLED}
+
+
+def progress_event(
+    generation_id: str,
+    status: GenerationStatus,
+    progress: int,
+    stage: Optional[str] = None,
+    **extra: Any
+) -> Dict[str, Any]:
+    """Build a progress event."""
+    return {
+        "generation_id": str(generation_id),
+        "status": status.value,
+        "progress": progress,
+        "stage": stage,
+        "at": datetime.utcnow().isoformat(),
+        **extra
+    }
+
+
+def is_final(event: Dict[str, Any]) -> bool:
+    return GenerationStatus(event["status"]) in FINAL_STATUSES
+
+
+class ProgressBus:
+    """Fans generation progress events out to subscribers."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        # Tags our own Redis messages so they are not delivered twice
+        self._origin = uuid.uuid4().hex
+        self.listener = ChannelListener(CHANNEL, self._on_message)
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def publish(self, event: Dict[str, Any]):
+        """Deliver an event to local subscribers and to other processes."""
+        self.published += 1
+        self._deliver(event)
+        await publish(CHANNEL, json.dumps({"origin": self._origin, "event": event}))
+
+    def _on_message(self, data: bytes):
+        message = json.loads(data)
+        if message["origin"] != self._origin:
+            self._deliver(message["event"])
+
+    def _deliver(self, event: Dict[str, Any]):
+        for queue in self._subscribers.get(event["generation_id"], ()):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+            self.delivered += 1
+
+    @asynccontextmanager
+    async def subscribe(self, *generation_ids: str) -> AsyncIterator[asyncio.Queue]:
+        """Receive the events of some generations on one queue while the context is open."""
+        keys = {str(generation_id) for generation_id in generation_ids}
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_BUFFER * len(keys))
+        for key in keys:
+            self._subscribers.setdefault(key, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            for key in keys:
+                subscribers = self._subscribers.get(key)
+                if subscribers is not None:
+                    subscribers.discard(queue)
+                    if not subscribers:
+                        del self._subscribers[key]
+
+    async def watch(self, generation_id: str) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Yield a generation's current state, then its events until a final one.
+
+        Yields None when nothing happened for a keepalive interval, so the
+        caller can ping its client.
+        """
+        keepalive = settings.generation_events_keepalive
+        async with self.subscribe(generation_id) as events:
+            # Subscribed before reading, so no event falls in between
+            last = await current_event(generation_id)
+            if last is None:
+                return
+            yield last
+            while not is_final(last):
+                try:
+                    event = await asyncio.wait_for(events.get(), keepalive)
+                except asyncio.TimeoutError:
+                    event = await current_event(generation_id)
+                    if event is None:
+                        return
+                    # The row can lag behind the events we already sent
+                    if event["status"] == last["status"] and event["progress"] <= last["progress"]:
+                        yield None
+                        continue
+                last = event
+                yield event
+
+    def start(self):
+        """Start forwarding events published by other processes."""
+        self.listener.start()
+
+    async def stop(self):
+        await self.listener.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "listening": self.listener.listening,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped
+        }
+
+
+async def current_event(generation_id: str) -> Optional[Dict[str, Any]]:
+    """Build an event from the generation row, or None if it does not exist."""
+    async with AsyncSessionLocal() as db:
+        generation = (await db.execute(
+            select(Generation).where(Generation.id == str(generation_id))
+        )).scalar_one_or_none()
+    if generation is None:
+        return None
+
+    extra = {}
+    if generation.status == GenerationStatus.COMPLETED:
+        extra["result_url"] = generation.result_url
+    elif generation.status == GenerationStatus.FAILED:
+        extra["message"] = generation.error_message
+    return progress_event(generation.id, generation.status, generation.progress or 0, **extra)
+
+
+progress_bus = ProgressBus()
@@ -0,0 +1,370 @@
+"""
+Durable generation job queue on the ``generations`` table.
+
+A job is a Generation row. ``create_generation`` commits it as QUEUED and
+any worker process can claim it:
+
+- which jobs to claim is up to the FairScheduler: the queue reads a window
+  of claimable jobs (the oldest few per user, round-robin, up to
+  ``generation_claim_window`` per tier) and the running jobs of those
+  users, and the scheduler picks from that. Only the jobs the worker
+  actually claims are charged to their tier and user
+- claiming is atomic: on PostgreSQL the picked users' rows are locked
+  with ``FOR UPDATE SKIP LOCKED`` before their jobs are claimed, so two
+  workers never claim for the same user at once. Each worker skips users
+  another worker is claiming for, and the per-user in-flight cap is
+  re-checked under the lock. The window query itself can't take the lock,
+  because PostgreSQL doesn't allow FOR UPDATE with window functions.
+  The claiming UPDATE also re-checks that each row is still claimable.
+  That is the only guard on SQLite, which ignores FOR UPDATE and
+  serializes writers anyway
+- a claim is a lease: the row becomes PROCESSING with ``lease_owner`` and
+  ``lease_expires_at`` set, and the worker extends it with heartbeats
+- if the worker dies the lease runs out (the visibility timeout) and the
+  job becomes claimable again, up to ``generation_max_attempts`` claims;
+  after that it is marked FAILED
+
+Jobs survive restarts and deploys because nothing but the row is needed
+to run them.
+"""
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from sqlalchemy import and_, func, or_, select, update
+
+from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.models.generation import Generation, GenerationStatus
+from src.models.user import User
+from src.services.generation_scheduler import DEFAULT_TIER, Candidate, FairScheduler
+
+# Claim rounds per call when other workers take the picked jobs first
+CLAIM_ROUNDS = 3
+
+# Queue waits kept per tier for the percentiles in stats()
+WAIT_SAMPLES = 1000
+
+
+class GenerationQueue:
+    """Claims, extends and releases leases on generation jobs."""
+
+    def __init__(
+        self,
+        lease_seconds: float,
+        max_attempts: int,
+        scheduler: FairScheduler,
+        claim_window: int
+    ):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.scheduler = scheduler
+        self.claim_window = claim_window
+        self._waits: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=WAIT_SAMPLES))
+        self.claimed = 0
+        self.released = 0
+        self.leases_lost = 0
+        self.exhausted = 0
+
+    def _lease_expired(self, now: datetime):
+        # A PROCESSING row without a lease was started before the queue existed
+        return and_(
+            Generation.status == GenerationStatus.PROCESSING,
+            or_(Generation.lease_expires_at.is_(None), Generation.lease_expires_at < now)
+        )
+
+    def _claimable(self, now: datetime):
+        return and_(
+            or_(Generation.status == GenerationStatus.QUEUED, self._lease_expired(now)),
+            Generation.attempts < self.max_attempts
+        )
+
+    async def claim(self, worker_id: str, limit: int) -> List[str]:
+        """Lease up to ``limit`` jobs chosen by the scheduler and return their ids."""
+        if limit <= 0:
+            return []
+
+        claimed: List[str] = []
+        async with AsyncSessionLocal() as session:
+            for _ in range(CLAIM_ROUNDS):
+                if len(claimed) >= limit:
+                    break
+                now = datetime.utcnow()
+                candidates = await self._candidates(session, now)
+                if not candidates:
+                    break
+
+                picked = self.scheduler.select(
+                    candidates.values(),
+                    await self._inflight(session, {c.user_id for c in candidates.values()}),
+                    limit - len(claimed)
+                )
+                if not picked:
+                    break
+                wanted = len(picked)
+                picked = await self._lock_users(session, picked)
+                if not picked:
+                    await session.commit()
+                    continue
+
+                won = (await session.execute(
+                    update(Generation)
+                    .where(Generation.id.in_([c.id for c in picked]), self._claimable(now))
+                    .values(
+                        status=GenerationStatus.PROCESSING,
+                        started_at=now,
+                        lease_owner=worker_id,
+                        lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                        attempts=Generation.attempts + 1
+                    )
+                    .returning(Generation.id, Generation.attempts)
+                    .execution_options(synchronize_session=False)
+                )).all()
+                await session.commit()
+                won_ids = {generation_id for generation_id, _ in won}
+                self.scheduler.commit([c for c in picked if c.id in won_ids])
+
+                for generation_id, attempts in won:
+                    claimed.append(generation_id)
+                    if attempts == 1:
+                        candidate = candidates[generation_id]
+                        self._waits[candidate.tier].append((now - candidate.created_at).total_seconds())
+                if len(won) == wanted:
+                    break
+
+        self.claimed += len(claimed)
+        return claimed
+
+    async def _candidates(self, session, now: datetime) -> Dict[str, Candidate]:
+        """Read the window of claimable jobs the scheduler picks from.
+
+        Each user's jobs are numbered oldest first and a tier's window takes
+        every user's first job, then every user's second job, and so on, so
+        one user's backlog cannot fill the window. Users never get more
+        jobs in the window than the largest in-flight cap.
+        """
+        by_user = select(
+            Generation.id,
+            Generation.user_id,
+            Generation.created_at,
+            User.subscription_tier.label("tier"),
+            func.row_number().over(
+                partition_by=Generation.user_id,
+                order_by=(Generation.created_at, Generation.id)
+            ).label("user_rank")
+        ).join(User, User.id == Generation.user_id).where(self._claimable(now)).subquery()
+
+        by_tier = select(
+            by_user,
+            func.row_number().over(
+                partition_by=by_user.c.tier,
+                order_by=(by_user.c.user_rank, by_user.c.created_at, by_user.c.id)
+            ).label("tier_rank")
+        ).where(by_user.c.user_rank <= max(self.scheduler.max_inflight.values(), default=1)).subquery()
+
+        rows = await session.execute(
+            select(by_tier.c.id, by_tier.c.user_id, by_tier.c.tier, by_tier.c.created_at)
+            .where(by_tier.c.tier_rank <= self.claim_window)
+        )
+        return {
+            row.id: Candidate(
+                id=row.id,
+                user_id=row.user_id,
+                tier=row.tier.value if row.tier is not None else DEFAULT_TIER,
+                created_at=row.created_at or now
+            )
+            for row in rows
+        }
+
+    async def _lock_users(self, session, picked: List[Candidate]) -> List[Candidate]:
+        """Lock the users of the picked jobs and drop picks that no longer fit.
+
+        Users whose row another worker holds are skipped rather than waited
+        for. For the users we lock, the in-flight count is read again under
+        the lock, so claims committed by other workers since the window was
+        read count against the cap.
+        """
+        locked = set((await session.execute(
+            select(User.id)
+            .where(User.id.in_({c.user_id for c in picked}))
+            .order_by(User.id)
+            .with_for_update(skip_locked=True)
+        )).scalars())
+        if not locked:
+            return []
+
+        running = await self._inflight(session, locked)
+        kept = []
+        for candidate in picked:
+            if candidate.user_id not in locked:
+                continue
+            if running.get(candidate.user_id, 0) >= self.scheduler.user_cap(candidate.tier):
+                continue
+            running[candidate.user_id] = running.get(candidate.user_id, 0) + 1
+            kept.append(candidate)
+        return kept
+
+    async def _inflight(self, session, user_ids: Set[str]) -> Dict[str, int]:
+        """Count running jobs per user, across all workers."""
+        rows = await session.execute(
+            select(Generation.user_id, func.count(Generation.id))
+            .where(Generation.user_id.in_(user_ids), Generation.status == GenerationStatus.PROCESSING)
+            .group_by(Generation.user_id)
+        )
+        return dict(rows.all())
+
+    async def heartbeat(self, worker_id: str, generation_ids: List[str]) -> Set[str]:
+        """Extend the leases this worker holds and return the ids it still holds.
+
+        A job missing from the result was reclaimed after its lease ran out,
+        or is no longer PROCESSING; the worker should stop running it.
+        """
+        if not generation_ids:
+            return set()
+
+        async with AsyncSessionLocal() as session:
+            held = (await session.execute(
+                update(Generation)
+                .where(
+                    Generation.id.in_(generation_ids),
+                    Generation.lease_owner == worker_id,
+                    Generation.status == GenerationStatus.PROCESSING
+                )
+                .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+                .returning(Generation.id)
+                .execution_options(synchronize_session=False)
+            )).scalars().all()
+            await session.commit()
+
+        held = set(held)
+        self.leases_lost += len(set(generation_ids) - held)
+        return held
+
+    async def release(self, worker_id: str, generation_id: str):
+        """Put an unfinished job back in the queue without counting the attempt.
+
+        Used on graceful shutdown so another worker picks the job up at
+        once instead of after the lease runs out.
+        """
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                update(Generation)
+                .where(
+                    Generation.id == generation_id,
+                    Generation.lease_owner == worker_id,
+                    Generation.status == GenerationStatus.PROCESSING
+                )
+                .values(
+                    status=GenerationStatus.QUEUED,
+                    progress=0,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    attempts=Generation.attempts - 1
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        self.released += result.rowcount
+
+    async def fail_exhausted(self) -> int:
+        """Fail jobs whose lease ran out on their last allowed attempt."""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                update(Generation)
+                .where(self._lease_expired(now), Generation.attempts >= self.max_attempts)
+                .values(
+                    status=GenerationStatus.FAILED,
+                    error_message=f"Generation did not finish after {self.max_attempts} attempts",
+                    completed_at=now,
+                    lease_owner=None,
+                    lease_expires_at=None
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        self.exhausted += result.rowcount
+        return result.rowcount
+
+    async def depth(self) -> int:
+        """Count jobs waiting to be claimed."""
+        async with AsyncSessionLocal() as session:
+            return (await session.execute(
+                select(func.count(Generation.id)).where(Generation.status == GenerationStatus.QUEUED)
+            )).scalar()
+
+    async def snapshot(self, window_seconds: float = 60.0) -> Dict[str, Any]:
+        """Queue depth and cluster-wide throughput, read from the table.
+
+        Every worker writes its results to the same table, so this covers all
+        worker processes without them reporting anywhere.
+        """
+        now = datetime.utcnow()
+        since = now - timedelta(seconds=window_seconds)
+        async with AsyncSessionLocal() as session:
+            pending = (await session.execute(
+                select(Generation.status, func.count(Generation.id), func.min(Generation.created_at))
+                .where(Generation.status.in_([GenerationStatus.QUEUED, GenerationStatus.PROCESSING]))
+                .group_by(Generation.status)
+            )).all()
+            finished = (await session.execute(
+                select(Generation.status, func.count(Generation.id))
+                .where(
+                    Generation.status.in_([GenerationStatus.COMPLETED, GenerationStatus.FAILED]),
+                    Generation.completed_at >= since
+                )
+                .group_by(Generation.status)
+            )).all()
+
+        counts = {status: (count, oldest) for status, count, oldest in pending}
+        done = dict(finished)
+        queued, oldest_queued = counts.get(GenerationStatus.QUEUED, (0, None))
+        return {
+            "queued": queued,
+            "processing": counts.get(GenerationStatus.PROCESSING, (0, None))[0],
+            "oldest_queued_seconds": (now - oldest_queued).total_seconds() if oldest_queued else 0.0,
+            "window_seconds": window_seconds,
+            "completed": done.get(GenerationStatus.COMPLETED, 0),
+            "failed": done.get(GenerationStatus.FAILED, 0),
+            "completed_per_minute": done.get(GenerationStatus.COMPLETED, 0) * 60.0 / window_seconds
+        }
+
+    def wait_stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Queue wait (creation to first claim) percentiles per tier, in seconds."""
+        result = {}
+        for tier, waits in self._waits.items():
+            ordered = sorted(waits)
+            result[tier] = {
+                "samples": len(ordered),
+                "p50": _percentile(ordered, 0.50),
+                "p95": _percentile(ordered, 0.95),
+                "p99": _percentile(ordered, 0.99),
+                "max": round(ordered[-1], 3) if ordered else None
+            }
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "claimed": self.claimed,
+            "released": self.released,
+            "leases_lost": self.leases_lost,
+            "exhausted": self.exhausted,
+            "queue_wait": self.wait_stats()
+        }
+
+
+def _percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+
+generation_queue = GenerationQueue(
+    lease_seconds=settings.generation_lease_seconds,
+    max_attempts=settings.generation_max_attempts,
+    scheduler=FairScheduler(
+        weights=settings.generation_tier_weights,
+        max_inflight=settings.generation_user_max_inflight
+    ),
+    claim_window=settings.generation_claim_window
+)
@@ -0,0 +1,138 @@
+"""
+Tier-aware fair scheduling of queued generations.
+
+Claiming jobs oldest-first lets one user's burst delay everyone behind it.
+When a worker has free slots, the queue hands the scheduler a window of
+claimable jobs and the scheduler decides which ones to run:
+
+- across subscription tiers: weighted fair queuing (stride scheduling).
+  Each tier has a virtual clock that advances by ``1 / weight`` for every
+  job it is given and the tier with the earliest clock goes next, so while
+  tiers are backlogged they share the slots in proportion to their weights.
+  A tier coming back from idle starts at the current virtual time instead
+  of spending credit it banked while idle.
+- within a tier: round-robin over users, least recently served first, so
+  a user with 500 queued jobs gets one slot per turn like everyone else.
+- per user: a cap on in-flight jobs per tier; users at their cap are
+  skipped even if a slot is free.
+
+The scheduler is pure (no I/O) and its clocks are per worker process;
+every worker applies the same policy to the same queue, which keeps the
+cluster-wide shares close to the weights. ``select`` only picks; tiers
+and users are charged by ``commit`` for the picks that were actually
+claimed, so picks lost to another worker don't skew the shares.
+"""
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List
+
+DEFAULT_TIER = "free"
+
+# Users remembered for round-robin order (least recently used are dropped)
+MAX_TRACKED_USERS = 10_000
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """A claimable generation job."""
+    id: str
+    user_id: str
+    tier: str
+    created_at: datetime
+
+
+class FairScheduler:
+    """Chooses which queued generations to run next."""
+
+    def __init__(self, weights: Dict[str, float], max_inflight: Dict[str, int]):
+        self.weights = weights
+        self.max_inflight = max_inflight
+        self._virtual_time = 0.0
+        self._tier_clock: Dict[str, float] = {}
+        self._turn = 0
+        self._user_turn: "OrderedDict[str, int]" = OrderedDict()
+
+    def weight(self, tier: str) -> float:
+        return max(self.weights.get(tier, self.weights.get(DEFAULT_TIER, 1.0)), 1e-6)
+
+    def user_cap(self, tier: str) -> int:
+        return self.max_inflight.get(tier, self.max_inflight.get(DEFAULT_TIER, 1))
+
+    def select(
+        self,
+        candidates: Iterable[Candidate],
+        inflight: Dict[str, int],
+        slots: int
+    ) -> List[Candidate]:
+        """Pick up to ``slots`` jobs to run, in the order they were picked.
+
+        Nothing is charged until the picks that were claimed are passed to
+        ``commit``.
+
+        Args:
+            candidates: Claimable jobs, in any order
+            inflight: Running jobs per user id (across all workers)
+            slots: Number of jobs to pick
+        """
+        # tier -> user -> that user's jobs, oldest first
+        queues: Dict[str, Dict[str, Deque[Candidate]]] = defaultdict(lambda: defaultdict(deque))
+        for candidate in sorted(candidates, key=lambda c: (c.created_at, c.id)):
+            queues[candidate.tier][candidate.user_id].append(candidate)
+
+        running = dict(inflight)
+        clock = {tier: self._start_clock(tier) for tier in queues}
+        # Turns taken by this selection, on top of _user_turn
+        turn = self._turn
+        user_turn: Dict[str, int] = {}
+
+        chosen: List[Candidate] = []
+        while len(chosen) < slots:
+            ready = {
+                tier: [
+                    user_id for user_id, jobs in users.items()
+                    if jobs and running.get(user_id, 0) < self.user_cap(tier)
+                ]
+                for tier, users in queues.items()
+            }
+            ready = {tier: user_ids for tier, user_ids in ready.items() if user_ids}
+            if not ready:
+                break
+
+            tier = min(ready, key=lambda t: (clock[t], -self.weight(t)))
+            user_id = min(
+                ready[tier],
+                key=lambda u: (user_turn.get(u, self._user_turn.get(u, -1)), queues[tier][u][0].created_at)
+            )
+            chosen.append(queues[tier][user_id].popleft())
+            running[user_id] = running.get(user_id, 0) + 1
+
+            clock[tier] += 1.0 / self.weight(tier)
+            turn += 1
+            user_turn[user_id] = turn
+
+        return chosen
+
+    def commit(self, claimed: Iterable[Candidate]):
+        """Charge tiers and users for the jobs that were claimed.
+
+        Pass the picks from ``select`` that were claimed, in pick order.
+        Picks that were dropped or that another worker claimed first are
+        left out, so nobody is charged for work they didn't get.
+        """
+        for candidate in claimed:
+            start = self._start_clock(candidate.tier)
+            self._virtual_time = start
+            self._tier_clock[candidate.tier] = start + 1.0 / self.weight(candidate.tier)
+            self._served(candidate.user_id)
+
+    def _start_clock(self, tier: str) -> float:
+        # A tier coming back from idle starts at the current virtual time
+        return max(self._tier_clock.get(tier, 0.0), self._virtual_time)
+
+    def _served(self, user_id: str):
+        self._turn += 1
+        self._user_turn[user_id] = self._turn
+        self._user_turn.move_to_end(user_id)
+        while len(self._user_turn) > MAX_TRACKED_USERS:
+            self._user_turn.popitem(last=False)
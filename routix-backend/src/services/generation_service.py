@@ -1,24 +1,77 @@
-import asyncio
+import hashlib
 import json
 import os
+import time
+import uuid
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 
-from src.models.generation import Generation, GenerationStatus
+from src.models.generation import Generation, GenerationBatch, GenerationStatus, CreditTransaction
 from src.models.algorithm import Algorithm
-from src.services.ai_service import AIService
+from src.models.user import User
+from src.schemas.generation import GenerationCreate
+from src.services.ai_service import get_ai_service
+from src.services.generation_cancellation import GenerationCancelled, generation_cancellation
+from src.services.generation_eta import RUN, generation_durations, stage_at
+from src.services.generation_events import progress_bus, progress_event
+from src.services.template_counters import template_counters
+from src.core.cache import LRUCache, TwoTierCache
 from src.core.database import AsyncSessionLocal
 from src.core.config import settings
+from src.core.singleflight import SingleFlight
+
+# Template ranking of each batch, shared by its variants
+_batch_templates = LRUCache(max_size=256, ttl=3600)
+
+# "user id:Idempotency-Key" -> {"id": generation id, "fingerprint": request fingerprint}
+idempotency_keys = TwoTierCache(
+    "idempotency",
+    max_size=settings.generation_idempotency_cache_size,
+    ttl=settings.generation_idempotency_ttl
+)
+
+# Coalesces concurrent submissions that share an idempotency key
+submissions = SingleFlight()
+
+
+class InsufficientCredits(Exception):
+    """The user can't pay for the generation."""
+    
+    def __init__(self, required: int, available: int):
+        super().__init__(f"Insufficient credits. Required: {required}, Available: {available}")
+
+
+class IdempotencyKeyReused(ValueError):
+    """An idempotency key was sent again with a different request."""
+
+
+def _fingerprint(
+    algorithm_id: str,
+    prompt: str,
+    conversation_id: Optional[Any],
+    reference_images: Optional[List[str]],
+    parameters: Optional[Dict[str, Any]]
+) -> str:
+    payload = json.dumps(
+        [algorithm_id, prompt, str(conversation_id) if conversation_id else None, reference_images, parameters],
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
 
 
 class GenerationService:
     """Service for managing thumbnail generation process."""
     
     def __init__(self):
-        self.ai_service = AIService()
+        self.ai_service = get_ai_service()
+        # generation id -> monotonic time of its last progress write
+        self._progress_written_at: Dict[str, float] = {}
+        # generation id -> (progress, monotonic time) its current stage started at
+        self._stage_started: Dict[str, Tuple[int, float]] = {}
     
     async def process_generation(self, generation_id: UUID, db: Optional[AsyncSession] = None):
         """Process a thumbnail generation request."""
@@ -31,8 +84,19 @@ class GenerationService:
             await self._process_generation_internal(generation_id, db)
     
     async def _process_generation_internal(self, generation_id: UUID, db: AsyncSession):
-        """Internal method to process generation."""
+        """Internal method to process generation.
         
+        Every write only applies while the generation is PROCESSING, so a
+        generation cancelled meanwhile stops at its next write and its
+        CANCELLED status is never overwritten.
+        
+        Progress goes out as events on every stage; the row only gets the
+        final status right away (see ``_update_progress``).
+        """
+        
+        started = time.monotonic()
+        self._progress_written_at[generation_id] = started
+        self._stage_started[generation_id] = (0, started)
         try:
             # Get generation record
             result = await db.execute(select(Generation).where(Generation.id == generation_id))
@@ -47,11 +111,20 @@ class GenerationService:
             algorithm = result.scalar_one_or_none()
             
             if not algorithm:
-                await self._mark_generation_failed(generation, "Algorithm not found", db)
+                await self._mark_generation_failed(generation.id, "Algorithm not found", db)
                 return
             
-            # Mark as started
-            generation.mark_as_started()
+            # Variants of a batch are analyzed by their shared base prompt, so
+            # the analysis cache and single-flight serve the batch one analysis
+            analysis_prompt = generation.prompt
+            if generation.batch_id:
+                result = await db.execute(
+                    select(GenerationBatch.prompt).where(GenerationBatch.id == generation.batch_id)
+                )
+                analysis_prompt = result.scalar_one_or_none() or generation.prompt
+            
+            # The worker's claim already set PROCESSING and started_at. End the
+            # read transaction so no pooled connection is held during AI calls
             await db.commit()
             
             # Step 1: Analyze prompt (10% progress)
@@ -65,36 +138,32 @@ class GenerationService:
                     pass
             
             analysis = await self.ai_service.analyze_prompt(
-                generation.prompt,
+                analysis_prompt,
                 reference_images
             )
             
             # Step 2: Find matching templates (30% progress)
             await self._update_progress(generation, 30, "Finding matching templates...", db)
             
-            templates = await self.ai_service.find_matching_templates(
-                analysis=analysis,
-                db_session=db,
-                limit=5,
-                min_score=0.0
-            )
+            templates = _batch_templates.get(generation.batch_id) if generation.batch_id else None
+            if templates is None:
+                templates = await self.ai_service.find_matching_templates(
+                    analysis=analysis,
+                    db_session=db,
+                    limit=5,
+                    min_score=0.0
+                )
+                if generation.batch_id and templates:
+                    _batch_templates.set(generation.batch_id, templates)
             
             if not templates:
-                await self._mark_generation_failed(generation, "No matching templates found", db)
+                await self._mark_generation_failed(generation.id, "No matching templates found", db)
                 return
             
-            # Select best template and increment its usage
-            best_template = templates[0]  # Highest match score
-            
-            # Update template usage count
-            from src.models.template import Template
-            template_result = await db.execute(
-                select(Template).where(Template.id == best_template["id"])
-            )
-            template_obj = template_result.scalar_one_or_none()
-            if template_obj:
-                template_obj.increment_usage()
-                await db.commit()
+            # Select best template and count its usage (flushed in batches);
+            # batch variants take turns over the top matches for variety
+            best_template = templates[(generation.batch_index or 0) % len(templates)]
+            template_counters.record_usage(best_template["id"])
             
             # Step 3: Generate thumbnail (60% progress)
             await self._update_progress(generation, 60, "Generating thumbnail...", db)
@@ -103,12 +172,13 @@ class GenerationService:
                 prompt=generation.prompt,
                 template=best_template,
                 algorithm=generation.algorithm_id,
-                reference_images=reference_images
+                reference_images=reference_images,
+                generation_id=str(generation.id)
             )
             
             if not generation_result.get("success"):
                 await self._mark_generation_failed(
-                    generation,
+                    generation.id,
                     "Thumbnail generation failed",
                     db
                 )
@@ -132,24 +202,51 @@ class GenerationService:
                 "processing_time": generation_result.get("processing_time", 0)
             }
             
-            generation.mark_as_completed(
-                result_url=result_url,
-                metadata=json.dumps(metadata)
+            completed = await self._write(
+                generation.id,
+                db,
+                **Generation.completed_values(result_url=result_url, metadata=json.dumps(metadata))
             )
+            if not completed:
+                raise GenerationCancelled()
             
-            await db.commit()
+            finished = time.monotonic()
+            self._record_stage(generation, finished)
+            generation_durations.record(generation.algorithm_id, RUN, finished - started)
             
+            await progress_bus.publish(progress_event(
+                generation.id, GenerationStatus.COMPLETED, 100, result_url=result_url
+            ))
             print(f"Generation {generation_id} completed successfully")
             
+        except GenerationCancelled:
+            print(f"Generation {generation_id} is no longer processing (cancelled), stopped")
+            
         except Exception as e:
             print(f"Error processing generation {generation_id}: {e}")
             
-            # Get generation again in case of error
-            result = await db.execute(select(Generation).where(Generation.id == generation_id))
-            generation = result.scalar_one_or_none()
-            
-            if generation:
-                await self._mark_generation_failed(generation, str(e), db)
+            await db.rollback()
+            await self._mark_generation_failed(generation_id, str(e), db)
+        
+        finally:
+            self._progress_written_at.pop(generation_id, None)
+            self._stage_started.pop(generation_id, None)
+    
+    async def _write(self, generation_id: UUID, db: AsyncSession, **values) -> bool:
+        """Update a generation that is still PROCESSING.
+        
+        Returns False, writing nothing, if it was cancelled or otherwise
+        finished in the meantime.
+        """
+        
+        result = await db.execute(
+            update(Generation)
+            .where(Generation.id == generation_id, Generation.status == GenerationStatus.PROCESSING)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount > 0
     
     async def _update_progress(
         self,
@@ -158,28 +255,49 @@ class GenerationService:
         message: str,
         db: AsyncSession
     ):
-        """Update generation progress."""
+        """Publish a progress event; write it to the row at most every few seconds.
         
-        generation.update_progress(progress)
-        await db.commit()
+        Watchers get every step from the event bus, so the row only needs
+        progress for status polls of long generations.
+        """
+        
+        progress = max(0, min(100, progress))
+        await progress_bus.publish(progress_event(
+            generation.id, GenerationStatus.PROCESSING, progress, stage=message
+        ))
+        
+        now = time.monotonic()
+        self._record_stage(generation, now)
+        self._stage_started[generation.id] = (progress, now)
+        
+        if now - self._progress_written_at.get(generation.id, now) >= settings.generation_progress_write_interval:
+            self._progress_written_at[generation.id] = now
+            if not await self._write(generation.id, db, progress=progress):
+                raise GenerationCancelled()
         
         print(f"Generation {generation.id}: {progress}% - {message}")
+    
+    def _record_stage(self, generation: Generation, now: float):
+        """Record the duration of the stage the generation just finished, for ETAs."""
         
-        # Small delay to simulate processing
-        await asyncio.sleep(0.5)
+        progress, started = self._stage_started.get(generation.id, (0, now))
+        stage = stage_at(progress)
+        if stage is not None:
+            generation_durations.record(generation.algorithm_id, stage, now - started)
     
     async def _mark_generation_failed(
         self,
-        generation: Generation,
+        generation_id: UUID,
         error_message: str,
         db: AsyncSession
     ):
-        """Mark generation as failed."""
-        
-        generation.mark_as_failed(error_message)
-        await db.commit()
+        """Mark generation as failed, unless it was cancelled meanwhile."""
         
-        print(f"Generation {generation.id} failed: {error_message}")
+        if await self._write(generation_id, db, **Generation.failed_values(error_message)):
+            await progress_bus.publish(progress_event(
+                generation_id, GenerationStatus.FAILED, 0, message=error_message
+            ))
+            print(f"Generation {generation_id} failed: {error_message}")
     
     async def _save_generated_image(
         self,
@@ -212,6 +330,148 @@ class GenerationService:
             # Return the original URL as fallback
             return image_url
     
+    async def submit_generation(
+        self,
+        user_id: str,
+        algorithm: Algorithm,
+        generation_data: GenerationCreate,
+        idempotency_key: Optional[str] = None
+    ) -> str:
+        """Charge for and enqueue a generation; returns its id.
+        
+        With an idempotency key, a user's generation is created at most once
+        per key: retries, concurrent or later, get the first one's id and are
+        not charged. Concurrent retries in this process wait on the first
+        submission, recent keys are answered from ``idempotency_keys``, and
+        across processes the unique (user_id, idempotency_key) index decides.
+        """
+        
+        if idempotency_key is None:
+            async with AsyncSessionLocal() as db:
+                return await self._create_generation(user_id, algorithm, generation_data, db)
+        
+        fingerprint = _fingerprint(
+            generation_data.algorithm_id,
+            generation_data.prompt,
+            generation_data.conversation_id,
+            generation_data.reference_images,
+            generation_data.parameters
+        )
+        cache_key = f"{user_id}:{idempotency_key}"
+        entry = await idempotency_keys.get(cache_key)
+        if entry is None:
+            entry = await submissions.do(
+                cache_key,
+                lambda: self._submit_once(user_id, algorithm, generation_data, idempotency_key, fingerprint)
+            )
+        
+        if entry["fingerprint"] != fingerprint:
+            raise IdempotencyKeyReused("Idempotency-Key was already used for a different generation request")
+        return entry["id"]
+    
+    async def _submit_once(
+        self,
+        user_id: str,
+        algorithm: Algorithm,
+        generation_data: GenerationCreate,
+        idempotency_key: str,
+        fingerprint: str
+    ) -> Dict[str, str]:
+        """Create the generation of an idempotency key, unless it exists already."""
+        
+        async with AsyncSessionLocal() as db:
+            generation = await self._find_by_idempotency_key(user_id, idempotency_key, db)
+            if generation is None:
+                try:
+                    generation_id = await self._create_generation(
+                        user_id, algorithm, generation_data, db, idempotency_key
+                    )
+                    entry = {"id": generation_id, "fingerprint": fingerprint}
+                except IntegrityError:
+                    # Another process inserted this key first; our credit
+                    # deduction and ledger entry are rolled back with the insert
+                    await db.rollback()
+                    generation = await self._find_by_idempotency_key(user_id, idempotency_key, db)
+                    if generation is None:
+                        raise
+            
+            if generation is not None:
+                entry = {
+                    "id": generation.id,
+                    "fingerprint": _fingerprint(
+                        generation.algorithm_id,
+                        generation.prompt,
+                        generation.conversation_id,
+                        json.loads(generation.reference_images) if generation.reference_images else None,
+                        json.loads(generation.parameters) if generation.parameters else None
+                    )
+                }
+        
+        await idempotency_keys.set(f"{user_id}:{idempotency_key}", entry)
+        return entry
+    
+    async def _find_by_idempotency_key(
+        self,
+        user_id: str,
+        idempotency_key: str,
+        db: AsyncSession
+    ) -> Optional[Generation]:
+        result = await db.execute(
+            select(Generation).where(
+                Generation.user_id == user_id,
+                Generation.idempotency_key == idempotency_key
+            )
+        )
+        return result.scalar_one_or_none()
+    
+    async def _create_generation(
+        self,
+        user_id: str,
+        algorithm: Algorithm,
+        generation_data: GenerationCreate,
+        db: AsyncSession,
+        idempotency_key: Optional[str] = None
+    ) -> str:
+        """Deduct credits, insert the QUEUED generation and its ledger entry in one transaction."""
+        
+        # Reserve credits atomically, so concurrent requests can't spend the same balance
+        reserved = await db.execute(
+            update(User)
+            .where(User.id == user_id, User.credits >= algorithm.cost_credits)
+            .values(credits=User.credits - algorithm.cost_credits)
+            .execution_options(synchronize_session=False)
+        )
+        if reserved.rowcount == 0:
+            result = await db.execute(select(User.credits).where(User.id == user_id))
+            available = result.scalar_one_or_none() or 0
+            await db.rollback()
+            raise InsufficientCredits(algorithm.cost_credits, available)
+        
+        generation_id = str(uuid.uuid4())
+        db.add(Generation(
+            id=generation_id,
+            user_id=user_id,
+            conversation_id=str(generation_data.conversation_id) if generation_data.conversation_id else None,
+            algorithm_id=algorithm.id,
+            prompt=generation_data.prompt,
+            reference_images=json.dumps(generation_data.reference_images) if generation_data.reference_images else None,
+            parameters=json.dumps(generation_data.parameters) if generation_data.parameters else None,
+            credits_used=algorithm.cost_credits,
+            status=GenerationStatus.QUEUED,
+            idempotency_key=idempotency_key
+        ))
+        db.add(CreditTransaction(
+            user_id=user_id,
+            type="usage",
+            amount=-algorithm.cost_credits,
+            description=f"Thumbnail generation using {algorithm.display_name}",
+            reference_id=generation_id
+        ))
+        
+        # Committing the QUEUED row is what enqueues it; a generation worker claims it
+        await db.commit()
+        return generation_id
+    
     async def get_generation_progress(self, generation_id: UUID) -> Optional[Dict[str, Any]]:
         """Get current progress of a generation."""
         
@@ -233,18 +493,23 @@ class GenerationService:
             }
     
     async def cancel_generation(self, generation_id: UUID) -> bool:
-        """Cancel a generation if it's still in progress."""
+        """Cancel a generation if it's still in progress and stop its pipeline."""
         
         async with AsyncSessionLocal() as db:
-            result = await db.execute(select(Generation).where(Generation.id == generation_id))
-            generation = result.scalar_one_or_none()
-            
-            if not generation:
-                return False
-            
-            if generation.status in [GenerationStatus.QUEUED, GenerationStatus.PROCESSING]:
-                generation.status = GenerationStatus.CANCELLED
-                await db.commit()
-                return True
-            
+            result = await db.execute(
+                update(Generation)
+                .where(
+                    Generation.id == generation_id,
+                    Generation.status.in_([GenerationStatus.QUEUED, GenerationStatus.PROCESSING])
+                )
+                .values(**Generation.cancelled_values())
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        
+        if result.rowcount == 0:
             return False
+        
+        await generation_cancellation.cancel(generation_id)
+        await progress_bus.publish(progress_event(generation_id, GenerationStatus.CANCELLED, 0))
+        return True
@@ -0,0 +1,134 @@
+"""
+Generation status reads for polling clients, with long-polling.
+
+A status carries a ``version`` that only moves forward while a
+generation runs (QUEUED < PROCESSING by progress < final). A client sends
+back the version it has as ``since`` together with ``wait`` seconds, and
+the request returns as soon as any of its generations has moved past
+that version, instead of the client asking once a second.
+
+While waiting, a request holds no database connection: it reads the rows
+once, then sleeps on the progress event bus (see generation_events) and
+answers from the event that woke it. Only when the wait runs out does it
+read the rows again, in case an event was missed.
+
+Unfinished generations carry an ``estimated_completion`` from the rolling
+stage durations (see generation_eta).
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from src.core.database import AsyncSessionLocal
+from src.models.generation import Generation, GenerationStatus
+from src.schemas.generation import GenerationProgress
+from src.services.generation_eta import estimate_completions, generation_durations
+from src.services.generation_events import progress_bus
+
+_VERSION_BASE = {
+    GenerationStatus.QUEUED: 0,
+    GenerationStatus.PROCESSING: 1000,
+    GenerationStatus.COMPLETED: 2000,
+    GenerationStatus.FAILED: 2001,
+    GenerationStatus.CANCELLED: 2002
+}
+
+
+def status_version(status: GenerationStatus, progress: int) -> int:
+    """Version of a generation state; progress only counts while PROCESSING."""
+    if status == GenerationStatus.PROCESSING:
+        return _VERSION_BASE[status] + max(0, min(100, progress or 0))
+    return _VERSION_BASE[status]
+
+
+def _is_newer(version: int, since: Optional[int]) -> bool:
+    if since is None:
+        return True
+    # Persisted progress can lag behind the events a client has already seen
+    if 1000 <= version < 2000 and 1000 <= since < 2000:
+        return version > since
+    return version != since
+
+
+def _from_row(generation: Generation, estimated_completion: Optional[datetime]) -> GenerationProgress:
+    return GenerationProgress(
+        generation_id=generation.id,
+        status=generation.status,
+        progress=generation.progress or 0,
+        message=generation.error_message if generation.is_failed else None,
+        estimated_completion=estimated_completion,
+        version=status_version(generation.status, generation.progress)
+    )
+
+
+def _from_event(event: Dict[str, Any], algorithm_id: str) -> GenerationProgress:
+    status = GenerationStatus(event["status"])
+    return GenerationProgress(
+        generation_id=event["generation_id"],
+        status=status,
+        progress=event["progress"],
+        message=event.get("message") if status == GenerationStatus.FAILED else event.get("stage"),
+        # A progress event is sent as its stage starts
+        estimated_completion=generation_durations.estimate(
+            algorithm_id, status, event["progress"], stage_started_at=datetime.fromisoformat(event["at"])
+        ),
+        version=status_version(status, event["progress"])
+    )
+
+
+async def _read(user_id: str, generation_ids: Iterable[str]) -> Tuple[Dict[str, GenerationProgress], Dict[str, str]]:
+    """Statuses of the user's generations, and their algorithm ids."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Generation).where(
+                Generation.id.in_(list(generation_ids)),
+                Generation.user_id == user_id
+            )
+        )
+        generations = result.scalars().all()
+        estimates = await estimate_completions(db, generations)
+    statuses = {generation.id: _from_row(generation, estimates[generation.id]) for generation in generations}
+    return statuses, {generation.id: generation.algorithm_id for generation in generations}
+
+
+async def get_statuses(
+    user_id: str,
+    generation_ids: List[str],
+    since: Optional[Dict[str, int]] = None,
+    wait: float = 0.0
+) -> List[GenerationProgress]:
+    """Get the statuses of a user's generations in one query (two if some are queued).
+
+    With ``wait``, returns as soon as one of them is newer than its
+    ``since`` version, or after ``wait`` seconds with the current statuses.
+    Generations that don't exist or belong to someone else are left out.
+    """
+    since = since or {}
+    async with progress_bus.subscribe(*generation_ids) as events:
+        # Subscribed before reading, so no change falls in between
+        statuses, algorithms = await _read(user_id, generation_ids)
+        if wait <= 0 or not statuses or any(
+            _is_newer(status.version, since.get(generation_id))
+            for generation_id, status in statuses.items()
+        ):
+            return list(statuses.values())
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+            generation_id = event["generation_id"]
+            if generation_id not in statuses:
+                continue
+            status = _from_event(event, algorithms[generation_id])
+            if _is_newer(status.version, since.get(generation_id)):
+                statuses[generation_id] = status
+                return list(statuses.values())
+
+    statuses, _ = await _read(user_id, generation_ids)
+    return list(statuses.values())
@@ -0,0 +1,199 @@
+"""
+Generation worker: pulls jobs from the generation queue and runs them.
+
+A worker keeps up to ``concurrency`` GenerationService pipelines running.
+Whenever a slot frees up (or every ``generation_poll_interval`` seconds
+when the queue was empty) it claims more jobs. One heartbeat loop extends
+the leases of all running jobs together, and a job whose lease was lost is
+cancelled so two workers never keep running the same generation.
+
+``stop()`` stops claiming, lets running jobs finish for a grace period and
+then cancels the rest and puts them back in the queue.
+
+Workers run in separate processes, so each one also writes its ``stats()``
+to Redis on every heartbeat (``generation_worker:<id>``, expiring after a
+few missed heartbeats) for ``/metrics/generations`` to list.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import RedisError
+
+from src.core.config import settings
+from src.core.redis import get_redis, mark_redis_unavailable
+from src.services.generation_cancellation import generation_cancellation
+from src.services.generation_queue import GenerationQueue, generation_queue
+from src.services.generation_service import GenerationService
+
+REPORT_PREFIX = "generation_worker:"
+
+
+class GenerationWorker:
+    """Runs queued generations, up to ``concurrency`` at a time."""
+
+    def __init__(
+        self,
+        concurrency: int,
+        queue: Optional[GenerationQueue] = None,
+        worker_id: Optional[str] = None
+    ):
+        self.concurrency = concurrency
+        self.queue = queue or generation_queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.service = GenerationService()
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._reaped_at = 0.0
+        self.started_at = time.time()
+        self.processed = 0
+        self.cancelled = 0
+
+    async def run(self):
+        """Claim and run jobs until ``stop()`` is called."""
+        print(f"👷 Generation worker {self.worker_id} started (concurrency {self.concurrency})")
+        self._heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat())
+        generation_cancellation.start()
+        try:
+            while not self._stopping:
+                self._wakeup.clear()
+                try:
+                    await self._fill()
+                except Exception as e:
+                    print(f"⚠️  Generation worker {self.worker_id} could not claim jobs: {e}")
+
+                # Wake early when a job finishes and frees a slot
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.generation_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # On stop() the heartbeat keeps the leases of finishing jobs alive
+            if not self._stopping:
+                self._heartbeat_task.cancel()
+
+    async def _fill(self):
+        if time.monotonic() - self._reaped_at >= settings.generation_lease_seconds:
+            self._reaped_at = time.monotonic()
+            await self.queue.fail_exhausted()
+
+        free = self.concurrency - len(self._jobs)
+        for generation_id in await self.queue.claim(self.worker_id, free):
+            self._start(generation_id)
+
+    def _start(self, generation_id: str):
+        task = asyncio.get_running_loop().create_task(self._run_job(generation_id))
+        self._jobs[generation_id] = task
+        generation_cancellation.register(generation_id, task)
+        task.add_done_callback(lambda _: self._finished(generation_id, task))
+
+    def _finished(self, generation_id: str, task: asyncio.Task):
+        self._jobs.pop(generation_id, None)
+        generation_cancellation.unregister(generation_id, task)
+        self._wakeup.set()
+
+    async def _run_job(self, generation_id: str):
+        try:
+            await self.service.process_generation(generation_id)
+            self.processed += 1
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        except Exception as e:
+            # The pipeline marks its own failures; this is a bug or a lost database
+            print(f"⚠️  Generation {generation_id} crashed, the lease will expire: {e}")
+
+    async def _heartbeat(self):
+        interval = settings.generation_heartbeat_interval
+        while True:
+            await self._report(ttl=3 * interval)
+            await asyncio.sleep(interval)
+            running = list(self._jobs)
+            try:
+                held = await self.queue.heartbeat(self.worker_id, running)
+            except Exception as e:
+                print(f"⚠️  Generation worker {self.worker_id} heartbeat failed: {e}")
+            else:
+                for generation_id in running:
+                    task = self._jobs.get(generation_id)
+                    if generation_id not in held and task is not None:
+                        # Reclaimed after the lease ran out, or cancelled
+                        print(f"⚠️  Generation {generation_id} is no longer leased to this worker, stopping it")
+                        task.cancel()
+
+    async def _report(self, ttl: Optional[float] = None):
+        """Publish stats() to Redis; a ttl of None removes the report."""
+        redis = get_redis()
+        if redis is None:
+            return
+        key = f"{REPORT_PREFIX}{self.worker_id}"
+        try:
+            if ttl is None:
+                await redis.delete(key)
+            else:
+                await redis.set(key, json.dumps(self.stats()), ex=max(1, int(ttl)))
+        except (RedisError, OSError) as e:
+            mark_redis_unavailable(e)
+
+    async def stop(self, grace_period: Optional[float] = None):
+        """Stop claiming, wait for running jobs, then cancel and requeue the rest."""
+        self._stopping = True
+        self._wakeup.set()
+        grace_period = settings.generation_shutdown_grace if grace_period is None else grace_period
+
+        running = dict(self._jobs)
+        if running:
+            print(f"⏳ Waiting up to {grace_period:.0f}s for {len(running)} generations")
+            await asyncio.wait(running.values(), timeout=grace_period)
+
+        unfinished = {generation_id: task for generation_id, task in running.items() if not task.done()}
+        for task in unfinished.values():
+            task.cancel()
+        if unfinished:
+            await asyncio.gather(*unfinished.values(), return_exceptions=True)
+        for generation_id in unfinished:
+            try:
+                await self.queue.release(self.worker_id, generation_id)
+            except Exception as e:
+                print(f"⚠️  Could not requeue generation {generation_id}, its lease will expire: {e}")
+
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+        await generation_cancellation.stop()
+        await self._report(ttl=None)
+
+    def stats(self) -> Dict[str, Any]:
+        uptime = time.time() - self.started_at
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "running": len(self._jobs),
+            "processed": self.processed,
+            "cancelled": self.cancelled,
+            "uptime_seconds": round(uptime, 1),
+            "processed_per_minute": round(self.processed * 60.0 / uptime, 2) if uptime > 0 else 0.0,
+            "queue": self.queue.stats()
+        }
+
+
+async def worker_reports() -> Optional[List[Dict[str, Any]]]:
+    """Get the latest stats of every live worker process, or None without Redis."""
+    redis = get_redis()
+    if redis is None:
+        return None
+    try:
+        keys = [key async for key in redis.scan_iter(match=f"{REPORT_PREFIX}*", count=100)]
+        values = await redis.mget(keys) if keys else []
+    except (RedisError, OSError) as e:
+        mark_redis_unavailable(e)
+        return None
+    return sorted(
+        (json.loads(value) for value in values if value is not None),
+        key=lambda report: report["worker_id"]
+    )
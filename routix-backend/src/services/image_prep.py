@@ -0,0 +1,78 @@
+"""
+Reference image preparation for vision analysis.
+
+Reference images are read, decoded and downscaled in the blocking-work
+pool (never on the event loop), re-encoded as JPEG at the resolution the
+vision model actually uses, and cached by file content hash. The images of
+one request are prepared in parallel.
+"""
+import asyncio
+import hashlib
+import io
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from src.core.cache import LRUCache
+from src.core.config import settings
+from src.services.ai_providers import run_blocking
+
+# content hash -> {"mime_type": ..., "data": ...}
+_prepared_cache = LRUCache(
+    max_size=settings.vision_image_cache_size,
+    ttl=settings.vision_image_cache_ttl
+)
+
+
+def _read_file(path: str) -> Tuple[bytes, str]:
+    """Read a file and hash its content (blocking)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return data, hashlib.sha256(data).hexdigest()
+
+
+def _downscale(data: bytes, max_dimension: int, quality: int) -> bytes:
+    """Decode, downscale and re-encode an image as JPEG (blocking)."""
+    image = Image.open(io.BytesIO(data))
+    # Let the JPEG decoder skip detail we are about to throw away
+    image.draft("RGB", (max_dimension, max_dimension))
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality, optimize=True)
+    return output.getvalue()
+
+
+async def prepare_reference_image(path: str) -> Optional[Dict[str, Any]]:
+    """Prepare one reference image as an inline JPEG blob, or None if it can't be read."""
+    if not os.path.exists(path):
+        return None
+
+    try:
+        data, content_hash = await run_blocking(_read_file, path)
+
+        prepared = _prepared_cache.get(content_hash)
+        if prepared is None:
+            jpeg = await run_blocking(
+                _downscale,
+                data,
+                settings.vision_max_dimension,
+                settings.vision_jpeg_quality
+            )
+            prepared = {"mime_type": "image/jpeg", "data": jpeg}
+            _prepared_cache.set(content_hash, prepared)
+
+        return prepared
+    except Exception as e:
+        print(f"Error loading image {path}: {e}")
+        return None
+
+
+async def prepare_reference_images(paths: List[str]) -> List[Dict[str, Any]]:
+    """Prepare several reference images in parallel, skipping unreadable ones."""
+    prepared = await asyncio.gather(*(prepare_reference_image(path) for path in paths))
+    return [image for image in prepared if image is not None]
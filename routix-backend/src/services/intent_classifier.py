@@ -0,0 +1,143 @@
+"""
+Local chat intent classifier.
+
+Decides whether a chat message asks for a thumbnail to be generated using
+a weighted set of phrases compiled into one regular expression. Each
+matched phrase adds its weight to a logit; the logistic of that logit is
+the probability of generation intent. Messages whose probability falls
+between the confidence thresholds are left to the LLM.
+"""
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict
+
+from src.core.config import settings
+
+
+# Phrase -> weight. Positive weights push towards generation intent.
+INTENT_FEATURES: Dict[str, float] = {
+    # Direct requests for the product
+    "thumbnail": 2.5,
+    "thumbnails": 2.5,
+    "cover image": 2.0,
+    "banner": 1.5,
+    "generate": 2.0,
+    "create": 1.5,
+    "design": 1.5,
+    "make": 1.0,
+    "make me": 1.5,
+    "build": 0.5,
+    "draw": 1.5,
+    "render": 1.0,
+    "image": 1.0,
+    "picture": 1.0,
+    "visual": 0.5,
+    "graphic": 1.0,
+    # Request phrasing
+    "can you": 0.5,
+    "could you": 0.5,
+    "i need": 1.0,
+    "i want": 1.0,
+    "i'd like": 1.0,
+    "please": 0.5,
+    "help me with": 0.5,
+    "for my video": 1.5,
+    "for my channel": 1.5,
+    "for my vlog": 1.5,
+    "youtube": 1.0,
+    "video": 0.5,
+    "give me": 1.0,
+    # Style descriptors usually only mentioned when describing a thumbnail
+    "bold": 0.5,
+    "minimalist": 0.5,
+    "colorful": 0.5,
+    "vibrant": 0.5,
+    "text saying": 1.5,
+    "with the text": 1.5,
+    # Account, billing and support questions
+    "credits": -2.5,
+    "credit": -2.0,
+    "price": -2.5,
+    "pricing": -2.5,
+    "cost": -1.5,
+    "subscription": -2.5,
+    "plan": -1.0,
+    "refund": -3.0,
+    "password": -3.0,
+    "account": -2.0,
+    "login": -3.0,
+    "log in": -3.0,
+    "invoice": -3.0,
+    "delete": -1.5,
+    "cancel": -1.5,
+    "file format": -2.0,
+    "formats": -1.5,
+    "support": -1.0,
+    "how long": -1.5,
+    "how many": -1.0,
+    "how does": -1.5,
+    "how do": -1.0,
+    "what is": -1.0,
+    "what are": -1.0,
+    "why": -1.0,
+    # Small talk
+    "hello": -1.5,
+    "hi": -1.5,
+    "hey": -1.0,
+    "thanks": -3.0,
+    "thank you": -3.0,
+    "great": -0.5,
+    "awesome": -0.5,
+    "bye": -3.0,
+    "goodbye": -3.0,
+}
+
+# Logit before any feature matches: an unknown message leans towards "no"
+BIAS = -1.0
+
+
+@dataclass(frozen=True)
+class IntentPrediction:
+    requires_generation: bool
+    probability: float
+    is_confident: bool
+
+
+class IntentClassifier:
+    """Weighted phrase classifier compiled into a single regex."""
+
+    def __init__(self, features: Dict[str, float], bias: float, high: float, low: float):
+        self.features = {phrase.lower(): weight for phrase, weight in features.items()}
+        self.bias = bias
+        self.high = high
+        self.low = low
+        # Longest phrases first so "thank you" wins over shorter overlaps
+        alternation = "|".join(
+            re.escape(phrase).replace(r"\ ", r"\s+")
+            for phrase in sorted(self.features, key=len, reverse=True)
+        )
+        self._pattern = re.compile(rf"\b(?:{alternation})\b", re.IGNORECASE)
+
+    def score(self, message: str) -> float:
+        """Get the probability that a message asks for a thumbnail."""
+        logit = self.bias
+        for match in self._pattern.finditer(message):
+            logit += self.features[" ".join(match.group(0).lower().split())]
+        return 1.0 / (1.0 + math.exp(-logit))
+
+    def classify(self, message: str) -> IntentPrediction:
+        probability = self.score(message)
+        return IntentPrediction(
+            requires_generation=probability >= 0.5,
+            probability=probability,
+            is_confident=probability >= self.high or probability <= self.low
+        )
+
+
+intent_classifier = IntentClassifier(
+    INTENT_FEATURES,
+    BIAS,
+    high=settings.intent_confidence_high,
+    low=settings.intent_confidence_low
+)
@@ -155,14 +155,13 @@ class StorageService:
     
     async def download_from_url(self, url: str) -> bytes:
         """دانلود تصویر از URL"""
-        import aiohttp
+        from src.core.http import http_client
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    return await response.read()
-                else:
-                    raise Exception(f"Failed to download image: {response.status}")
+        async with http_client.session.get(url) as response:
+            if response.status == 200:
+                return await response.read()
+            else:
+                raise Exception(f"Failed to download image: {response.status}")
     
     async def add_watermark(
         self,
@@ -0,0 +1,458 @@
+"""
+Versioned, immutable snapshot of the active template catalog.
+
+Each snapshot is built from parsed rows (``TemplateEntry``, JSON columns
+decoded once) and dense feature matrices: one-hot category, style and
+mood columns and an element bitmap. A query scores the whole catalog with
+a handful of NumPy column operations, using the same arithmetic in the
+same order as ``Template.calculate_match_score`` so scores are
+bit-identical, and picks the top k with ``argpartition`` before breaking
+ties on (score, rating, usage_count).
+
+Matching never touches the database once the first snapshot exists. A new
+snapshot is built in the background and swapped in (a single reference
+assignment, so readers see either the old or the new one) when:
+
+- a Template is inserted, deleted or has a match-relevant column updated
+  and the session commits; the change also bumps a version counter in
+  Redis so other workers rebuild too
+- a throttled check (every ``template_catalog_check_interval`` seconds)
+  finds the Redis version has moved
+- the snapshot is older than ``template_index_refresh_interval`` seconds
+  (covers changes made while Redis was unavailable)
+"""
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from redis.exceptions import RedisError
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from src.core.config import settings
+from src.core.redis import get_redis, mark_redis_unavailable
+from src.models.template import Template
+from src.services.ai_providers import run_blocking
+
+# Columns that change often but don't affect which templates match
+_VOLATILE_COLUMNS = {"usage_count", "rating", "updated_at"}
+
+# Cluster-wide catalog version, bumped on every committed template change
+VERSION_KEY = "templates:catalog_version"
+
+
+def _json_list(value: Optional[str]) -> Optional[list]:
+    """Parse a JSON array column, or None if it is empty or invalid."""
+    if value:
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return None
+    return None
+
+
+class TemplateEntry:
+    """Compact, parsed copy of one active template row."""
+
+    __slots__ = (
+        "id", "name", "description", "category", "style", "mood",
+        "primary_color", "secondary_color", "colors", "elements", "tags",
+        "preview_image", "is_premium", "usage_count", "rating"
+    )
+
+    def __init__(self, row):
+        self.id = row.id
+        self.name = row.name
+        self.description = row.description
+        self.category = row.category
+        self.style = row.style
+        self.mood = row.mood
+        self.primary_color = row.primary_color
+        self.secondary_color = row.secondary_color
+        # Same fallbacks as the Template.elements_list / tags_list / colors properties
+        self.colors = tuple(_json_list(row.color_scheme) or (row.primary_color, row.secondary_color))
+        self.elements = tuple(_json_list(row.elements) or ())
+        self.tags = tuple(_json_list(row.tags) or ())
+        self.preview_image = row.preview_image
+        self.is_premium = row.is_premium
+        self.usage_count = row.usage_count or 0
+        self.rating = row.rating or 0.0
+
+    def to_dict(self, match_score: float) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "category": self.category,
+            "style": self.style,
+            "mood": self.mood,
+            "primary_color": self.primary_color,
+            "secondary_color": self.secondary_color,
+            "colors": list(self.colors),
+            "elements": list(self.elements),
+            "tags": list(self.tags),
+            "preview_image": self.preview_image,
+            "is_premium": self.is_premium,
+            "match_score": match_score,
+            "usage_count": self.usage_count,
+            "rating": self.rating
+        }
+
+
+# Only the columns TemplateEntry needs, without ORM hydration
+_ENTRY_COLUMNS = [getattr(Template, name) for name in (
+    "id", "name", "description", "category", "style", "mood",
+    "primary_color", "secondary_color", "color_scheme", "elements", "tags",
+    "preview_image", "is_premium", "usage_count", "rating"
+)]
+
+
+def _one_hot(values: List[str]):
+    """Build a one-hot matrix and its column vocabulary for a categorical field."""
+    vocabulary = {value: column for column, value in enumerate(dict.fromkeys(values))}
+    matrix = np.zeros((len(values), len(vocabulary)), dtype=bool)
+    if values:
+        matrix[np.arange(len(values)), [vocabulary[value] for value in values]] = True
+    return matrix, vocabulary
+
+
+class TemplateIndex:
+    """Immutable catalog snapshot: parsed entries plus their feature matrices.
+
+    ``rows`` can be Template models or result rows with the same attributes.
+    """
+
+    def __init__(self, rows, version: int = 0):
+        self.version = version
+        self.built_at = time.time()
+        self.entries: Tuple[TemplateEntry, ...] = tuple(TemplateEntry(row) for row in rows)
+        entries = self.entries
+
+        self._category, self._category_columns = _one_hot([e.category for e in entries])
+        self._style, self._style_columns = _one_hot([e.style for e in entries])
+        self._mood, self._mood_columns = _one_hot([e.mood for e in entries])
+
+        self._element_columns = {
+            element: column
+            for column, element in enumerate(dict.fromkeys(el for e in entries for el in e.elements))
+        }
+        self._elements = np.zeros((len(entries), len(self._element_columns)), dtype=bool)
+        for row, entry in enumerate(entries):
+            self._elements[row, [self._element_columns[el] for el in set(entry.elements)]] = True
+
+        self._rating = np.array([e.rating for e in entries], dtype=np.float64)
+        self._usage_count = np.array([e.usage_count for e in entries], dtype=np.int64)
+        self._is_premium = np.array([bool(e.is_premium) for e in entries], dtype=bool)
+        # Column number of each template's value, for counting facets with bincount
+        self._codes = {
+            field: np.array([columns[getattr(e, field)] for e in entries], dtype=np.intp)
+            for field, columns in (
+                ("category", self._category_columns),
+                ("style", self._style_columns),
+                ("mood", self._mood_columns)
+            )
+        }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _column(matrix, columns: Dict[str, int], value):
+        """Get a one-hot column as a 0/1 mask, or None if no template has the value."""
+        column = columns.get(value)
+        return matrix[:, column] if column is not None else None
+
+    def scores(
+        self,
+        analysis: Dict[str, Any],
+        category_weight: float = 0.4,
+        style_weight: float = 0.3,
+        mood_weight: float = 0.2,
+        element_weight: float = 0.1
+    ):
+        """Score every template against an analysis, as Template.calculate_match_score would."""
+        score = np.zeros(len(self.entries), dtype=np.float64)
+
+        # Adding 0.0 for a mismatch leaves a float unchanged, so this matches
+        # the scalar version's conditional additions exactly
+        for matrix, columns, value, weight in (
+            (self._category, self._category_columns, analysis.get('category'), category_weight),
+            (self._style, self._style_columns, analysis.get('style'), style_weight),
+            (self._mood, self._mood_columns, analysis.get('mood'), mood_weight)
+        ):
+            mask = self._column(matrix, columns, value)
+            if mask is not None:
+                score += np.where(mask, weight, 0.0)
+
+        analysis_elements = set(analysis.get('elements') or [])
+        if analysis_elements:
+            columns = [self._element_columns[e] for e in analysis_elements if e in self._element_columns]
+            if columns:
+                overlap = self._elements[:, columns].sum(axis=1) / len(analysis_elements)
+                score += element_weight * overlap
+
+        return np.minimum(score, 1.0)
+
+    def facet_counts(
+        self,
+        filters: Dict[str, Any],
+        is_premium: Optional[bool] = None,
+        min_rating: Optional[float] = None
+    ) -> Tuple[int, Dict[str, Dict[str, int]]]:
+        """Count templates matching the filters, and per category, style and mood value.
+
+        Each field's counts apply every filter except that field's own, so
+        they show what picking another value would return.
+
+        Args:
+            filters: Optional ``category``, ``style`` and ``mood`` values
+
+        Returns:
+            (total, {field: {value: count}}), values with no templates left out
+        """
+        vocabularies = {
+            "category": self._category_columns,
+            "style": self._style_columns,
+            "mood": self._mood_columns
+        }
+
+        base = np.ones(len(self.entries), dtype=bool)
+        if is_premium is not None:
+            base &= self._is_premium == is_premium
+        if min_rating is not None:
+            base &= self._rating >= min_rating
+
+        field_masks = {}
+        for field, columns in vocabularies.items():
+            value = filters.get(field)
+            if value is not None:
+                # -1 matches no template when nobody has the value
+                field_masks[field] = self._codes[field] == columns.get(value, -1)
+
+        counts = {}
+        for field, columns in vocabularies.items():
+            mask = base.copy()
+            for other, other_mask in field_masks.items():
+                if other != field:
+                    mask &= other_mask
+            column_counts = np.bincount(self._codes[field][mask], minlength=len(columns)).tolist()
+            counts[field] = {value: column_counts[column] for value, column in columns.items() if column_counts[column]}
+
+        total = base
+        for mask in field_masks.values():
+            total = total & mask
+        return int(total.sum()), counts
+
+    def top_k(
+        self,
+        analysis: Dict[str, Any],
+        limit: int,
+        min_score: float = 0.0,
+        category_weight: float = 0.4,
+        style_weight: float = 0.3,
+        mood_weight: float = 0.2,
+        element_weight: float = 0.1
+    ) -> List[Dict[str, Any]]:
+        """Get the best matching templates, ordered by (score, rating, usage_count)."""
+        if limit <= 0 or not self.entries:
+            return []
+
+        score = self.scores(analysis, category_weight, style_weight, mood_weight, element_weight)
+        candidates = np.flatnonzero(score >= min_score)
+
+        if len(candidates) > limit:
+            # Everything tied with the k-th best score can still win on rating/usage
+            candidate_scores = score[candidates]
+            best = np.argpartition(-candidate_scores, limit - 1)[:limit]
+            candidates = candidates[candidate_scores >= candidate_scores[best].min()]
+
+        # lexsort sorts by the last key first; negate for descending order
+        order = np.lexsort((
+            -self._usage_count[candidates],
+            -self._rating[candidates],
+            -score[candidates]
+        ))
+        top = candidates[order[:limit]]
+
+        return [
+            self.entries[doc_id].to_dict(match_score)
+            for doc_id, match_score in zip(top.tolist(), score[top].tolist())
+        ]
+
+
+class TemplateCatalog:
+    """Holds the current catalog snapshot and swaps in new ones when templates change."""
+
+    def __init__(self, check_interval: float, refresh_interval: float):
+        self.check_interval = check_interval
+        self.refresh_interval = refresh_interval
+        self._snapshot: Optional[TemplateIndex] = None
+        self._cluster_version: Optional[int] = None
+        self._checked_at = 0.0
+        self._stale = False
+        self._publish_pending = False
+        self._local_version = 0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.rebuilds = 0
+
+    def invalidate(self, publish: bool = False):
+        """Mark the snapshot stale and rebuild it in the background.
+
+        Args:
+            publish: Also bump the cluster version so other workers rebuild
+        """
+        self._stale = True
+        self._publish_pending = self._publish_pending or publish
+        try:
+            self._schedule_refresh()
+        except RuntimeError:
+            # No running loop; the next lookup schedules it
+            pass
+
+    async def get_index(self, db_session=None) -> TemplateIndex:
+        """Get the current snapshot without touching the database.
+
+        Only the very first call (no snapshot yet) waits for a build, using
+        ``db_session`` if given.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return await self.rebuild(db_session, if_missing=True)
+
+        if self._stale or time.monotonic() - self._checked_at >= self.check_interval:
+            self._schedule_refresh()
+        return snapshot
+
+    def _schedule_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh())
+
+    async def _refresh(self):
+        """Background check: rebuild if stale, expired or behind the cluster version."""
+        self._checked_at = time.monotonic()
+        try:
+            if self._publish_pending:
+                self._publish_pending = False
+                await self._bump_cluster_version()
+
+            snapshot = self._snapshot
+            expired = snapshot is None or time.time() - snapshot.built_at >= self.refresh_interval
+            if self._stale or expired:
+                await self.rebuild()
+                return
+
+            version = await self._read_cluster_version()
+            if version is not None and version != self._cluster_version:
+                await self.rebuild()
+        except Exception as e:
+            print(f"⚠️  Template catalog refresh failed: {e}")
+
+    async def rebuild(self, db_session=None, if_missing: bool = False) -> TemplateIndex:
+        """Build a new snapshot from the database and swap it in.
+
+        Args:
+            db_session: Session to load with (a new one is opened if omitted)
+            if_missing: Return the current snapshot instead if one exists by
+                the time the build lock is acquired
+        """
+        from src.core.database import AsyncSessionLocal
+
+        async with self._lock:
+            if if_missing and self._snapshot is not None:
+                return self._snapshot
+
+            # Clear first so changes committed during the load trigger another rebuild
+            self._stale = False
+            # Read the version before the rows so a concurrent change is seen next check
+            version = await self._read_cluster_version()
+            try:
+                query = select(*_ENTRY_COLUMNS).where(Template.is_active == True)
+                if db_session is not None:
+                    rows = (await db_session.execute(query)).all()
+                else:
+                    async with AsyncSessionLocal() as session:
+                        rows = (await session.execute(query)).all()
+
+                self._local_version += 1
+                snapshot = await run_blocking(TemplateIndex, rows, self._local_version)
+            except Exception:
+                self._stale = True
+                raise
+
+            self._snapshot = snapshot
+            self._cluster_version = version
+            self._checked_at = time.monotonic()
+            self.rebuilds += 1
+            print(f"📚 Template catalog v{snapshot.version} built: {len(snapshot)} active templates")
+            return snapshot
+
+    async def _read_cluster_version(self) -> Optional[int]:
+        redis = get_redis()
+        if redis is None:
+            return None
+        try:
+            value = await redis.get(VERSION_KEY)
+        except (RedisError, OSError) as e:
+            mark_redis_unavailable(e)
+            return None
+        return int(value) if value is not None else 0
+
+    async def _bump_cluster_version(self):
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.incr(VERSION_KEY)
+        except (RedisError, OSError) as e:
+            mark_redis_unavailable(e)
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot is not None else None,
+            "cluster_version": self._cluster_version,
+            "templates": len(snapshot) if snapshot is not None else 0,
+            "rebuilds": self.rebuilds,
+            "stale": self._stale,
+            "age_seconds": round(time.time() - snapshot.built_at, 1) if snapshot is not None else None
+        }
+
+
+template_catalog = TemplateCatalog(
+    check_interval=settings.template_catalog_check_interval,
+    refresh_interval=settings.template_index_refresh_interval
+)
+
+
+# Invalidate on commit of any session that wrote a match-relevant template change
+def _mark_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info["templates_changed"] = True
+
+
+def _mark_changed_if_relevant(mapper, connection, target):
+    state = inspect(target)
+    for attr in state.attrs:
+        if attr.key not in _VOLATILE_COLUMNS and attr.history.has_changes():
+            _mark_changed(mapper, connection, target)
+            return
+
+
+event.listen(Template, "after_insert", _mark_changed)
+event.listen(Template, "after_delete", _mark_changed)
+event.listen(Template, "after_update", _mark_changed_if_relevant)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop("templates_changed", False):
+        template_catalog.invalidate(publish=True)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("templates_changed", None)
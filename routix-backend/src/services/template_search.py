@@ -0,0 +1,391 @@
+"""
+Full-text and faceted template search.
+
+Name, description and tags are indexed for full-text search:
+
+- SQLite (development): an FTS5 table ``templates_fts`` kept in sync with
+  ``templates`` by triggers, ranked with ``bm25``
+- PostgreSQL (production): a generated ``search_vector`` tsvector column
+  with a GIN index, ranked with ``ts_rank_cd``
+
+Both use the ``simple`` configuration (no stemming) so development and
+production match the same documents. Other databases fall back to
+case-insensitive ``LIKE`` matching on the same fields, without an index or
+a text rank, so their hits are ordered by rating. Name, tags and description are
+weighted in that order. Tag filters only match the tags field, through an
+FTS5 column filter or a tsquery weight restriction, instead of scanning the
+JSON column.
+
+Results are ordered by (score, id) descending, where the score is the text
+rank for a query and the rating otherwise, and paginated with a keyset
+cursor so deep pages cost the same as the first. Facet counts for
+category, style and mood leave out their own filter, so a client can show
+what picking another value would return. Without text to match they are
+counted on the in-process catalog snapshot (``TemplateIndex.facet_counts``)
+instead of aggregating the table, so like template matching they can trail
+a commit by a few seconds; with text they are aggregated over the hits
+only. They don't depend on the cursor, so they are cached per catalog
+version and later pages reuse them.
+"""
+import base64
+import binascii
+import json
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, column, func, literal, literal_column, or_, select, table, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.cache import TwoTierCache
+from src.core.config import settings
+from src.models.template import Template
+from src.schemas.template import TemplateResponse, TemplateSearchRequest, TemplateSearchResponse
+from src.services.template_index import template_catalog
+
+FACETS = ("category", "style", "mood")
+
+# Totals and facet counts per (catalog version, search); versions are per process
+facet_cache = TwoTierCache(
+    "template_facets",
+    max_size=512,
+    ttl=settings.template_facet_cache_ttl,
+    use_redis=False
+)
+
+# Letters and digits only, so user input can never inject query syntax
+_TOKEN = re.compile(r"[^\W_]+")
+
+_templates = Template.__table__
+_fts = table("templates_fts", column("rowid"))
+_FTS = literal_column("templates_fts")
+# FTS rows share the rowid of their template, so hits join without a lookup
+_ROWID = literal_column("templates.rowid")
+_SEARCH_VECTOR = literal_column("templates.search_vector")
+# Same expression as the ix_templates_active_rating index; unrated counts as 0
+_RATING = func.coalesce(_templates.c.rating, literal_column("0.0"))
+
+# bm25 column weights: name, description, tags
+_BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+_SQLITE_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS templates_fts USING fts5(
+        name, description, tags,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS templates_fts_insert AFTER INSERT ON templates BEGIN
+        INSERT INTO templates_fts (rowid, name, description, tags)
+        VALUES (new.rowid, new.name, new.description, new.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS templates_fts_delete AFTER DELETE ON templates BEGIN
+        DELETE FROM templates_fts WHERE rowid = old.rowid;
+    END
+    """,
+    # Usage and rating updates don't touch the indexed columns, so they don't fire this
+    """
+    CREATE TRIGGER IF NOT EXISTS templates_fts_update AFTER UPDATE OF name, description, tags ON templates BEGIN
+        DELETE FROM templates_fts WHERE rowid = old.rowid;
+        INSERT INTO templates_fts (rowid, name, description, tags)
+        VALUES (new.rowid, new.name, new.description, new.tags);
+    END
+    """
+)
+
+_POSTGRES_DDL = (
+    """
+    ALTER TABLE templates ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(tags, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_templates_search_vector ON templates USING GIN (search_vector)"
+)
+
+
+class InvalidCursor(ValueError):
+    """The pagination cursor is malformed or belongs to a different search."""
+
+
+def _terms(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def _fts5_expression(query: Optional[str], tags: Optional[List[str]]) -> str:
+    """Build an FTS5 MATCH expression: prefix terms anywhere, tag phrases in tags."""
+    parts = [f'"{term}"*' for term in _terms(query or "")]
+    for tag in tags or []:
+        words = _terms(tag)
+        if words:
+            parts.append(f'tags : "{" ".join(words)}"')
+    return " AND ".join(parts)
+
+
+def _tsquery_expression(query: Optional[str], tags: Optional[List[str]]) -> str:
+    """Build the same search as a tsquery; weight B restricts a term to the tags."""
+    parts = [f"{term}:*" for term in _terms(query or "")]
+    for tag in tags or []:
+        words = _terms(tag)
+        if words:
+            parts.append("(" + " <-> ".join(f"{word}:B" for word in words) + ")")
+    return " & ".join(parts)
+
+
+def _like_condition(query: Optional[str], tags: Optional[List[str]]):
+    """Build the same search as LIKE filters, for databases without full-text search.
+
+    Terms are letters and digits only, so they need no LIKE escaping.
+    """
+    conditions = []
+    for term in _terms(query or ""):
+        conditions.append(or_(*(
+            func.lower(_templates.c[field]).like(f"%{term}%")
+            for field in ("name", "description", "tags")
+        )))
+    for tag in tags or []:
+        words = _terms(tag)
+        if words:
+            conditions.append(func.lower(_templates.c.tags).like(f"%{' '.join(words)}%"))
+    return and_(*conditions) if conditions else None
+
+
+def _dialect(db: AsyncSession) -> str:
+    return db.get_bind().dialect.name
+
+
+async def ensure_search_index(db: AsyncSession):
+    """Create the full-text index if it doesn't exist yet.
+
+    Called on startup after the tables are created. On SQLite the FTS table
+    is also refilled from ``templates``: VACUUM can renumber the rowids it is
+    keyed on, and development catalogs are small.
+    """
+    dialect = _dialect(db)
+    connection = await db.connection()
+
+    if dialect == "sqlite":
+        for ddl in _SQLITE_DDL:
+            await connection.exec_driver_sql(ddl)
+        await connection.exec_driver_sql("DELETE FROM templates_fts")
+        await connection.exec_driver_sql(
+            "INSERT INTO templates_fts (rowid, name, description, tags) "
+            "SELECT rowid, name, description, tags FROM templates"
+        )
+    elif dialect == "postgresql":
+        for ddl in _POSTGRES_DDL:
+            await connection.exec_driver_sql(ddl)
+    else:
+        print(f"⚠️  Full-text template search is not supported on {dialect}, falling back to LIKE matching")
+
+    await db.commit()
+
+
+class _SearchQuery:
+    """The filters, text match and score of one search, for one dialect."""
+
+    def __init__(self, request: TemplateSearchRequest, dialect: str):
+        self.request = request
+        # Page query FROM clause and text match; ranked hits are joined on SQLite
+        self.page_source = _templates
+        self.page_text_condition = None
+        # Text match for facet counts, which don't need the rank
+        self.text_condition = None
+        self.text_rank = None
+
+        if dialect == "sqlite":
+            expression = _fts5_expression(request.query, request.tags)
+            if expression:
+                match = _FTS.op("MATCH")(expression)
+                hits = (
+                    select(_fts.c.rowid, (-func.bm25(_FTS, *_BM25_WEIGHTS)).label("rank"))
+                    .select_from(_fts)
+                    .where(match)
+                    .cte("hits")
+                )
+                self.page_source = _templates.join(hits, hits.c.rowid == _ROWID)
+                self.text_rank = hits.c.rank
+                # bm25 can't be evaluated under an aggregate
+                self.text_condition = _ROWID.in_(select(_fts.c.rowid).where(match))
+        elif dialect == "postgresql":
+            expression = _tsquery_expression(request.query, request.tags)
+            if expression:
+                tsquery = func.to_tsquery(literal_column("'simple'"), expression)
+                self.text_condition = self.page_text_condition = _SEARCH_VECTOR.op("@@")(tsquery)
+                self.text_rank = func.ts_rank_cd(_SEARCH_VECTOR, tsquery)
+        else:
+            self.text_condition = self.page_text_condition = _like_condition(request.query, request.tags)
+
+        # An empty query (e.g. only punctuation) or one without a text rank
+        # falls back to ordering by rating
+        if request.query and _terms(request.query) and self.text_rank is not None:
+            self.score = self.text_rank
+        else:
+            self.score = _RATING
+
+    @property
+    def has_text(self) -> bool:
+        return self.text_condition is not None
+
+    def conditions(self, text_condition, without: Optional[str] = None) -> list:
+        """Get the filter conditions, optionally leaving out one facet's filter."""
+        request = self.request
+        conditions = [_templates.c.is_active == True]
+        if text_condition is not None:
+            conditions.append(text_condition)
+        for facet in FACETS:
+            value = getattr(request, facet)
+            if value is not None and facet != without:
+                conditions.append(_templates.c[facet] == value)
+        if request.is_premium is not None:
+            conditions.append(_templates.c.is_premium == request.is_premium)
+        if request.min_rating is not None:
+            conditions.append(_RATING >= request.min_rating)
+        return conditions
+
+    def page(self, after: Optional[Tuple[float, str]]):
+        """Select one page of templates with their scores, after a keyset position."""
+        conditions = self.conditions(self.page_text_condition)
+        if after is not None:
+            score, template_id = after
+            # (score, id) < (after) spelled out, with a bound on the score alone
+            # so SQLite can seek the index instead of filtering from the start
+            conditions.append(self.score <= score)
+            conditions.append(or_(self.score < score, _templates.c.id < template_id))
+        return (
+            select(Template, self.score.label("score"))
+            .select_from(self.page_source)
+            .where(and_(*conditions))
+            .order_by(self.score.desc(), _templates.c.id.desc())
+            .limit(self.request.limit + 1)
+        )
+
+    def facets(self):
+        """Select (facet, value, count) rows for every facet plus the total."""
+        queries = [
+            select(literal("total").label("facet"), literal(None).label("value"), func.count().label("count"))
+            .where(and_(*self.conditions(self.text_condition)))
+        ]
+        for facet in FACETS:
+            field = _templates.c[facet]
+            queries.append(
+                select(literal(facet).label("facet"), field.label("value"), func.count().label("count"))
+                .where(and_(*self.conditions(self.text_condition, without=facet)))
+                .group_by(field)
+            )
+        return union_all(*queries)
+
+
+def _encode_cursor(score: float, template_id: str, page: int, request: TemplateSearchRequest) -> str:
+    payload = {"s": score, "id": template_id, "p": page, "q": _search_key(request)}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, request: TemplateSearchRequest) -> Tuple[float, str, int]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        position = (float(payload["s"]), str(payload["id"]), int(payload["p"]))
+        search_key = payload["q"]
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if search_key != _search_key(request):
+        raise InvalidCursor("Cursor belongs to a different search")
+    return position
+
+
+def _search_key(request: TemplateSearchRequest) -> str:
+    """Identify a search by everything but its page position."""
+    return json.dumps(request.model_dump(exclude={"cursor", "limit"}), sort_keys=True)
+
+
+async def _get_facets(db: AsyncSession, search: _SearchQuery) -> Tuple[int, Dict[str, Dict[str, int]]]:
+    """Count matches and facets, in memory unless there is text to match."""
+    index = await template_catalog.get_index(db)
+    cache_key = f"{index.version}:{_search_key(search.request)}"
+    cached = await facet_cache.get(cache_key)
+    if cached is not None:
+        return cached["total"], cached["facets"]
+
+    request = search.request
+    if not search.has_text:
+        total, facets = index.facet_counts(
+            {facet: getattr(request, facet) for facet in FACETS},
+            is_premium=request.is_premium,
+            min_rating=request.min_rating
+        )
+    else:
+        total = 0
+        facets = {facet: {} for facet in FACETS}
+        for facet, value, count in (await db.execute(search.facets())).all():
+            if facet == "total":
+                total = count
+            else:
+                facets[facet][value] = count
+
+    facets = {
+        facet: dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+        for facet, counts in facets.items()
+    }
+    await facet_cache.set(cache_key, {"total": total, "facets": facets})
+    return total, facets
+
+
+def _to_response(template: Template) -> TemplateResponse:
+    return TemplateResponse(
+        id=template.id,
+        name=template.name,
+        description=template.description,
+        category=template.category,
+        style=template.style,
+        mood=template.mood,
+        primary_color=template.primary_color,
+        secondary_color=template.secondary_color,
+        elements=template.elements_list,
+        tags=template.tags_list,
+        is_premium=bool(template.is_premium),
+        usage_count=template.usage_count or 0,
+        rating=template.rating or 0.0,
+        is_active=bool(template.is_active),
+        created_at=template.created_at,
+        updated_at=template.updated_at
+    )
+
+
+async def search_templates(db: AsyncSession, request: TemplateSearchRequest) -> TemplateSearchResponse:
+    """Search active templates and count facets.
+
+    Raises:
+        InvalidCursor: If ``request.cursor`` is not a cursor returned for this search
+    """
+    after = None
+    page = 1
+    if request.cursor:
+        score, template_id, previous_page = _decode_cursor(request.cursor, request)
+        after = (score, template_id)
+        page = previous_page + 1
+
+    search = _SearchQuery(request, _dialect(db))
+    rows = (await db.execute(search.page(after))).all()
+    total, facets = await _get_facets(db, search)
+
+    has_next = len(rows) > request.limit
+    rows = rows[:request.limit]
+    next_cursor = None
+    if has_next:
+        last_template, last_score = rows[-1]
+        next_cursor = _encode_cursor(last_score, last_template.id, page, request)
+
+    return TemplateSearchResponse(
+        templates=[_to_response(template) for template, _ in rows],
+        total=total,
+        page=page,
+        limit=request.limit,
+        pages=math.ceil(total / request.limit) if total else 0,
+        facets=facets,
+        next_cursor=next_cursor
+    )
@@ -0,0 +1,73 @@
+"""
+Standalone generation worker.
+
+Runs queued generations outside the API so image generation capacity
+scales independently of request handling:
+
+    python -m src.worker [--concurrency N]
+
+Run as many processes (or compose replicas) as needed; they share the
+queue in the database. SIGTERM or SIGINT stops claiming and gives running
+generations ``generation_shutdown_grace`` seconds to finish before they
+are put back in the queue for another worker.
+"""
+import argparse
+import asyncio
+import signal
+
+from src.core.config import settings
+from src.core.redis import close_redis
+from src.core.http import http_client
+from src.services.ai_providers import shutdown_executor
+from src.services.template_index import template_catalog
+from src.services.template_counters import template_counters
+from src.services.generation_eta import generation_durations
+from src.services.generation_worker import GenerationWorker
+
+
+async def run_worker(concurrency: int):
+    await http_client.start()
+    await template_catalog.rebuild()
+    template_counters.start()
+    generation_durations.start()
+
+    worker = GenerationWorker(concurrency)
+    loop = asyncio.get_running_loop()
+    stopping = []
+
+    def request_stop(signum: int):
+        if stopping:
+            return
+        print(f"Received {signal.Signals(signum).name}, stopping generation worker...")
+        stopping.append(loop.create_task(worker.stop()))
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, request_stop, signum)
+
+    try:
+        await worker.run()
+        if stopping:
+            await stopping[0]
+    finally:
+        await generation_durations.stop()
+        await template_counters.stop()
+        await http_client.close()
+        shutdown_executor()
+        await close_redis()
+    print(f"Generation worker {worker.worker_id} stopped after {worker.processed} generations")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Routix generation jobs from the queue.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.generation_worker_concurrency,
+        help="generations to run at once (default: %(default)s)"
+    )
+    args = parser.parse_args()
+    asyncio.run(run_worker(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Test settings: a throwaway SQLite database and upload directory, no Redis.
+
+Run from routix-backend with ``python -m pytest``. Tests are synchronous
+and drive async code through the ``run`` fixture.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="routix-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'test.db')}")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_tmp, "uploads"))
+os.environ.setdefault("REDIS_ENABLED", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.database import AsyncSessionLocal, create_tables, engine  # noqa: E402
+from src.models import Algorithm, User  # noqa: E402
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine on a fresh event loop, closing pooled connections after it."""
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                # Connections belong to the loop that opened them
+                await engine.dispose()
+        return asyncio.run(main())
+    return run
+
+
+@pytest.fixture
+def database(run):
+    run(create_tables())
+
+
+@pytest.fixture
+def algorithm_id(database, run) -> str:
+    """The "basic" algorithm, costing one credit."""
+    async def seed():
+        async with AsyncSessionLocal() as db:
+            if await db.get(Algorithm, "basic") is None:
+                db.add(Algorithm(id="basic", name="basic", display_name="Basic", description="test", cost_credits=1))
+                await db.commit()
+    run(seed())
+    return "basic"
+
+
+@pytest.fixture
+def user_id(database, run) -> str:
+    """A new free-tier user."""
+    user_id = str(uuid.uuid4())
+
+    async def seed():
+        async with AsyncSessionLocal() as db:
+            db.add(User(id=user_id, email=f"{user_id}@example.com", username=user_id[:8], password_hash="x"))
+            await db.commit()
+    run(seed())
+    return user_id
@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.core.circuit_breaker import CircuitBreaker
+from src.core.config import settings
+from src.core.rate_limit import get_limiter
+from src.services.ai_providers import OpenAIProvider, ProviderError, ProviderTimeoutError
+
+
+def _chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class _Stream:
+    def __init__(self, contents, fail=None, stall=False):
+        self.contents = list(contents)
+        self.fail = fail
+        self.stall = stall
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.contents:
+            return _chunk(self.contents.pop(0))
+        if self.fail is not None:
+            raise self.fail
+        if self.stall:
+            await asyncio.sleep(10)
+        raise StopAsyncIteration
+
+
+def _provider(model, stream):
+    provider = OpenAIProvider(api_key="test", timeout=0.2)
+    provider.breaker = CircuitBreaker(f"test-{model}")
+
+    async def create(**kwargs):
+        return stream
+
+    provider._client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return provider
+
+
+def _limiter(model):
+    return get_limiter("openai", model, latency_target=0.2 * settings.breaker_slow_call_ratio)
+
+
+def test_chat_stream_holds_limiter_slot_until_the_stream_ends():
+    provider = _provider("stream-slot", _Stream(["a", "b", "c"]))
+
+    async def consume():
+        seen = []
+        async for delta in provider.chat_stream([], "stream-slot"):
+            seen.append((delta, _limiter("stream-slot").concurrency.in_flight))
+        return seen
+
+    seen = asyncio.run(consume())
+
+    assert seen == [("a", 1), ("b", 1), ("c", 1)]
+    assert _limiter("stream-slot").concurrency.in_flight == 0
+    assert provider.breaker.snapshot()["calls"] == 1
+    assert provider.breaker.snapshot()["failure_rate"] == 0.0
+
+
+@pytest.mark.parametrize("stream, error", [
+    (_Stream(["a"], fail=ProviderError("openai", "connection reset")), ProviderError),
+    (_Stream(["a"], stall=True), ProviderTimeoutError),
+])
+def test_chat_stream_failure_mid_stream_counts_against_the_breaker(stream, error):
+    provider = _provider("stream-failure", stream)
+
+    async def consume():
+        async for _ in provider.chat_stream([], "stream-failure"):
+            pass
+
+    with pytest.raises(error):
+        asyncio.run(consume())
+
+    assert _limiter("stream-failure").concurrency.in_flight == 0
+    assert provider.breaker.snapshot()["calls"] == 1
+    assert provider.breaker.snapshot()["failure_rate"] == 1.0
@@ -0,0 +1,42 @@
+import json
+
+from sqlalchemy import select
+
+from src.api.v1.endpoints import chat
+from src.core.database import AsyncSessionLocal
+from src.models import Conversation, Message, User
+from src.schemas.conversation import ChatRequest
+from src.services.ai_service import AIService
+
+
+async def _stream_chat(user_id: str):
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        conversation = Conversation(user_id=user_id, title="Thumbnails")
+        db.add(conversation)
+        await db.commit()
+
+        response = await chat.chat_stream(
+            conversation.id,
+            ChatRequest(message="Make me a thumbnail for my boss fight video", metadata={"source": "app"}),
+            current_user=user,
+            db=db,
+            ai_service=AIService()
+        )
+        events = [event async for event in response.body_iterator]
+
+        messages = (await db.execute(
+            select(Message).where(Message.conversation_id == conversation.id).order_by(Message.created_at)
+        )).scalars().all()
+        return events, [(message.role, message.metadata_) for message in messages]
+
+
+def test_chat_stream_saves_message_metadata(run, user_id):
+    events, messages = run(_stream_chat(user_id))
+
+    assert events[-1].startswith("event: done")
+    done = json.loads(events[-1].split("data: ", 1)[1])
+    assert [role for role, _ in messages] == ["user", "assistant"]
+    assert json.loads(messages[0][1]) == {"source": "app"}
+    assert json.loads(messages[1][1]) == {"requires_generation": done["requires_generation"]}
+    assert done["message"]["metadata"] == messages[1][1]
@@ -0,0 +1,69 @@
+import asyncio
+import uuid
+
+from src.core.database import AsyncSessionLocal
+from src.models import Generation, GenerationBatch, GenerationStatus
+from src.schemas.generation import GenerationBatchCreate
+from src.services.ai_service import AIService
+from src.services.generation_service import GenerationService
+
+VARIANTS = 4
+
+
+async def _create_count_mode_batch(user_id: str, algorithm_id: str) -> list:
+    batch_data = GenerationBatchCreate(prompt="epic boss fight", algorithm_id=algorithm_id, count=VARIANTS)
+    batch_id = str(uuid.uuid4())
+    async with AsyncSessionLocal() as db:
+        db.add(GenerationBatch(
+            id=batch_id, user_id=user_id, algorithm_id=algorithm_id, prompt=batch_data.prompt,
+            size=VARIANTS, credits_used=VARIANTS
+        ))
+        await db.flush()
+        generations = [
+            Generation(
+                id=str(uuid.uuid4()), user_id=user_id, algorithm_id=algorithm_id, batch_id=batch_id,
+                batch_index=index, prompt=prompt, credits_used=1, status=GenerationStatus.PROCESSING
+            )
+            for index, prompt in enumerate(batch_data.variant_prompts())
+        ]
+        db.add_all(generations)
+        await db.commit()
+    return [generation.id for generation in generations]
+
+
+async def _run_concurrent_variants(user_id: str, algorithm_id: str):
+    generation_ids = await _create_count_mode_batch(user_id, algorithm_id)
+
+    ai = AIService()
+    calls = []
+
+    async def analyze_prompt(prompt, reference_images=None):
+        return {"category": "gaming", "style": "bold"}
+
+    async def find_matching_templates(analysis, **kwargs):
+        # An empty catalog: every variant gets the same single fallback template
+        return ai._get_fallback_templates(analysis)
+
+    async def generate(prompt, template, algorithm, reference_images):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return {"success": True, "image_url": f"mock://{len(calls)}"}
+
+    ai.analyze_prompt = analyze_prompt
+    ai.find_matching_templates = find_matching_templates
+    ai._generate = generate
+    service = GenerationService()
+    service.ai_service = ai
+
+    await asyncio.gather(*(service.process_generation(generation_id) for generation_id in generation_ids))
+
+    async with AsyncSessionLocal() as db:
+        statuses = [(await db.get(Generation, generation_id)).status for generation_id in generation_ids]
+    return calls, statuses
+
+
+def test_concurrent_count_mode_variants_each_call_the_provider(run, user_id, algorithm_id):
+    calls, statuses = run(_run_concurrent_variants(user_id, algorithm_id))
+
+    assert len(calls) == VARIANTS
+    assert statuses == [GenerationStatus.COMPLETED] * VARIANTS
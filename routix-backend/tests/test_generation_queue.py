@@ -0,0 +1,84 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+
+from src.core.database import AsyncSessionLocal, engine
+from src.models import Generation, GenerationStatus, User
+from src.services.generation_queue import GenerationQueue
+from src.services.generation_scheduler import Candidate, FairScheduler
+
+
+def _queue() -> GenerationQueue:
+    return GenerationQueue(60, 3, FairScheduler({"free": 1.0}, {"free": 1}), claim_window=100)
+
+
+class _HeldElsewhere:
+    """Session in which another worker holds some users' rows.
+
+    ``FOR UPDATE SKIP LOCKED`` selects of users leave those users out, like
+    PostgreSQL does; SQLite has no row locks to test this with.
+    """
+
+    def __init__(self, session, held):
+        self.session = session
+        self.held = held
+
+    async def execute(self, statement, *args, **kwargs):
+        lock = getattr(statement, "_for_update_arg", None)
+        if lock is not None and lock.skip_locked:
+            statement = statement.where(User.id.not_in(self.held))
+        return await self.session.execute(statement, *args, **kwargs)
+
+
+async def _add_user(db) -> str:
+    user_id = str(uuid.uuid4())
+    db.add(User(id=user_id, email=f"{user_id}@example.com", username=user_id[:8], password_hash="x"))
+    return user_id
+
+
+async def _lock(user_id: str, algorithm_id: str):
+    async with AsyncSessionLocal() as db:
+        held, busy = await _add_user(db), await _add_user(db)
+        await db.commit()
+        picked = [
+            Candidate(id=str(uuid.uuid4()), user_id=uid, tier="free", created_at=datetime.utcnow())
+            for uid in (user_id, held, busy)
+        ]
+        # Claimed by another worker after the window was read
+        db.add(Generation(
+            user_id=busy, algorithm_id=algorithm_id, prompt="p", credits_used=1,
+            status=GenerationStatus.PROCESSING
+        ))
+        await db.commit()
+
+        kept = await _queue()._lock_users(_HeldElsewhere(db, {held}), picked)
+        return [c.user_id for c in kept], user_id
+
+
+def test_lock_users_drops_locked_and_capped_users(run, user_id, algorithm_id):
+    kept, free_user = run(_lock(user_id, algorithm_id))
+
+    assert kept == [free_user]
+
+
+async def _claim_with_two_workers(user_id: str, algorithm_id: str):
+    async with AsyncSessionLocal() as db:
+        db.add_all([
+            Generation(user_id=user_id, algorithm_id=algorithm_id, prompt="p", credits_used=1, status=GenerationStatus.QUEUED)
+            for _ in range(3)
+        ])
+        await db.commit()
+
+    first, second = await asyncio.gather(_queue().claim("worker-1", 4), _queue().claim("worker-2", 4))
+    again = await _queue().claim("worker-1", 4)
+    return first + second, again
+
+
+@pytest.mark.skipif(engine.dialect.name != "postgresql", reason="needs row locks (PostgreSQL)")
+def test_claims_respect_user_inflight_cap_across_workers(run, user_id, algorithm_id):
+    claimed, again = run(_claim_with_two_workers(user_id, algorithm_id))
+
+    assert len(claimed) == 1
+    assert again == []
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from src.services.generation_scheduler import Candidate, FairScheduler
+
+NOW = datetime(2026, 1, 1)
+
+
+def _candidates():
+    return [
+        Candidate(id="free-1", user_id="alice", tier="free", created_at=NOW),
+        Candidate(id="pro-1", user_id="bob", tier="pro", created_at=NOW),
+    ]
+
+
+def test_select_charges_nothing_until_commit():
+    scheduler = FairScheduler({"free": 1.0, "pro": 1.0}, {"free": 1, "pro": 1})
+
+    first = scheduler.select(_candidates(), {}, 1)
+    # Lost to another worker: the free tier keeps its turn
+    assert scheduler.select(_candidates(), {}, 1) == first
+
+    scheduler.commit(first)
+    assert scheduler.select(_candidates(), {}, 1) != first
+
+
+def test_commit_charges_only_claimed_picks():
+    scheduler = FairScheduler({"free": 1.0, "pro": 1.0}, {"free": 2, "pro": 2})
+    candidates = _candidates() + [Candidate(id="free-2", user_id="carol", tier="free", created_at=NOW)]
+
+    picked = scheduler.select(candidates, {}, 3)
+    assert [c.id for c in picked] == ["free-1", "pro-1", "free-2"]
+
+    scheduler.commit([c for c in picked if c.tier == "pro"])
+    # Only pro was charged, so free goes first and alice, then carol, keep their turns
+    assert [c.id for c in scheduler.select(candidates, {}, 3)] == ["free-1", "free-2", "pro-1"]
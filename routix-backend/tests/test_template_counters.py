@@ -0,0 +1,59 @@
+import pytest
+
+from src.api.v1.endpoints import templates
+from src.core.database import AsyncSessionLocal
+from src.models import Template, User
+from src.schemas.template import TemplateRatingRequest
+from src.services.template_counters import TemplateCounters
+
+
+async def _add_template() -> str:
+    async with AsyncSessionLocal() as db:
+        template = Template(name="Boss Fight", description="d", category="gaming", style="dark", mood="exciting")
+        db.add(template)
+        await db.commit()
+        return template.id
+
+
+async def _rating(template_id: str):
+    async with AsyncSessionLocal() as db:
+        template = await db.get(Template, template_id)
+        return template.rating, template.rating_count
+
+
+async def _flush_two_workers(first_flushes_first: bool):
+    template_id = await _add_template()
+    first, second = TemplateCounters(60), TemplateCounters(60)
+    for rating in (5.0, 5.0, 2.0):
+        first.record_rating(template_id, rating)
+    second.record_rating(template_id, 1.0)
+
+    for counters in ((first, second) if first_flushes_first else (second, first)):
+        await counters.flush()
+    return await _rating(template_id)
+
+
+@pytest.mark.parametrize("first_flushes_first", [True, False])
+def test_rating_flushes_from_two_workers_average_every_rating(run, database, first_flushes_first):
+    rating, count = run(_flush_two_workers(first_flushes_first))
+
+    assert rating == pytest.approx(13.0 / 4)
+    assert count == 4
+
+
+async def _rate_through_endpoint(user_id: str, counters: TemplateCounters):
+    template_id = await _add_template()
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        for rating in (4.0, 2.0):
+            await templates.rate_template(template_id, TemplateRatingRequest(rating=rating), current_user=user, db=db)
+    await counters.flush()
+    return await _rating(template_id)
+
+
+def test_rating_endpoint_goes_through_the_counters(monkeypatch, run, user_id):
+    counters = TemplateCounters(60)
+    monkeypatch.setattr(templates, "template_counters", counters)
+
+    assert run(_rate_through_endpoint(user_id, counters)) == (pytest.approx(3.0), 2)
+    assert counters.stats()["flushed_ratings"] == 2
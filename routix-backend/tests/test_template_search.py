@@ -0,0 +1,39 @@
+import json
+import uuid
+
+from src.core.database import AsyncSessionLocal
+from src.models import Template
+from src.schemas.template import TemplateSearchRequest
+from src.services import template_search
+
+
+async def _search_without_full_text(requests):
+    marker = uuid.uuid4().hex[:8]
+    async with AsyncSessionLocal() as db:
+        db.add_all([
+            Template(
+                name=f"Boss Fight {marker}", description="Dark gaming thumbnail", category="gaming",
+                style="dark", mood="exciting", tags=json.dumps(["boss fight", marker]), rating=4.0
+            ),
+            Template(
+                name=f"Unboxing {marker}", description="Bright tech review", category="tech",
+                style="bright", mood="fun", tags=json.dumps(["review", marker]), rating=4.5
+            ),
+        ])
+        await db.commit()
+        return [await template_search.search_templates(db, build(marker)) for build in requests]
+
+
+def test_search_falls_back_to_like_without_full_text(monkeypatch, run, database):
+    # A database with neither FTS5 nor tsvector support
+    monkeypatch.setattr(template_search, "_dialect", lambda db: "mysql")
+
+    by_query, by_tag = run(_search_without_full_text([
+        lambda marker: TemplateSearchRequest(query=f"GAMING {marker}"),
+        lambda marker: TemplateSearchRequest(tags=["review", marker]),
+    ]))
+
+    assert [t.name.split()[0] for t in by_query.templates] == ["Boss"]
+    assert by_query.total == 1
+    assert by_query.facets["category"] == {"gaming": 1}
+    assert [t.name.split()[0] for t in by_tag.templates] == ["Unboxing"]